@@ -0,0 +1,38 @@
+import json
+import threading
+from masternode_health.httpserver import ThreadingHTTPServer
+from .fake_defid import Counters, CountingHandler
+
+
+class FakeHealthApi:
+    '''
+        Local stand-in for the masternode health api that accepts and records every report
+    '''
+    def __init__(self):
+        self.counters = Counters()
+        self.reports = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handlerClass())
+        self.server.counters = self.counters
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/v1'
+
+    def _handlerClass(self):
+        api = self
+
+        class Handler(CountingHandler):
+            def do_POST(self):
+                body = self._readBody()
+                api.reports.append((self.path, self.headers.get('x-api-key'), json.loads(body)))
+                self._respond(200, b'{"message":"ok"}')
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
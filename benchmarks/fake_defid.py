@@ -0,0 +1,195 @@
+import base64
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler
+from masternode_health.httpserver import ThreadingHTTPServer
+
+
+class Counters:
+    '''
+        Thread safe request and byte counters of a fake server
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.calls = 0
+            self.bytesIn = 0
+            self.bytesOut = 0
+            self.connections = 0
+
+    def add(self, **kwargs):
+        with self.lock:
+            for key, value in kwargs.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def toDict(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'calls': self.calls,
+                'bytes_in': self.bytesIn,
+                'bytes_out': self.bytesOut,
+                'connections': self.connections,
+            }
+
+
+class CountingWriter:
+    '''
+        Wraps the write file of a request handler and counts the bytes written to it
+    '''
+    def __init__(self, raw, counters):
+        self.raw = raw
+        self.counters = counters
+
+    def write(self, data):
+        self.counters.add(bytesOut=len(data))
+        return self.raw.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    '''
+        Keep-alive request handler that counts requests, connections and bytes on the wire
+    '''
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, with Nagle's algorithm every response would wait for a delayed ack
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile, self.server.counters)
+        self.server.counters.add(connections=1)
+
+    def _readBody(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.server.counters.add(requests=1, bytesIn=len(self.requestline) + len(str(self.headers)) + length)
+        return body
+
+    def _respond(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeDefid:
+    '''
+        Local JSON-RPC server that emulates the defid calls used by masternode-health.
+        latency is added to every request, failureRate is the share of calls that return an error and
+        failMethods are methods that always fail.
+    '''
+    def __init__(self, masternodes=1, latency=0.0, failureRate=0.0, failMethods=(), rpcuser='user', rpcpassword='password', seed=1):
+        self.latency = latency
+        self.failureRate = failureRate
+        self.failMethods = set(failMethods)
+        self.random = random.Random(seed)
+        self.auth = 'Basic ' + base64.b64encode(f'{rpcuser}:{rpcpassword}'.encode()).decode()
+        self.started = time.time()
+        self.blockcount = 1149879
+        self.counters = Counters()
+
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.masternodes = [{'id': f'{i:064x}', 'lastblockcreationattempt': now} for i in range(masternodes)]
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handlerClass())
+        self.server.counters = self.counters
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def _handlerClass(self):
+        defid = self
+
+        class Handler(CountingHandler):
+            def do_POST(self):
+                body = self._readBody()
+
+                if self.headers.get('Authorization') != defid.auth:
+                    self._respond(401, b'')
+                    return
+
+                if defid.latency:
+                    time.sleep(defid.latency)
+
+                request = json.loads(body)
+                if isinstance(request, list):
+                    self.server.counters.add(calls=len(request))
+                    self._respond(200, json.dumps([defid.call(entry) for entry in request]).encode())
+                    return
+
+                self.server.counters.add(calls=1)
+                response = defid.call(request)
+                self._respond(500 if response['error'] else 200, json.dumps(response).encode())
+
+        return Handler
+
+    def _result(self, method, params):
+        if method == 'getmininginfo':
+            return {'blocks': self.blockcount, 'masternodes': self.masternodes}
+        if method == 'getblockcount':
+            return self.blockcount
+        if method == 'getbestblockhash':
+            return f'{self.blockcount:064x}'
+        if method == 'uptime':
+            return int(time.time() - self.started)
+        if method == 'getconnectioncount':
+            return 8
+        if method == 'getpeerinfo':
+            return [{'id': i, 'addr': f'10.0.0.{i}:8555', 'conntime': int(self.started), 'inbound': i % 2 == 0, 'pingtime': 0.05 * (i + 1), 'synced_blocks': self.blockcount, 'bytesrecv': 1000 * i, 'bytessent': 500 * i} for i in range(8)]
+        if method == 'getnettotals':
+            return {'totalbytesrecv': 10**6, 'totalbytessent': 5 * 10**5, 'timemillis': int(time.time() * 1000)}
+        if method == 'getmempoolinfo':
+            return {'loaded': True, 'size': 25, 'bytes': 12000, 'usage': 40000, 'maxmempool': 300 * 1024**2, 'mempoolminfee': 0.00001}
+        if method == 'getmasternode':
+            return {params[0]: {'state': 'ENABLED', 'mintedBlocks': 1, 'banTx': '0' * 64}}
+        return self._tipResult(method, params)
+
+    def _tipResult(self, method, params):
+        if method == 'getblockchaininfo':
+            return {'blocks': self.blockcount, 'headers': self.blockcount, 'bestblockhash': f'{self.blockcount:064x}', 'verificationprogress': 1.0, 'initialblockdownload': False, 'size_on_disk': 10 * 1024**3, 'difficulty': 1.5}
+        if method == 'getblockheader':
+            return {'hash': params[0], 'height': int(params[0], 16), 'time': int(time.time())}
+        if method == 'waitfornewblock':
+            time.sleep(min(params[0] / 1000, 1) if params else 1)
+            return {'hash': f'{self.blockcount:064x}', 'height': self.blockcount}
+        raise KeyError(method)
+
+    def call(self, request):
+        method = request.get('method')
+        response = {'id': request.get('id'), 'result': None, 'error': None}
+
+        if method in self.failMethods or (self.failureRate and self.random.random() < self.failureRate):
+            response['error'] = {'code': -1, 'message': f'Injected failure of {method}'}
+            return response
+
+        try:
+            response['result'] = self._result(method, request.get('params', []))
+        except KeyError:
+            response['error'] = {'code': -32601, 'message': 'Method not found'}
+
+        return response
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
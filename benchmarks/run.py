@@ -0,0 +1,224 @@
+'''
+    End-to-end benchmark of masternode-health against a local fake defid and a fake health api.
+
+    python -m benchmarks.run --cycles 10 --masternodes 100 --latency 0.005 --output results.json
+'''
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from .fake_defid import FakeDefid
+from .fake_api import FakeHealthApi
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFID_SCRIPT = '#!/bin/sh\necho "Defi Blockchain Daemon version v1.8.1.0-bench"\n'
+
+
+def summary(values):
+    # Failed cycles have no report time
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'max': max(values),
+    }
+
+
+def prepareDefiPath(directory):
+    '''
+        Creates a .defi folder with defi.conf, debug.log and a defid that only answers --version
+    '''
+    with open(os.path.join(directory, 'defi.conf'), 'w') as f:
+        f.write('rpcuser=user\nrpcpassword=password\n')
+    with open(os.path.join(directory, 'debug.log'), 'w') as f:
+        f.write('2021-08-23T19:48:21Z Bound to 127.0.0.1:8555\n')
+
+    defid = os.path.join(directory, 'defid')
+    with open(defid, 'w') as f:
+        f.write(DEFID_SCRIPT)
+    os.chmod(defid, 0o755)
+
+
+def monitorArguments(directory, defid, api, extra=()):
+    return [
+        '--rpchost', defid.url,
+        '--api-url', api.url,
+        '--defi-path', directory,
+        '--defi-conf', os.path.join(directory, 'defi.conf'),
+        '--state-dir', os.path.join(directory, 'state'),
+        '--api-key', 'bench',
+    ] + list(extra)
+
+
+def runCycles(directory, defid, api, cycles, extra):
+    '''
+        Runs processNode and sendReport in this process and returns the measurements per cycle
+    '''
+    from masternode_health.monitor import NodeMonitor, parse_args
+
+    nodeMonitor = NodeMonitor(parse_args(monitorArguments(directory, defid, api, extra)))
+    retval = []
+
+    for cycle in range(cycles):
+        # The spool rate limits per api key, a fresh key lets every cycle upload
+        nodeMonitor.api_key = f'bench-{cycle}'
+        defid.counters.reset()
+        api.counters.reset()
+
+        start = time.perf_counter()
+        collected = error = None
+        try:
+            nodeMonitor.processNode()
+            collected = time.perf_counter()
+            nodeMonitor.sendReport()
+        except SystemExit as err:
+            # Injected failures end the cycle, the benchmark goes on with the next one
+            error = str(err.code)
+        end = time.perf_counter()
+
+        retval.append({
+            'wall_time': end - start,
+            'collect_time': (collected or end) - start,
+            'report_time': None if collected is None else end - collected,
+            'error': error,
+            'rpc': defid.counters.toDict(),
+            'api': api.counters.toDict(),
+        })
+
+    return retval
+
+
+def measureStartup(runs):
+    '''
+        Wall time of a cold masternode-health --version in a new interpreter
+    '''
+    code = 'import sys; from masternode_health.cli import main; sys.argv = ["masternode-health", "--version"]; main()'
+    times = []
+
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=REPO, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+
+    return summary(times)
+
+
+def measureCli(directory, defid, api, extra):
+    '''
+        Runs one complete masternode-health process and returns its wall time and peak RSS
+    '''
+    code = 'import sys; from masternode_health.cli import main; sys.argv = ["masternode-health"] + sys.argv[1:]; main()'
+    defid.counters.reset()
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', code] + monitorArguments(directory, defid, api, extra), cwd=REPO, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    wallTime = time.perf_counter() - start
+
+    return {
+        'wall_time': wallTime,
+        'exit_code': process.returncode,
+        'peak_rss_kb': peakMemory('children'),
+        'rpc': defid.counters.toDict(),
+    }
+
+
+def peakMemory(who):
+    '''
+        Peak RSS in KiB of this process (self) or its finished child processes (children), None where the
+        resource module is missing (Windows)
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    return resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def perCycle(cycles, path):
+    group, key = path
+    return summary([cycle[group][key] for cycle in cycles])
+
+
+def run(args):
+    from masternode_health.version import __version__
+
+    directory = tempfile.mkdtemp()
+    defid = FakeDefid(args.masternodes, args.latency, args.failure_rate, args.fail_method).start()
+    api = FakeHealthApi().start()
+
+    try:
+        prepareDefiPath(directory)
+        extra = args.monitor_args.split() if args.monitor_args else []
+        cycles = runCycles(directory, defid, api, args.cycles, extra)
+
+        return {
+            'version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {
+                'cycles': args.cycles,
+                'masternodes': args.masternodes,
+                'latency': args.latency,
+                'failure_rate': args.failure_rate,
+                'fail_methods': args.fail_method,
+                'monitor_args': extra,
+            },
+            'failed_cycles': sum(cycle['error'] is not None for cycle in cycles),
+            'wall_time': summary([cycle['wall_time'] for cycle in cycles]),
+            'collect_time': summary([cycle['collect_time'] for cycle in cycles]),
+            'report_time': summary([cycle['report_time'] for cycle in cycles]),
+            'rpc_round_trips': perCycle(cycles, ('rpc', 'requests')),
+            'rpc_calls': perCycle(cycles, ('rpc', 'calls')),
+            'rpc_connections': perCycle(cycles, ('rpc', 'connections')),
+            'rpc_bytes': summary([cycle['rpc']['bytes_in'] + cycle['rpc']['bytes_out'] for cycle in cycles]),
+            'api_requests': perCycle(cycles, ('api', 'requests')),
+            'api_bytes': summary([cycle['api']['bytes_in'] + cycle['api']['bytes_out'] for cycle in cycles]),
+            # Includes the fake servers, which run in the same process
+            'peak_rss_kb': peakMemory('self'),
+            'startup_time': measureStartup(args.startup_runs) if args.startup_runs else None,
+            'cli': measureCli(directory, defid, api, extra + ['--api-key', 'bench-cli']) if args.cli else None,
+            'cycles': cycles,
+        }
+    finally:
+        defid.stop()
+        api.stop()
+        shutil.rmtree(directory)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description='masternode-health end-to-end benchmark')
+    parser.add_argument('--cycles', help='Number of collection cycles (default: 10)', default=10, type=int)
+    parser.add_argument('--masternodes', help='Number of masternodes in getmininginfo (default: 1)', default=1, type=int)
+    parser.add_argument('--latency', help='Seconds the fake defid waits before answering a request (default: 0)', default=0.0, type=float)
+    parser.add_argument('--failure-rate', help='Share of rpc calls that fail (default: 0)', default=0.0, type=float)
+    parser.add_argument('--fail-method', help='RPC method that always fails, may be repeated', action='append', default=[])
+    parser.add_argument('--monitor-args', help='Additional masternode-health arguments, e.g. "--masternode-details"')
+    parser.add_argument('--startup-runs', help='Number of cold starts to measure (default: 5, 0 to skip)', default=5, type=int)
+    parser.add_argument('--no-cli', dest='cli', action='store_false', help='Skip the run of a complete masternode-health process')
+    parser.add_argument('--output', help='Write the results to this JSON file instead of stdout')
+
+    return parser.parse_args(args)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    results = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
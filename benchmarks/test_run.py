@@ -0,0 +1,36 @@
+from benchmarks.fake_defid import FakeDefid
+from benchmarks.run import parse_args, run
+from unittest import TestCase
+import json
+from urllib.request import Request, urlopen
+
+
+class FakeDefidTest(TestCase):
+
+    def setUp(self):
+        self.defid = FakeDefid(masternodes=3, failMethods=['uptime']).start()
+        self.addCleanup(self.defid.stop)
+
+    def test_batch(self):
+        self.assertEqual(self.defid.call({'id': 1, 'method': 'getblockcount'})['result'], 1149879)
+        self.assertEqual(len(self.defid.call({'id': 1, 'method': 'getmininginfo'})['result']['masternodes']), 3)
+        self.assertIsNotNone(self.defid.call({'id': 1, 'method': 'uptime'})['error'])
+        self.assertEqual(self.defid.call({'id': 1, 'method': 'unknown'})['error']['code'], -32601)
+
+    def test_authentication(self):
+        request = Request(self.defid.url, data=json.dumps({'id': 1, 'method': 'getblockcount'}).encode())
+        with self.assertRaises(Exception):
+            urlopen(request)
+        self.assertEqual(self.defid.counters.toDict()['requests'], 1)
+
+
+class BenchmarkTest(TestCase):
+
+    def test_run(self):
+        results = run(parse_args(['--cycles', '2', '--masternodes', '10', '--startup-runs', '0', '--no-cli']))
+
+        self.assertEqual(len(results['cycles']), 2)
+        self.assertEqual(results['rpc_round_trips']['max'], 1)
+        self.assertEqual(results['api_requests']['max'], 2)
+        self.assertGreater(results['wall_time']['min'], 0)
+        json.dumps(results)
@@ -0,0 +1,58 @@
+import time
+from .util import loadJson, saveJson
+
+# Consecutive rpc timeouts after which defid is left alone
+FAILURE_THRESHOLD = 3
+# Seconds the breaker stays open after tripping, doubled on every failed probe
+COOLDOWN_SECONDS = 600
+MAX_COOLDOWN_SECONDS = 3600
+
+
+class CircuitBreaker:
+    '''
+        Stops sending rpc calls to a defid that timed out FAILURE_THRESHOLD times in a row. While open, calls
+        are refused until the cooldown has passed; then one cycle may probe defid again, closing the breaker on
+        success or opening it for twice the cooldown on another timeout. The state is kept in a state file, so
+        it survives from one cron run to the next.
+    '''
+    def __init__(self, path):
+        self.path = path
+        state = loadJson(path, {})
+        self.failures = state.get('failures', 0)
+        self.openUntil = state.get('openUntil', 0)
+        self.cooldown = state.get('cooldown', COOLDOWN_SECONDS)
+
+    def _save(self):
+        try:
+            saveJson(self.path, {'failures': self.failures, 'openUntil': self.openUntil, 'cooldown': self.cooldown})
+        except OSError as err:
+            print(f"❌ Could not write circuit breaker state {self.path}: {err}")
+
+    @property
+    def open(self):
+        return time.time() < self.openUntil
+
+    def allow(self):
+        return not self.open
+
+    def success(self):
+        if self.failures or self.cooldown != COOLDOWN_SECONDS:
+            self.failures = 0
+            self.openUntil = 0
+            self.cooldown = COOLDOWN_SECONDS
+            self._save()
+
+    def failure(self):
+        '''
+            Records a timeout and returns True if it opened the breaker
+        '''
+        self.failures += 1
+        tripped = self.failures >= FAILURE_THRESHOLD
+        if tripped:
+            if self.failures > FAILURE_THRESHOLD:
+                # The probe after a cooldown failed as well
+                self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN_SECONDS)
+            self.openUntil = time.time() + self.cooldown
+        self._save()
+
+        return tripped
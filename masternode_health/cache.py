@@ -0,0 +1,49 @@
+import os
+from .util import loadJson, saveJson
+
+
+class FileCache:
+    '''
+        Persistent cache for values derived from files. Every value is stored together with the
+        (path, inode, size, mtime_ns) fingerprint of its source file and only recomputed when that changes.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.entries = loadJson(path, {})
+        self.dirty = False
+
+    @staticmethod
+    def fingerprint(path):
+        st = os.stat(path)
+        return [os.path.abspath(path), st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def get(self, name, path, compute):
+        '''
+            Returns the cached value name of the file path or calls compute() if the file has changed.
+            If path can not be stat'ed the value is computed without caching.
+        '''
+        try:
+            fingerprint = self.fingerprint(path)
+        except OSError:
+            return compute()
+
+        key = f'{name}:{fingerprint[0]}'
+        entry = self.entries.get(key)
+        if entry is not None and entry['fingerprint'] == fingerprint:
+            return entry['value']
+
+        value = compute()
+        self.entries[key] = {'fingerprint': fingerprint, 'value': value}
+        self.dirty = True
+
+        return value
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        try:
+            saveJson(self.path, self.entries)
+            self.dirty = False
+        except OSError as err:
+            print(f"❌ Could not write cache {self.path}: {err}")
@@ -0,0 +1,171 @@
+import argparse
+import sys
+from os.path import expanduser, join
+from .version import __version__
+
+# The masternode health api accepts only one call per endpoint every 300 seconds
+MIN_INTERVAL = 300
+
+
+def checkWatch(args):
+    if args.daemon or args.exporter_port is not None or args.nodes is not None:
+        raise SystemExit('--watch can not be combined with --daemon, --exporter-port or --nodes')
+    if args.watch <= 0:
+        raise SystemExit('The watch interval must be greater than 0')
+
+
+def checkGateway(args):
+    if args.watch is not None or args.daemon or args.exporter_port is not None or args.nodes is not None:
+        raise SystemExit('--gateway-port can not be combined with --watch, --daemon, --exporter-port or --nodes')
+    if args.gateway_pace < 0:
+        raise SystemExit('The gateway pace must not be negative')
+
+
+def parse_args(args):
+    home = expanduser("~")
+    parser = argparse.ArgumentParser(description='DefiChain Masternode Monitor')
+    parser.add_argument('--max-block-seconds', help='Alert if node did not try to calculate hash within max-block-seconds (default: 30 seconds)', default=30, type=int)
+    parser.add_argument('--masternode-details', action='store_true', help='Look up state, minted blocks and ban state of every masternode and add them to the report')
+    parser.add_argument('--rpchost', help='RPC host (default: http://localhost:8554)', default='http://localhost:8554')
+    parser.add_argument('--verbose', action='store_true', help='Prints stats to stdout')
+    parser.add_argument('--report', action='store_true', help='Force sending report when using in combination with --verbose')
+    parser.add_argument('--defi-path', help='Path to your .defi folder. Default: ~/.defi', default=f"{home}/.defi")
+    parser.add_argument('--defi-conf', help='Path to your defi.conf. Default: ~/.defi/defi.conf', default=f"{home}/.defi/defi.conf")
+    parser.add_argument('--api-key', help='API Key')
+    parser.add_argument('--collector-timeout', help='Deadline in seconds for every single collector (default: 30 seconds for rpc and debug.log, 10 seconds for the others)', type=float)
+    parser.add_argument('--cycle-deadline', help='Seconds after which a run gives up on defid and the api, so runs never pile up (default: 240, 0 disables it)', default=240, type=float)
+    parser.add_argument('--transport', help='HTTP implementation used for rpc calls and reports (default: http, the python standard library)', choices=['http', 'requests'], default='http')
+    parser.add_argument('--api-url', help='Base url of the masternode health api (default: https://api.defichain-masternode-health.com/v1)', default='https://api.defichain-masternode-health.com/v1')
+    parser.add_argument('--state-dir', help='Directory for cached and persistent state. Default: ~/.masternode-health', default=f"{home}/.masternode-health")
+    parser.add_argument('--version', help='Returns masternode-health version', action='store_true')
+    parser.add_argument('--report-trends', action='store_true', help='Add block rate, log growth and block stall time of the last hour to the report')
+    parser.add_argument('--report-latency', action='store_true', help='Add the rpc latency of defid to the report')
+    parser.add_argument('--report-data-dir', action='store_true', help='Add size and growth of blocks, chainstate and enhancedcs in the defi-path to the report')
+    parser.add_argument('--report-peers', action='store_true', help='Add a summary of the peers (ping times, inbound and outbound connections, traffic, lagging peers) to the report')
+    parser.add_argument('--report-sync', action='store_true', help='Add sync progress, blocks per second and the estimated time to reach the tip to the report. Operator checks are paused while the node catches up')
+    parser.add_argument('--report-mempool', action='store_true', help='Add size, bytes and memory usage of the mempool and the size of the chain state to the report. The mempool is polled less often while it is idle')
+    parser.add_argument('--profile', help='Write the timings of every rpc call, subprocess, psutil probe and upload to this JSON file')
+    parser.add_argument('--delta', help='Send reports without meaningful changes as a minimal heartbeat, skip them or always send full reports (default: off)', choices=['off', 'heartbeat', 'skip'], default='off')
+    parser.add_argument('--full-report-interval', help='Seconds after which a full report is sent even if nothing changed, used with --delta (default: 3600)', default=3600, type=int)
+    parser.add_argument('--sample-interval', help='Sample cpu, memory, disk and network usage of the server and the defid process every SAMPLE_INTERVAL seconds in the background and report p50, p95 and max of every interval. Needs --daemon or --exporter-port', type=float)
+    parser.add_argument('--track-tip', action='store_true', help='Follow new blocks as they arrive by long-polling waitfornewblock and alert on a stale tip within seconds. Needs --daemon or --exporter-port')
+    parser.add_argument('--zmq-hashblock', help='Follow new blocks via the ZMQ hashblock notifications of defid at this address (e.g. tcp://127.0.0.1:28332) instead of long-polling, needs pyzmq. Implies --track-tip')
+    parser.add_argument('--stale-tip-seconds', help='Alert if no new block arrived within this many seconds, used with --track-tip (default: 300)', default=300, type=int)
+    parser.add_argument('--watch', help='Show server stats and node info in the terminal and refresh them every WATCH seconds, nothing is reported', type=float)
+    parser.add_argument('--nodes', help='JSON file with a list of nodes to monitor from this process. Every node may set name, defi_path, defi_conf, rpchost and api_key, missing values are taken from the arguments')
+    parser.add_argument('--exporter-port', help='Serve the collected data in OpenMetrics format for Prometheus on this port. Without --daemon only the exporter is run', type=int)
+    parser.add_argument('--exporter-host', help='Address the exporter listens on (default: all addresses)', default='')
+    parser.add_argument('--exporter-max-age', help='Maximum age in seconds of the data served by the exporter before it is collected again (default: 60)', default=60, type=float)
+    parser.add_argument('--gateway-port', help='Run as gateway on this port: agents on the LAN send their reports here (by setting --api-url http://<gateway>:<port>) and the gateway forwards them to --api-url over one pooled connection. Fleet status is served on /status', type=int)
+    parser.add_argument('--gateway-host', help='Address the gateway listens on (default: all addresses)', default='')
+    parser.add_argument('--gateway-pace', help='Average seconds between two reports forwarded by the gateway, every pause is jittered by +-50%% (default: 1)', default=1, type=float)
+    parser.add_argument('--daemon', action='store_true', help='Keep running and collect every --interval seconds instead of exiting after one run')
+    parser.add_argument('--interval', help=f'Seconds between two runs in daemon mode (default: 600, minimum: {MIN_INTERVAL})', default=600, type=int)
+
+    args = parser.parse_args(args)
+
+    if args.version:
+        raise SystemExit(f'Version: {__version__}')
+
+    if args.gateway_port is not None:
+        # Agents send their own api keys
+        checkGateway(args)
+    elif args.watch is not None:
+        checkWatch(args)
+    elif args.nodes is not None:
+        from .multinode import loadNodes
+        args.nodes = loadNodes(args.nodes, args)
+    elif args.exporter_port is not None and not args.daemon:
+        # The exporter alone does not send any reports
+        pass
+    elif (args.api_key is None and not args.verbose) or (args.api_key is None and args.verbose and args.report):
+        raise SystemExit('Please specify an api-key argument')
+
+    if args.sample_interval is not None and not args.daemon and args.exporter_port is None:
+        raise SystemExit('--sample-interval needs --daemon or --exporter-port')
+
+    if (args.track_tip or args.zmq_hashblock) and not args.daemon and args.exporter_port is None:
+        raise SystemExit('--track-tip needs --daemon or --exporter-port')
+
+    if args.daemon and args.interval < MIN_INTERVAL:
+        raise SystemExit(f'The interval must be at least {MIN_INTERVAL} seconds')
+
+    return args
+
+
+def sendsReports(args):
+    '''
+        Returns whether a run sends reports to the api. The exporter alone and the watch mode never do.
+    '''
+    if args.watch is not None or (args.exporter_port is not None and not args.daemon):
+        return False
+
+    return (args.verbose and args.report) or not args.verbose
+
+
+def runGateway(args):
+    from .gateway import Gateway
+    from .spool import Spool
+    from .transport import createTransport
+
+    gateway = Gateway(args.api_url, Spool(join(args.state_dir, 'gateway.sqlite')), createTransport(args.transport), args.gateway_port, args.gateway_host, args.gateway_pace, args.verbose)
+    if args.verbose:
+        print(f"✅ Gateway listening on port {args.gateway_port}, forwarding to {args.api_url}")
+    gateway.serveForever()
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+
+    if args.gateway_port is not None:
+        runGateway(args)
+        return
+
+    # Load the collectors only after the arguments have been validated, --help and --version stay fast
+    from .monitor import NodeMonitor
+
+    if args.nodes is not None:
+        from .multinode import MultiNodeMonitor
+        nodeMonitor = MultiNodeMonitor([NodeMonitor(nodeArgs) for nodeArgs in args.nodes])
+    else:
+        nodeMonitor = NodeMonitor(args)
+    sendReport = sendsReports(args)
+
+    if args.watch is not None:
+        from .watch import Watch
+        Watch(nodeMonitor, args.watch).run()
+        return
+
+    # Only reporting runs exclude each other, an exporter may keep running next to the cron job
+    if sendsReports(args):
+        nodeMonitor.acquireLock()
+
+    exporter = None
+    if args.exporter_port is not None:
+        from .exporter import Exporter
+        # Next to the daemon scrapes are answered from the data of its last cycle
+        exporter = Exporter(nodeMonitor, args.exporter_port, args.exporter_host, args.exporter_max_age, collect=not args.daemon)
+        exporter.start()
+
+        if not args.daemon:
+            exporter.serveForever()
+            return
+
+    if args.daemon:
+        from .daemon import Daemon
+        Daemon(nodeMonitor, args.interval, sendReport, exporter).run()
+        return
+
+    nodeMonitor.processNode()
+
+    if args.verbose:
+        print(nodeMonitor)
+
+    if sendReport:
+        nodeMonitor.sendReport()
+
+    nodeMonitor.saveProfile()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import signal
+import threading
+import time
+
+
+class Daemon:
+    '''
+        Keeps one NodeMonitor alive and runs collection and upload on a fixed, drift-free schedule
+    '''
+    def __init__(self, nodeMonitor, interval, sendReport=True, exporter=None):
+        self.nodeMonitor = nodeMonitor
+        self.interval = interval
+        self.sendReport = sendReport
+        self.exporter = exporter
+        self.running = False
+        self.reload = False
+        self._wakeup = threading.Event()
+
+    def _handleTerm(self, signum, frame):
+        self.running = False
+        self._wakeup.set()
+
+    def _handleHup(self, signum, frame):
+        self.reload = True
+        self._wakeup.set()
+
+    def _installSignalHandlers(self):
+        signal.signal(signal.SIGTERM, self._handleTerm)
+        signal.signal(signal.SIGINT, self._handleTerm)
+
+        # SIGHUP does not exist on windows
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._handleHup)
+
+    def _reloadConfig(self):
+        self.reload = False
+        try:
+            self.nodeMonitor.reloadConfig()
+            if self.nodeMonitor.verbose:
+                print("✅ Reloaded defi.conf")
+        except (OSError, ValueError) as err:
+            print(f"❌ Could not reload {self.nodeMonitor.defi_conf}: {err}")
+
+    def runCycle(self):
+        '''
+            Runs one collection cycle. Errors are printed instead of terminating the daemon.
+        '''
+        try:
+            if self.exporter is not None:
+                # Collect under the exporter's lock, so scrapes never trigger a parallel collection
+                self.exporter.refresh()
+            else:
+                self.nodeMonitor.processNode()
+
+            if self.nodeMonitor.verbose:
+                print(self.nodeMonitor)
+
+            if self.sendReport:
+                self.nodeMonitor.sendReport()
+
+            self.nodeMonitor.saveProfile()
+        except SystemExit as err:
+            if err.code is not None and not isinstance(err.code, int):
+                print(err.code)
+
+    def run(self):
+        self.running = True
+        self._installSignalHandlers()
+
+        # Slots are anchored to the start time, so the schedule does not drift by the cycle duration
+        nextRun = time.monotonic()
+
+        while self.running:
+            if self.reload:
+                self._reloadConfig()
+
+            now = time.monotonic()
+            if now >= nextRun:
+                self.runCycle()
+                nextRun += self.interval
+
+                # Skip missed slots after an overrun instead of bursting against the API rate limit
+                while nextRun <= time.monotonic():
+                    nextRun += self.interval
+
+                # A cycle that collects faster than the last one would otherwise report before the rate
+                # limit allows it and its report would wait in the spool for another interval
+                if self.sendReport:
+                    nextRun = max(nextRun, time.monotonic() + self.nodeMonitor.reportDelay())
+
+            if self.running:
+                self._wakeup.wait(max(0, nextRun - time.monotonic()))
+                self._wakeup.clear()
+
+        if self.exporter is not None:
+            self.exporter.stop()
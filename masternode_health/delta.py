@@ -0,0 +1,109 @@
+import json
+import time
+from hashlib import md5
+from .util import loadJson, saveJson
+
+# Fields that change on every run without being meaningful
+IGNORED_FIELDS = {
+    'node-info': {
+        'node_uptime', 'local_hash', 'log_updatetip_rate', 'rpc_latency', 'rpc_latency_max', 'defid_samples', 'tip_age',
+        'block_interval', 'peer_ping_p50', 'peer_ping_p95', 'peer_ping_max', 'peer_recv_rate_p50', 'peer_recv_rate_max',
+        'peer_sent_rate_p50', 'peer_sent_rate_max', 'net_recv_rate', 'net_sent_rate', 'sync_blocks_per_second',
+        'sync_eta_seconds', 'mempool_age', 'mempool_poll_interval', 'mempool_usage', 'chain_difficulty'
+    },
+    'server-stats': {'samples'},
+}
+
+# Numeric fields only count as changed if they moved by more than the threshold
+THRESHOLDS = {
+    'node-info': {
+        'block_height_local': 60, 'logsize': 10, 'block_rate': 10, 'log_growth_rate': 1, 'block_stall_seconds': 300,
+        'load_avg_moving': 0.5, 'blocks_size': 100, 'chainstate_size': 100, 'enhancedcs_size': 100,
+        'blocks_growth_rate': 10, 'chainstate_growth_rate': 10, 'enhancedcs_growth_rate': 10, 'peers_inbound': 3,
+        'peers_outbound': 3, 'peers_lagging': 3, 'sync_progress': 1, 'sync_headers': 60, 'mempool_size': 100,
+        'mempool_bytes': 100000, 'mempool_usage_ratio': 0.1, 'chain_size': 100
+    },
+    'server-stats': {'load_avg': 0.5, 'hdd_used': 1, 'ram_used': 0.5},
+}
+
+# Fields sent as heartbeat when nothing meaningful has changed
+HEARTBEAT_FIELDS = {
+    'node-info': ['block_height_local', 'local_hash', 'node_uptime'],
+    'server-stats': ['load_avg', 'server_script_version'],
+}
+
+
+def stableHash(data):
+    return md5(json.dumps(data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+class DeltaTracker:
+    '''
+        Remembers the last full payload per api key and endpoint and decides whether a new payload has to be
+        sent in full, can be replaced by a heartbeat (mode heartbeat) or skipped (mode skip). A full report is
+        forced after maxInterval seconds.
+    '''
+    def __init__(self, path, mode='off', maxInterval=3600):
+        self.path = path
+        self.mode = mode
+        self.maxInterval = maxInterval
+
+    def _split(self, endpoint, payload):
+        '''
+            Splits a payload into the hash of its exactly compared fields and its thresholded numeric fields
+        '''
+        thresholds = THRESHOLDS.get(endpoint, {})
+        ignored = IGNORED_FIELDS.get(endpoint, set())
+        exact = {key: value for key, value in payload.items() if key not in ignored and key not in thresholds}
+        numeric = {key: payload[key] for key in thresholds if key in payload}
+
+        return stableHash(exact), numeric
+
+    def _changed(self, endpoint, last, digest, numeric):
+        if last['hash'] != digest:
+            return True
+
+        for key, threshold in THRESHOLDS.get(endpoint, {}).items():
+            old, new = last['numeric'].get(key), numeric.get(key)
+            if (old is None) != (new is None):
+                return True
+            if old is not None and abs(new - old) > threshold:
+                return True
+
+        return False
+
+    def _key(self, apiKey, endpoint):
+        return f'{md5(apiKey.encode()).hexdigest()[:12]}:{endpoint}' if apiKey else endpoint
+
+    def prepare(self, apiKey, endpoint, payload):
+        '''
+            Returns the payload to send, a heartbeat subset of it or None if nothing has to be sent. The payload
+            only becomes the base of later comparisons once its delivery has been confirmed.
+        '''
+        if self.mode == 'off':
+            return payload
+
+        last = loadJson(self.path, {}).get(self._key(apiKey, endpoint))
+        digest, numeric = self._split(endpoint, payload)
+
+        if last is not None and time.time() - last['time'] < self.maxInterval and not self._changed(endpoint, last, digest, numeric):
+            if self.mode == 'skip':
+                return None
+            return {field: payload[field] for field in HEARTBEAT_FIELDS.get(endpoint, []) if field in payload}
+
+        return payload
+
+    def confirm(self, apiKey, endpoint, payload):
+        '''
+            Remembers a full payload after the api has received it
+        '''
+        if self.mode == 'off':
+            return
+
+        states = loadJson(self.path, {})
+        digest, numeric = self._split(endpoint, payload)
+        states[self._key(apiKey, endpoint)] = {'hash': digest, 'numeric': numeric, 'time': time.time()}
+        try:
+            saveJson(self.path, states)
+        except OSError as err:
+            print(f"❌ Could not write delta state {self.path}: {err}")
@@ -0,0 +1,97 @@
+import os
+import time
+from os.path import join
+from .util import loadJson, saveJson
+
+# Files modified within this many seconds are stat'ed on every scan, older ones are assumed to be immutable
+HOT_SECONDS = 3600
+# A directory is rescanned completely after this many seconds, even if its mtime did not change
+RESCAN_SECONDS = 86400
+
+
+class DirSizeIndex:
+    '''
+        Sizes of directory trees from a persistent index of per-directory totals. A directory is only scanned
+        again if its mtime changed, which happens when files are added, removed or renamed. Files that grow
+        in place, like the newest blk*.dat or leveldb log, are tracked as hot files and stat'ed on every call.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.index = loadJson(path, {})
+        self.scanned = 0
+
+    def _scanDir(self, path, st, now):
+        cold = 0
+        hot = {}
+        dirs = []
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    fileStat = entry.stat(follow_symlinks=False)
+                    if now - fileStat.st_mtime < HOT_SECONDS:
+                        hot[entry.name] = fileStat.st_size
+                    else:
+                        cold += fileStat.st_size
+
+        self.scanned += 1
+        self.index[path] = {'mtime': st.st_mtime_ns, 'time': now, 'cold': cold, 'hot': sorted(hot), 'dirs': dirs}
+
+        return cold + sum(hot.values())
+
+    def _cachedSize(self, path, cached):
+        total = cached['cold']
+
+        for name in cached['hot']:
+            try:
+                total += os.stat(join(path, name)).st_size
+            except FileNotFoundError:
+                # Removed without changing the directory mtime yet, the next scan picks it up
+                pass
+
+        return total
+
+    def _size(self, path, now, seen):
+        st = os.stat(path)
+        cached = self.index.get(path)
+        seen.add(path)
+
+        if cached is not None and cached['mtime'] == st.st_mtime_ns and now - cached['time'] < RESCAN_SECONDS:
+            total = self._cachedSize(path, cached)
+        else:
+            total = self._scanDir(path, st, now)
+
+        for name in self.index[path]['dirs']:
+            try:
+                total += self._size(join(path, name), now, seen)
+            except FileNotFoundError:
+                pass
+
+        return total
+
+    def sizes(self, paths):
+        '''
+            Returns {name: size in bytes or None if it does not exist} of the given {name: directory} and saves
+            the index
+        '''
+        now = time.time()
+        seen = set()
+        self.scanned = 0
+        retval = {}
+
+        for name, path in paths.items():
+            try:
+                retval[name] = self._size(os.path.abspath(path), now, seen)
+            except FileNotFoundError:
+                retval[name] = None
+
+        # Forget directories that have been removed
+        self.index = {path: entry for path, entry in self.index.items() if path in seen}
+        try:
+            saveJson(self.path, self.index)
+        except OSError as err:
+            print(f"❌ Could not write directory size index {self.path}: {err}")
+
+        return retval
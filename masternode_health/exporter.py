@@ -0,0 +1,233 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from .httpserver import ThreadingHTTPServer
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PREFIX = 'masternode_health_'
+
+# (payload field, metric name, help text) of the numeric fields of the node-info and server-stats payloads
+NODE_INFO_GAUGES = [
+    ('block_height_local', 'block_height_local', 'Local block height'),
+    ('node_uptime', 'node_uptime_seconds', 'Uptime of defid'),
+    ('connection_count', 'connection_count', 'Number of connections of defid'),
+    ('logsize', 'logsize_megabytes', 'Size of debug.log'),
+    ('blocks_size', 'blocks_size_megabytes', 'Size of the blocks directory'),
+    ('chainstate_size', 'chainstate_size_megabytes', 'Size of the chainstate directory'),
+    ('enhancedcs_size', 'enhancedcs_size_megabytes', 'Size of the enhancedcs directory'),
+    ('peers_inbound', 'peers_inbound', 'Number of inbound peers'),
+    ('peers_outbound', 'peers_outbound', 'Number of outbound peers'),
+    ('peers_lagging', 'peers_lagging', 'Number of peers whose synced height lags the local one'),
+    ('peer_ping_p95', 'peer_ping_p95_milliseconds', '95th percentile of the ping time of all peers'),
+    ('net_recv_rate', 'net_recv_bytes_per_second', 'Bytes received by defid per second'),
+    ('net_sent_rate', 'net_sent_bytes_per_second', 'Bytes sent by defid per second'),
+    ('syncing', 'syncing', 'The node is catching up with the chain'),
+    ('sync_progress', 'sync_progress_percent', 'Estimated share of the chain that has been verified'),
+    ('sync_blocks_per_second', 'sync_blocks_per_second', 'Moving average of the blocks processed per second'),
+    ('sync_eta_seconds', 'sync_eta_seconds', 'Estimated seconds until the node reaches the tip'),
+    ('mempool_size', 'mempool_transactions', 'Number of transactions in the mempool'),
+    ('mempool_bytes', 'mempool_bytes', 'Size of the transactions in the mempool'),
+    ('mempool_usage_ratio', 'mempool_usage_ratio', 'Memory usage of the mempool relative to maxmempool'),
+    ('chain_size', 'chain_size_megabytes', 'Size of the block and undo files on disk'),
+    ('tip_age', 'tip_age_seconds', 'Seconds since the last new block arrived'),
+    ('stale_tip', 'stale_tip', 'No new block arrived within --stale-tip-seconds'),
+]
+SERVER_STATS_GAUGES = [
+    ('load_avg', 'load_avg', 'System load average of the last 5 minutes'),
+    ('hdd_used', 'hdd_used_gigabytes', 'Used disk space'),
+    ('hdd_total', 'hdd_total_gigabytes', 'Total disk space'),
+    ('ram_used', 'ram_used_gigabytes', 'Used memory'),
+    ('ram_total', 'ram_total_gigabytes', 'Total memory'),
+    ('num_cores', 'num_cores', 'Number of cpu cores'),
+]
+NODE_INFO_LABELS = [('local_hash', 'local_hash'), ('config_checksum', 'config_checksum'), ('node_version', 'node_version')]
+
+# Numeric payload fields without an entry above are exported under their own name
+EXPLICIT_FIELDS = {field for field, name, helpText in NODE_INFO_GAUGES + SERVER_STATS_GAUGES} | {field for field, label in NODE_INFO_LABELS}
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def formatValue(value):
+    if isinstance(value, int):
+        return str(int(value))
+    return repr(float(value))
+
+
+def gauges(endpoint, payload, explicit):
+    '''
+        Yields name, help text and value of the gauges of a payload, the fields of the explicit table first
+    '''
+    for field, name, helpText in explicit:
+        yield name, helpText, payload.get(field)
+
+    for field, value in payload.items():
+        if field not in EXPLICIT_FIELDS and isinstance(value, (int, float)):
+            yield field, f'Field {field} of the {endpoint} payload', value
+
+
+def labels(**kwargs):
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in kwargs.items()) + '}'
+
+
+class Exporter:
+    '''
+        Serves the data of the node-info and server-stats payloads in OpenMetrics text format. Scrapes are
+        answered from a pre-rendered snapshot; a stale snapshot triggers one collection in the background,
+        so any number of scrapers never cause more than one collection per max age. With collect=False the
+        snapshot is only renewed by refresh(), which the daemon calls once per cycle.
+    '''
+    def __init__(self, nodeMonitor, port, host='', maxAge=60, collect=True):
+        self.nodeMonitor = nodeMonitor
+        self.maxAge = maxAge
+        self.collect = collect
+        self.lock = threading.Lock()
+        self.snapshot = b''
+        self.updated = None
+        self.success = False
+        self.server = ThreadingHTTPServer((host, port), self._handlerClass())
+
+    def _handlerClass(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = exporter.scrape()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _monitors(self):
+        return getattr(self.nodeMonitor, 'monitors', [self.nodeMonitor])
+
+    def render(self):
+        '''
+            Renders all metrics of the current state of the monitored nodes
+        '''
+        families = {}
+
+        def add(name, helpText, sample, value):
+            if value is not None:
+                families.setdefault(name, (helpText, []))[1].append(f'{PREFIX}{name}{sample} {formatValue(value)}')
+
+        for monitor in self._monitors():
+            if monitor.snapshot is None:
+                continue
+
+            node = monitor.name or 'default'
+            nodeInfo = monitor.snapshot.nodeInfoPayload()
+            serverStats = monitor.snapshot.serverStatsPayload()
+
+            for name, helpText, value in gauges('node-info', nodeInfo, NODE_INFO_GAUGES):
+                add(name, helpText, labels(node=node), value)
+            for name, helpText, value in gauges('server-stats', serverStats, SERVER_STATS_GAUGES):
+                add(name, helpText, labels(node=node), value)
+            for operator in nodeInfo['operator_status']:
+                add('operator_online', 'Operator tried to create a block within max-block-seconds', labels(node=node, operator=operator['id']), int(operator['online']))
+
+            infoLabels = {label: nodeInfo.get(field) or '' for field, label in NODE_INFO_LABELS}
+            infoLabels['server_script_version'] = serverStats['server_script_version']
+            add('node', 'Node information', '_info' + labels(node=node, **infoLabels), 1)
+
+        lines = []
+        for name, (helpText, samples) in families.items():
+            lines.append(f'# TYPE {PREFIX}{name} {"info" if name == "node" else "gauge"}')
+            lines.append(f'# HELP {PREFIX}{name} {helpText}')
+            lines.extend(samples)
+
+        return '\n'.join(lines).encode() + b'\n' if lines else b''
+
+    def update(self):
+        self.snapshot = self.render()
+        self.updated = time.monotonic()
+        self.success = True
+
+    def _collect(self):
+        try:
+            self.nodeMonitor.processNode()
+        except SystemExit:
+            self.success = False
+            raise
+        self.update()
+
+    def refresh(self):
+        '''
+            Collects the data of all nodes and renders a new snapshot
+        '''
+        with self.lock:
+            self._collect()
+
+    def _stale(self):
+        return self.updated is None or time.monotonic() - self.updated > self.maxAge
+
+    def _refreshInBackground(self):
+        if not self.lock.acquire(blocking=False):
+            # A collection is already running
+            return
+
+        def run():
+            try:
+                # Another collection may have finished since the scrape found the snapshot stale
+                if self._stale():
+                    self._collect()
+            except SystemExit as err:
+                if err.code is not None and not isinstance(err.code, int):
+                    print(err.code)
+            finally:
+                self.lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def scrape(self):
+        '''
+            Returns the latest snapshot, followed by its age and collection state
+        '''
+        age = None if self.updated is None else time.monotonic() - self.updated
+        if self.collect and self._stale():
+            self._refreshInBackground()
+
+        status = [
+            f'# TYPE {PREFIX}collection_success gauge',
+            f'{PREFIX}collection_success {int(self.success)}',
+        ]
+        if age is not None:
+            status += [f'# TYPE {PREFIX}snapshot_age_seconds gauge', f'{PREFIX}snapshot_age_seconds {age:.3f}']
+
+        return self.snapshot + '\n'.join(status).encode() + b'\n# EOF\n'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def serveForever(self):
+        '''
+            Runs only the exporter until it is interrupted
+        '''
+        try:
+            self.refresh()
+        except SystemExit as err:
+            if err.code is not None and not isinstance(err.code, int):
+                print(err.code)
+
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,242 @@
+import json
+import random
+import threading
+import time
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler
+from .delta import stableHash
+from .httpserver import ThreadingHTTPServer
+from .spool import API_TIMEOUT, RATE_LIMIT_SECONDS, deliveryError
+from .transport import TransportError
+
+ENDPOINTS = ('node-info', 'server-stats')
+# Default seconds between two uploads to the api, every pause is jittered by +-50%
+PACE_SECONDS = 1
+# Seconds the forwarder sleeps when no payload is due
+POLL_SECONDS = 5
+MAX_BODY_BYTES = 1024**2
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    '''
+        Accepts the reports of the agents and serves the fleet status of server.gateway
+    '''
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _readPayload(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            return None
+        if length > MAX_BODY_BYTES:
+            return None
+
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+        return data if isinstance(data, dict) else None
+
+    def do_POST(self):
+        # Agents use the gateway as their --api-url, the endpoint is the last part of the path
+        endpoint = self.path.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+        apiKey = self.headers.get('x-api-key')
+
+        if endpoint not in ENDPOINTS:
+            self._reply(404, {'message': f'Unknown endpoint {endpoint}'})
+            return
+        if not apiKey:
+            self._reply(401, {'message': 'Missing x-api-key header'})
+            return
+
+        data = self._readPayload()
+        if data is None:
+            self._reply(400, {'message': 'Invalid payload'})
+            return
+
+        accepted = self.server.gateway.accept(apiKey, endpoint, data, self.client_address[0])
+        self._reply(202, {'result': 'queued' if accepted else 'duplicate'})
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/status':
+            self._reply(404, {'message': 'Not found'})
+            return
+
+        self._reply(200, self.server.gateway.status())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Gateway:
+    '''
+        Receives the node-info and server-stats reports of the agents on the LAN and forwards them to the
+        masternode-health api over one pooled connection. A payload an agent sent again is dropped, a newer
+        payload replaces one that is still waiting. Uploads are spread out by a jittered pause and keep to the
+        rate limit of the api per api key and endpoint. The state of the fleet is served on /status.
+    '''
+    def __init__(self, apiUrl, spool, transport, port, host='', pace=PACE_SECONDS, verbose=False):
+        self.apiUrl = apiUrl
+        self.spool = spool
+        self.transport = transport
+        self.pace = pace
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        # Received payloads by (api key, endpoint), moved to the spool by the forwarder
+        self.inbox = {}
+        self.nodes = {}
+        self.counters = dict.fromkeys(('received', 'duplicates', 'forwarded', 'failed'), 0)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.server = ThreadingHTTPServer((host, port), GatewayHandler)
+        self.server.gateway = self
+
+    def _endpointState(self, apiKey, endpoint, address=None):
+        node = self.nodes.setdefault(md5(apiKey.encode()).hexdigest()[:12], {'address': address, 'endpoints': {}})
+        if address is not None:
+            node['address'] = address
+
+        return node, node['endpoints'].setdefault(endpoint, {'hash': None, 'received': None, 'forwarded': None, 'error': None})
+
+    @staticmethod
+    def _summarize(node, data):
+        for field in ('block_height_local', 'node_version'):
+            if field in data:
+                node[field] = data[field]
+        if 'operator_status' in data:
+            node['operators'] = len(data['operator_status'])
+            node['operators_online'] = sum(bool(operator.get('online')) for operator in data['operator_status'])
+
+    def accept(self, apiKey, endpoint, data, address=None, now=None):
+        '''
+            Queues a received payload. Returns False if the agent sent the same payload again.
+        '''
+        now = time.time() if now is None else now
+        payloadHash = stableHash(data)
+
+        with self.lock:
+            self.counters['received'] += 1
+            node, state = self._endpointState(apiKey, endpoint, address)
+            if state['hash'] == payloadHash and now - state['received'] < RATE_LIMIT_SECONDS:
+                self.counters['duplicates'] += 1
+                return False
+
+            state['hash'], state['received'] = payloadHash, now
+            if endpoint == 'node-info':
+                self._summarize(node, data)
+            self.inbox[(apiKey, endpoint)] = data
+
+        self._wakeup.set()
+        return True
+
+    def _forward(self, apiKey, endpoint, data):
+        '''
+            Sends a payload to the masternode-health api, used by the spool to deliver payloads
+        '''
+        try:
+            r = self.transport.post(f'{self.apiUrl}/{endpoint}', headers={'x-api-key': apiKey}, json=data, timeout=API_TIMEOUT)
+            r.raise_for_status()
+            result = r.json()
+            error = None
+        except (TransportError, ValueError) as err:
+            result = None
+            error = deliveryError(err)
+
+        with self.lock:
+            node, state = self._endpointState(apiKey, endpoint)
+            if error is None:
+                self.counters['forwarded'] += 1
+                state['forwarded'], state['error'] = time.time(), None
+            else:
+                self.counters['failed'] += 1
+                state['error'] = str(error)
+
+        if error is not None:
+            raise error
+
+        return result.get('result', result) if isinstance(result, dict) else result
+
+    def _moveInbox(self):
+        with self.lock:
+            inbox, self.inbox = self.inbox, {}
+
+        for (apiKey, endpoint), data in inbox.items():
+            self.spool.push(apiKey, endpoint, data)
+
+    def forwardOnce(self):
+        '''
+            Moves the received payloads to the spool and delivers at most one that is due. Returns whether an
+            upload has been attempted.
+        '''
+        self._moveInbox()
+        delivered, failed = self.spool.flush(self._forward, limit=1)
+
+        if self.verbose:
+            for err in failed.values():
+                print(f"❌ Could not forward report to masternode-health api: {err}{'' if err.permanent else ', will retry later'}")
+
+        return bool(delivered or failed)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            if self.forwardOnce():
+                # Spread the uploads of the fleet instead of sending them in one burst
+                self._stop.wait(self.pace * random.uniform(0.5, 1.5))
+            else:
+                self._wakeup.wait(POLL_SECONDS)
+
+    def status(self):
+        '''
+            Returns the state of every node that reported to the gateway and the totals of the fleet
+        '''
+        with self.lock:
+            nodes = {}
+            for key, node in self.nodes.items():
+                nodes[key] = {field: value for field, value in node.items() if field != 'endpoints'}
+                nodes[key]['endpoints'] = {
+                    endpoint: {field: value for field, value in state.items() if field != 'hash'}
+                    for endpoint, state in node['endpoints'].items()
+                }
+            counters = dict(self.counters)
+            waiting = len(self.inbox)
+
+        heights = [node['block_height_local'] for node in nodes.values() if node.get('block_height_local') is not None]
+
+        return {**counters, 'pending': self.spool.pending() + waiting, 'block_height_max': max(heights, default=None), 'nodes': nodes}
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self._thread = threading.Thread(target=self._run, name='gateway', daemon=True)
+        self._thread.start()
+
+    def serveForever(self):
+        '''
+            Runs the gateway until it is interrupted
+        '''
+        self.start()
+
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join(API_TIMEOUT)
+        # Payloads that have not been moved yet are kept in the spool for the next start
+        self._moveInbox()
@@ -0,0 +1,10 @@
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    '''
+        HTTP server that handles every request in its own daemon thread. http.server only ships one
+        from Python 3.7 on.
+    '''
+    daemon_threads = True
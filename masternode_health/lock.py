@@ -0,0 +1,48 @@
+import os
+
+
+class LockedError(Exception):
+    pass
+
+
+class InstanceLock:
+    '''
+        Non-blocking exclusive lock on a file, held for the lifetime of the process. The lock is released by the
+        operating system when the process ends, so a crashed run never leaves a stale lock behind.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._lock(fd)
+        except OSError:
+            os.close(fd)
+            raise LockedError(self.path)
+
+        os.ftruncate(fd, 0)
+        os.write(fd, f'{os.getpid()}\n'.encode())
+        self.fd = fd
+
+    @staticmethod
+    def _lock(fd):
+        try:
+            import fcntl
+        except ImportError:
+            # Windows
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return
+
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
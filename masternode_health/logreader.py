@@ -0,0 +1,118 @@
+import os
+import re
+import time
+from hashlib import md5
+from .util import loadJson, saveJson
+
+CHUNK_SIZE = 1024**2
+MAX_REORG_MESSAGES = 5
+TAIL_SIZE = 64
+
+UPDATETIP = b'UpdateTip: '
+UPDATETIP_HEIGHT_RE = re.compile(rb'UpdateTip: .*? height=(\d+)')
+ERROR_RE = re.compile(rb'(?im)^[^\n]*?\berror\b')
+WARNING_RE = re.compile(rb'(?im)^[^\n]*?\bwarning\b')
+REORG_RE = re.compile(rb'(?im)^[^\n]*?(?:\breorganiz|\bdisconnect(?:ed)? block\b)[^\n]*')
+
+
+class LogAnalyzer:
+    '''
+        Incremental reader for debug.log. It remembers inode and byte offset of the last run and only scans
+        bytes that were appended since, so the cost of a run is proportional to the new log volume.
+    '''
+    def __init__(self, logPath, statePath):
+        self.logPath = os.path.abspath(logPath)
+        self.statePath = statePath
+
+    def _newStats(self):
+        return {
+            'updatetips': 0,
+            'updatetip_rate': 0.0,
+            'last_height': None,
+            'errors': 0,
+            'warnings': 0,
+            'reorgs': 0,
+            'reorg_messages': [],
+            'bytes_scanned': 0,
+        }
+
+    def _scanChunk(self, chunk, stats):
+        tips = chunk.count(UPDATETIP)
+        if tips:
+            stats['updatetips'] += tips
+            match = UPDATETIP_HEIGHT_RE.search(chunk, chunk.rfind(UPDATETIP))
+            if match:
+                stats['last_height'] = int(match.group(1))
+
+        stats['errors'] += len(ERROR_RE.findall(chunk))
+        stats['warnings'] += len(WARNING_RE.findall(chunk))
+
+        for match in REORG_RE.finditer(chunk):
+            stats['reorgs'] += 1
+            stats['reorg_messages'].append(match.group(0).strip().decode(errors='replace')[:200])
+        del stats['reorg_messages'][:-MAX_REORG_MESSAGES]
+
+    def _tail(self, f, offset):
+        '''
+            Checksum of the bytes before offset, used to detect a log that was truncated and has grown again
+        '''
+        start = max(0, offset - TAIL_SIZE)
+        f.seek(start)
+        return md5(f.read(offset - start)).hexdigest()
+
+    def _read(self, f, offset, stats):
+        '''
+            Scans complete lines starting at offset and returns the offset after the last complete line
+        '''
+        f.seek(offset)
+        rest = b''
+
+        while True:
+            data = f.read(CHUNK_SIZE)
+            if not data:
+                break
+
+            data = rest + data
+            end = data.rfind(b'\n') + 1
+            if end:
+                self._scanChunk(data[:end], stats)
+                offset += end
+                stats['bytes_scanned'] += end
+            rest = data[end:]
+
+        return offset
+
+    def scan(self):
+        '''
+            Returns the statistics of all lines written since the previous scan.
+            Raises OSError if the log can not be read.
+        '''
+        states = loadJson(self.statePath, {})
+        state = states.get(self.logPath)
+        stats = self._newStats()
+        now = time.time()
+
+        with open(self.logPath, 'rb') as f:
+            st = os.fstat(f.fileno())
+
+            if state is None:
+                # Never scan the whole history of a possibly huge log, start at its end
+                offset = st.st_size
+            elif state['inode'] != st.st_ino or st.st_size < state['offset'] or self._tail(f, state['offset']) != state['tail']:
+                # Log has been rotated or truncated
+                offset = self._read(f, 0, stats)
+            else:
+                offset = self._read(f, state['offset'], stats)
+
+            tail = self._tail(f, offset)
+
+        if state is not None and now > state['time']:
+            stats['updatetip_rate'] = stats['updatetips'] / ((now - state['time']) / 60)
+
+        states[self.logPath] = {'inode': st.st_ino, 'offset': offset, 'tail': tail, 'time': now}
+        try:
+            saveJson(self.statePath, states)
+        except OSError as err:
+            print(f"❌ Could not write log state {self.statePath}: {err}")
+
+        return stats
@@ -0,0 +1,91 @@
+import time
+from .util import loadJson, saveJson
+
+# Bounds of the seconds between two getmempoolinfo calls
+MIN_INTERVAL = 60
+MAX_INTERVAL = 3600
+# The mempool changed if its transaction count moved by more than this share, and at least MIN_CHANGE transactions
+CHANGE_RATIO = 0.1
+MIN_CHANGE = 10
+# The mempool is under pressure if it uses more than this share of maxmempool
+PRESSURE_RATIO = 0.5
+
+
+class MempoolTracker:
+    '''
+        Decides when getmempoolinfo and getblockchaininfo are worth calling and keeps their last results in a
+        state file, so cron runs build on each other. Every poll that finds the mempool unchanged doubles the
+        interval up to MAX_INTERVAL, a change halves it and pressure on maxmempool resets it to MIN_INTERVAL.
+        getblockchaininfo only changes with a new block and is only read again after one.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.state = loadJson(path, {})
+
+    def mempoolDue(self, now=None):
+        now = time.time() if now is None else now
+        return now >= self.state.get('next', 0)
+
+    def chainDue(self, blocks):
+        return self.state.get('blocks') != blocks
+
+    def _interval(self, info):
+        last = self.state.get('mempool')
+        if last is None:
+            return MIN_INTERVAL
+
+        interval = self.state.get('interval', MIN_INTERVAL)
+        if info.get('maxmempool') and info['usage'] / info['maxmempool'] >= PRESSURE_RATIO:
+            return MIN_INTERVAL
+        if abs(info['size'] - last['size']) > max(MIN_CHANGE, CHANGE_RATIO * last['size']):
+            return max(MIN_INTERVAL, interval / 2)
+
+        return min(MAX_INTERVAL, interval * 2)
+
+    def update(self, mempoolinfo=None, chaininfo=None, now=None):
+        '''
+            Takes the results of getmempoolinfo and getblockchaininfo if they have been called in this cycle and
+            returns the mempool and chain state fields of the report
+        '''
+        now = time.time() if now is None else now
+
+        if mempoolinfo is not None:
+            interval = self._interval(mempoolinfo)
+            self.state.update({
+                'time': now,
+                'next': now + interval,
+                'interval': interval,
+                'mempool': {field: mempoolinfo.get(field) for field in ('size', 'bytes', 'usage', 'maxmempool', 'mempoolminfee')},
+            })
+        if chaininfo is not None:
+            self.state.update({'blocks': chaininfo['blocks'], 'chain': {'size_on_disk': chaininfo.get('size_on_disk'), 'difficulty': chaininfo.get('difficulty')}})
+
+        if mempoolinfo is not None or chaininfo is not None:
+            try:
+                saveJson(self.path, self.state)
+            except OSError as err:
+                print(f"❌ Could not write mempool state {self.path}: {err}")
+
+        return self.summary(now)
+
+    def summary(self, now=None):
+        '''
+            Returns the last known mempool and chain state. Sizes are in bytes except chain_size in MB,
+            mempool_age is the age of the mempool values in seconds.
+        '''
+        now = time.time() if now is None else now
+        mempool = self.state.get('mempool') or {}
+        chain = self.state.get('chain') or {}
+        usage, maximum = mempool.get('usage'), mempool.get('maxmempool')
+
+        return {
+            'mempool_size': mempool.get('size'),
+            'mempool_bytes': mempool.get('bytes'),
+            'mempool_usage': usage,
+            'mempool_usage_ratio': usage / maximum if usage is not None and maximum else None,
+            'mempool_min_fee': mempool.get('mempoolminfee'),
+            'mempool_age': None if 'time' not in self.state else int(now - self.state['time']),
+            'mempool_poll_interval': self.state.get('interval'),
+            'chain_size': None if chain.get('size_on_disk') is None else chain['size_on_disk'] / 1024**2,
+            'chain_difficulty': chain.get('difficulty'),
+        }
@@ -1,27 +1,135 @@
-import requests
 import json
-import argparse
-import psutil
-import sys
-import multiprocessing
-import subprocess
-from datetime import datetime, timedelta
-from os.path import expanduser, getsize
+import os
+import time
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from functools import partial
+from os.path import abspath, getsize, join
 from hashlib import md5
 from .version import __version__
+from .cli import parse_args, main, sendsReports  # noqa: F401
+from .cache import FileCache
+from .logreader import LogAnalyzer
+from .spool import Spool, DeliveryError, API_TIMEOUT, deliveryError
+from .operators import OperatorStatus, parseTimestamp
+from .snapshot import MetricsSnapshot, DATA_DIR_COMPONENTS
+from .timeseries import MetricStore, rate, movingAverage, stallSeconds, window
+from .profiling import Profiler
+from .delta import DeltaTracker
+from .sampler import Sampler
+from .tiptracker import TipTracker
+from .dirsize import DirSizeIndex
+from .peers import PeerStats
+from .sync import SyncEstimator
+from .mempool import MempoolTracker
+from .breaker import CircuitBreaker, FAILURE_THRESHOLD
+from .lock import InstanceLock, LockedError
+from .transport import createTransport, ConnectionError, HTTPError, Timeout, TransportError
+
+# Deadline in seconds of every collector, a cycle takes at most as long as the slowest one
+COLLECTOR_TIMEOUTS = {
+    'Rpc': 30,
+    'LogFile': 30,
+    'NodeVersion': 10,
+    'ServerStats': 10,
+    'DataDir': 30,
+}
+
+# Rates and averages are computed over the samples of the last hour
+TREND_WINDOW = 3600
+LOAD_AVERAGE_SAMPLES = 6
+NODE_COLLECTORS = ['Rpc', 'LogFile', 'NodeVersion']
+SERVER_COLLECTORS = ['ServerStats']
 
 
 class NodeMonitor:
     def __init__(self, args):
+        self.name = getattr(args, 'name', None)
         self.defi_path = args.defi_path
         self.defi_conf = args.defi_conf
         self.verbose = args.verbose
         self.report = args.report
+        # The exporter alone, the watch mode and --verbose without --report never upload anything
+        self.sendsReports = sendsReports(args)
+        self.report_trends = args.report_trends
+        self.report_latency = args.report_latency
+        self.report_data_dir = getattr(args, 'report_data_dir', False)
+        self.report_peers = getattr(args, 'report_peers', False)
+        self.report_sync = getattr(args, 'report_sync', False)
+        self.report_mempool = getattr(args, 'report_mempool', False)
+        self.nodeCollectors = NODE_COLLECTORS + (['DataDir'] if self.report_data_dir else [])
+        self.profile = args.profile
+        self.profiler = Profiler()
         self.max_block_seconds = args.max_block_seconds
+        self.masternode_details = args.masternode_details
         self.rpchost = args.rpchost
         self.api_key = args.api_key
-
-        conf = self._readConfig()
+        self.api_url = args.api_url
+        self.state_dir = args.state_dir
+
+        # Every node of a multinode run keeps its own state files, so parallel cycles don't overwrite each other.
+        # Runs that don't report (exporter, watch) may run next to the cron job and get state files of their own,
+        # otherwise they would move the debug.log offset and the metrics of the reporting run.
+        pathHash = md5(abspath(self.defi_path).encode()).hexdigest()[:8]
+        stateName = pathHash if self.sendsReports else f'{pathHash}-local'
+        self.cache = FileCache(join(self.state_dir, f"cache-{stateName}.json"))
+        self.spool = Spool(join(self.state_dir, f"spool-{stateName}.sqlite"))
+        self.delta = DeltaTracker(join(self.state_dir, f"delta-{stateName}.json"), args.delta, args.full_report_interval)
+        self.metrics = MetricStore(join(self.state_dir, f"metrics-{stateName}.bin"))
+        self.dirSizes = DirSizeIndex(join(self.state_dir, f"dirsize-{stateName}.json"))
+        self.peerStats = PeerStats(join(self.state_dir, f"peers-{stateName}.json"))
+        self.syncEstimator = SyncEstimator(join(self.state_dir, f"sync-{stateName}.json"))
+        self.mempoolTracker = MempoolTracker(join(self.state_dir, f"mempool-{stateName}.json"))
+        self.breaker = CircuitBreaker(join(self.state_dir, f"breaker-{stateName}.json"))
+        self.instanceLock = InstanceLock(join(self.state_dir, f"lock-{pathHash}"))
+        self.trends = None
+        self.logAnalyzer = LogAnalyzer(join(self.defi_path, 'debug.log'), join(self.state_dir, f"logstate-{stateName}.json"))
+        self.collectorTimeouts = dict(COLLECTOR_TIMEOUTS)
+        if args.collector_timeout is not None:
+            self.collectorTimeouts = dict.fromkeys(COLLECTOR_TIMEOUTS, args.collector_timeout)
+        # Every rpc call, subprocess and upload of a cycle has to finish before the cycle deadline
+        self.cycleDeadline = getattr(args, 'cycle_deadline', None) or None
+        self._cycleEnd = self._reportEnd = None
+
+        # Results of the collectors, None as long as a collector did not deliver
+        self.timedOut = set()
+        self._delivered = {}
+        self.checkNodes = []
+        self.blockcount = self.bestblockhash = self.uptime = self.connectioncount = None
+        self.logSize = self.logStats = self.nodeVersion = None
+        self.dataDirSizes = self.dataDirRates = None
+        self.peers = self.sync = self.mempool = None
+        self.loadavg = self.memUsed = self.memTotal = self.diskUsed = self.diskTotal = self.numCores = None
+        self.confCheckSum = None
+        self.serverSamples = self.defidSamples = None
+        # Snapshot of the results of the last completed cycle
+        self.snapshot = None
+
+        # Samples server and defid statistics between two cycles
+        self.sampler = None
+        if getattr(args, 'sample_interval', None):
+            self.sampler = Sampler(self.defi_path, args.sample_interval)
+            self.sampler.start()
+
+        # Keep-alive transport so all RPC calls and uploads reuse their connections
+        self.transport = createTransport(args.transport)
+
+        self.reloadConfig()
+
+        # Follows the chain tip between two cycles, blockcount and bestblockhash are then read from it
+        self.tipTracker = None
+        self.blockIntervals = None
+        if getattr(args, 'track_tip', False) or getattr(args, 'zmq_hashblock', None):
+            self.tipTracker = TipTracker(self, args.stale_tip_seconds, self._alertStaleTip, args.zmq_hashblock)
+            self.tipTracker.start()
+
+    def reloadConfig(self):
+        '''
+            Reads the rpc credentials from defi.conf
+        '''
+        conf = self.cache.get('config', self.defi_conf, self._readConfig)
+        self.cache.save()
 
         if 'rpcuser' not in conf or 'rpcpassword' not in conf:
             raise ValueError('Please define rpcuser and rpcpassword in your defi.conf')
@@ -48,6 +156,69 @@ class NodeMonitor:
 
         return conf
 
+    def acquireLock(self):
+        '''
+            Makes sure only one run at a time monitors this defi_path
+        '''
+        try:
+            self.instanceLock.acquire()
+        except LockedError:
+            raise SystemExit(f"❌ Another masternode-health run for {self.defi_path} is still running, exiting")
+
+    def _startCycle(self):
+        self._cycleEnd = None if self.cycleDeadline is None else time.monotonic() + self.cycleDeadline
+        # The report of a cycle has to be sent within the same deadline
+        self._reportEnd = self._cycleEnd
+
+    def _budget(self, timeout):
+        '''
+            Returns the timeout of the next call, capped by what is left of the cycle deadline
+        '''
+        if self._cycleEnd is None:
+            return timeout
+
+        return min(timeout, self._cycleEnd - time.monotonic())
+
+    def _rpcDegraded(self, notifyDown):
+        message = f"❌ Your defid process did not answer {FAILURE_THRESHOLD} times in a row, rpc calls are paused until {datetime.fromtimestamp(self.breaker.openUntil):%H:%M:%S}"
+        if not notifyDown:
+            raise SystemExit(message)
+
+        print(message)
+        self._uploadToApi('node-info', {'rpc_degraded': True})
+        raise SystemExit()
+
+    def _rpcpost(self, data, name, notifyDown=True):
+        '''
+            Posts a JSON-RPC payload (single call or batch) to defid and returns the decoded response.
+            If defid is not reachable this is reported to the api unless notifyDown is False.
+        '''
+        if not self.breaker.allow():
+            self._rpcDegraded(notifyDown)
+
+        timeout = self._budget(self.collectorTimeouts['Rpc'])
+        if timeout <= 0:
+            raise SystemExit(f"❌ The cycle deadline of {self.cycleDeadline} seconds has been exceeded")
+
+        try:
+            with self.profiler.span('rpc', name):
+                response = self.transport.post(self.rpchost, data=json.dumps(data), headers={'Content-type': 'application/json'}, auth=(self.rpcuser, self.rpcpassword), timeout=timeout)
+            response.raise_for_status()
+            self.breaker.success()
+
+            return response.json()
+        except Timeout:
+            if self.breaker.failure():
+                self._rpcDegraded(notifyDown)
+            raise SystemExit(f"❌ Your defid process did not answer within {timeout:.0f} seconds!")
+        except ConnectionError:
+            if not notifyDown:
+                raise SystemExit("❌ Your defid process seems to be down or RPC server is not reachable!")
+
+            print("❌ Your defid process seems to be down or RPC server is not reachable!")
+            self._uploadToApi('node-info', {"defid_running": False})
+            raise SystemExit()
+
     def _rpcquery(self, method, params=False):
         '''
             Wrapper to run DefiChain RPC commands
@@ -56,7 +227,6 @@ class NodeMonitor:
             params = []
         else:
             params = [params]
-        headers = {'Content-type': 'application/json'}
         data = {
             'jsonrpc': '1.0',
             'id': 'curltest',
@@ -64,24 +234,61 @@ class NodeMonitor:
             'params': params
         }
 
-        try:
-            response = requests.post(self.rpchost, auth=(self.rpcuser, self.rpcpassword), headers=headers, data=json.dumps(data), timeout=1000)
-            response.raise_for_status()
+        data = self._rpcpost(data, method)
 
-            data = response.json()
+        if 'result' in data:
+            return data['result']
+        return data
 
-            if 'result' in data:
-                return data['result']
-            return data
-        except requests.exceptions.ConnectionError:
-            print("❌ Your defid process seems to be down or RPC server is not reachable!")
-            self._uploadToApi('node-info', {"defid_running": False})
-            raise SystemExit()
+    def _rpcbatch(self, calls, notifyDown=True):
+        '''
+            Runs several DefiChain RPC commands in one JSON-RPC batch request.
+            calls is a list of (id, method, params) tuples. Returns a tuple (results, errors)
+            of dicts keyed by id, errors holding the error object of every call that failed.
+        '''
+        batch = []
+        for callId, method, params in calls:
+            batch.append({
+                'jsonrpc': '1.0',
+                'id': callId,
+                'method': method,
+                'params': [params] if params else []
+            })
+
+        results = {}
+        errors = {}
+        methods = list(dict.fromkeys(method for callId, method, params in calls))
+        for entry in self._rpcpost(batch, '+'.join(methods), notifyDown):
+            if entry.get('error') is not None:
+                errors[entry['id']] = entry['error']
+            else:
+                results[entry['id']] = entry.get('result')
+
+        for callId, method, params in calls:
+            if callId not in results and callId not in errors:
+                errors[callId] = {'code': None, 'message': f'No response for {method}'}
+
+        return results, errors
+
+    def _alertStaleTip(self, tip, age):
+        '''
+            Called by the tip tracker as soon as no new block arrived for --stale-tip-seconds
+        '''
+        print(f"❌ No new block for {int(age)} seconds, the tip is still {tip.height} {tip.hash}")
+
+        self._uploadToApi('node-info', {'block_height_local': tip.height, 'local_hash': tip.hash, 'tip_age': int(age), 'stale_tip': True})
+
+    def _postToApi(self, apiKey, endpoint, data):
+        '''
+            Sends a payload to the masternode-health api, used by the spool to deliver payloads
+        '''
+        timeout = self._budget(API_TIMEOUT)
+        if timeout <= 0:
+            raise DeliveryError(f'The cycle deadline of {self.cycleDeadline} seconds has been exceeded')
 
-    def _uploadToApi(self, endpoint, data):
-        headers = {'x-api-key': self.api_key}
         try:
-            r = requests.post(f'https://api.defichain-masternode-health.com/v1/{endpoint}', headers=headers, json=data)
+            with self.profiler.span('api', endpoint):
+                r = self.transport.post(f'{self.api_url}/{endpoint}', headers={'x-api-key': apiKey}, json=data, timeout=timeout)
             r.raise_for_status()
             data = r.json()
 
@@ -92,149 +299,382 @@ class NodeMonitor:
                 return data['result']
 
             return data
-        except requests.exceptions.HTTPError:
-            raise SystemExit(f"❌ Could not send report to masternode-health api with endpoint {endpoint}")
+        except (TransportError, ValueError) as err:
+            raise deliveryError(err)
 
-    def _checkAreNodesMining(self):
+    def _uploadToApi(self, endpoint, data, onDelivered=None):
+        '''
+            Queues a payload in the spool and delivers everything that is due. Returns the api result of
+            this payload or None if it has been kept in the spool for a later retry. onDelivered is called
+            if the payload has been delivered right away. Runs that don't report return None right away.
         '''
-            Returns a list of tuples (node_id, True|False) where the boolean defines if a block has successfully been checked within MAX_LASTBLOCK_SECONDS
+        if not self.api_key or not self.sendsReports:
+            return None
+
+        payloadId = self.spool.push(self.api_key, endpoint, data)
+        delivered, failed = self.spool.flush(self._postToApi)
+
+        if payloadId in delivered and onDelivered is not None:
+            onDelivered()
+
+        for err in failed.values():
+            print(f"❌ Could not send report to masternode-health api: {err}{'' if err.permanent else ', will retry later'}")
+
+        if payloadId not in delivered and payloadId not in failed and self.verbose and self.report:
+            print(f"⏳ Report for endpoint {endpoint} has been spooled to respect the api rate limit")
+
+        return delivered.get(payloadId)
+
+    def reportDelay(self):
+        '''
+            Returns the seconds until the api rate limit allows the next report of this node
+        '''
+        if not self.api_key or not self.sendsReports:
+            return 0
+
+        return self.spool.nextSlot(self.api_key)
+
+    def _checkAreNodesMining(self, mininginfo=None):
+        '''
+            Returns an OperatorStatus with the (node_id, True|False) pairs where the boolean defines if a block has successfully been checked within MAX_LASTBLOCK_SECONDS
         '''
         # Get mininginfo
-        mininginfo = self._rpcquery('getmininginfo')
-        retval = []
+        if mininginfo is None:
+            mininginfo = self._rpcquery('getmininginfo')
+        retval = OperatorStatus()
+        now = time.time()
 
         for node in mininginfo['masternodes']:
-            lastBlockTime = datetime.strptime(node['lastblockcreationattempt'], '%Y-%m-%dT%H:%M:%SZ')
-            now = datetime.utcnow()
-            timeDiff = now - lastBlockTime
+            age = now - parseTimestamp(node['lastblockcreationattempt'])
 
-            if timeDiff.total_seconds() > self.max_block_seconds:
-                ret = False
-            else:
-                ret = True
+            retval.ids.append(node['id'])
+            retval.online.append(age <= self.max_block_seconds)
+            retval.attemptAge.append(age)
 
-            retval.append((node['id'], ret))
+        return retval
+
+    def _lookupMasternodes(self, checkNodes):
+        '''
+            Adds state, minted blocks and ban state of every masternode with one batched getmasternode call
+        '''
+        if not len(checkNodes):
+            return
+
+        results, errors = self._rpcbatch([(nodeId, 'getmasternode', nodeId) for nodeId in checkNodes.ids])
+
+        for nodeId, err in errors.items():
+            print(f"❌ Could not get masternode ..{nodeId[:3]}: {err.get('message')}")
+
+        checkNodes.addDetails(results)
+
+    def _chainInfoDue(self, tip):
+        '''
+            getblockchaininfo is needed for --report-sync and for the chain state of --report-mempool. Without the
+            tip tracker it replaces getblockcount and getbestblockhash, with it only a new block makes it due.
+        '''
+        if self.report_sync:
+            return True
+
+        return self.report_mempool and (tip is None or self.mempoolTracker.chainDue(tip.height))
+
+    def _rpcCalls(self, tip, syncing):
+        '''
+            Returns the rpc calls of a cycle. While the node catches up the operator checks are skipped, they are
+            meaningless until it is synced and getmininginfo competes with defid for cpu.
+        '''
+        calls = [] if syncing else [('getmininginfo', 'getmininginfo', False)]
+        if self._chainInfoDue(tip):
+            # getblockchaininfo carries block count and best block hash as well
+            calls.append(('getblockchaininfo', 'getblockchaininfo', False))
+        elif tip is None:
+            calls += [('getblockcount', 'getblockcount', False), ('getbestblockhash', 'getbestblockhash', False)]
+        calls += [('uptime', 'uptime', False), ('getconnectioncount', 'getconnectioncount', False)]
+        if self.report_peers:
+            calls += [('getpeerinfo', 'getpeerinfo', False), ('getnettotals', 'getnettotals', False)]
+        if self.report_mempool and self.mempoolTracker.mempoolDue():
+            calls.append(('getmempoolinfo', 'getmempoolinfo', False))
+
+        return calls
+
+    def _collectRpc(self):
+        tip = self.tipTracker.current() if self.tipTracker is not None else None
+        syncing = self.report_sync and self.syncEstimator.syncing
+        results, errors = self._rpcbatch(self._rpcCalls(tip, syncing))
+
+        if errors:
+            raise SystemExit('\n'.join(f"❌ RPC call {callId} failed: {err.get('message')}" for callId, err in errors.items()))
+
+        checkNodes = OperatorStatus() if syncing else self._checkAreNodesMining(results['getmininginfo'])
+        if self.masternode_details and not syncing:
+            self._lookupMasternodes(checkNodes)
+
+        retval = {
+            'checkNodes': checkNodes,
+            'uptime': results['uptime'],
+            'connectioncount': results['getconnectioncount'],
+        }
+
+        if tip is not None:
+            retval.update({'blockcount': tip.height, 'bestblockhash': tip.hash})
+        elif 'getblockchaininfo' in results:
+            retval.update({'blockcount': results['getblockchaininfo']['blocks'], 'bestblockhash': results['getblockchaininfo']['bestblockhash']})
+        else:
+            retval.update({'blockcount': results['getblockcount'], 'bestblockhash': results['getbestblockhash']})
+
+        if self.report_sync:
+            retval['sync'] = self.syncEstimator.update(results['getblockchaininfo'])
+
+        if self.report_peers:
+            # Only the summary is kept, the peer list itself is neither reported nor printed
+            retval['peers'] = self.peerStats.summarize(results['getpeerinfo'], results['getnettotals'], retval['blockcount'])
+
+        if self.report_mempool:
+            retval['mempool'] = self.mempoolTracker.update(results.get('getmempoolinfo'), results.get('getblockchaininfo'))
 
         return retval
 
-    def _processNodeInfo(self):
+    def _collectLogFile(self):
         try:
-            self.checkNodes = self._checkAreNodesMining()
-            self.blockcount = self._rpcquery('getblockcount')
-            self.bestblockhash = self._rpcquery('getbestblockhash')
-            self.uptime = self._rpcquery('uptime')
-            self.connectioncount = self._rpcquery('getconnectioncount')
-            self.logSize = getsize(self.defi_path + '/debug.log') / 1024**2
-            lines = subprocess.Popen([self.defi_path + '/defid', '--version'], stdout=subprocess.PIPE).communicate()[0]
-            self.nodeVersion = lines.splitlines()[0].split(b' ')[-1].decode()
-        except requests.exceptions.HTTPError as err:
-            raise SystemExit(err)
+            return {
+                'logSize': getsize(self.defi_path + '/debug.log') / 1024**2,
+                'logStats': self.logAnalyzer.scan(),
+            }
         except OSError as err:
             raise SystemExit(f"❌ Could not open {self.defi_path}/debug.log {err}")
 
-    def _processServerStats(self):
-        self.loadavg = psutil.getloadavg()[1]
-        vmem = psutil.virtual_memory()
-        self.memUsed = vmem.used / 1024**3
-        self.memTotal = vmem.total / 1024**3
+    def _collectNodeVersion(self):
+        try:
+            return {'nodeVersion': self.cache.get('node_version', self.defi_path + '/defid', self._readNodeVersion)}
+        except (OSError, ValueError) as err:
+            raise SystemExit(f"❌ Could not run {self.defi_path}/defid --version {err}")
 
-        disk = psutil.disk_usage(self.defi_path)
-        self.diskUsed = disk.used / 1024**3
-        self.diskTotal = disk.total / 1024**3
+    def _collectDataDir(self):
+        try:
+            sizes = self.dirSizes.sizes({name: join(self.defi_path, name) for name in DATA_DIR_COMPONENTS})
+        except OSError as err:
+            raise SystemExit(f"❌ Could not read the size of the data directory {self.defi_path}: {err}")
+        return {'dataDirSizes': {name: None if size is None else size / 1024**2 for name, size in sizes.items()}}
 
-        self.numCores = multiprocessing.cpu_count()
+    def _collectDiskUsage(self):
+        import psutil
+        with self.profiler.span('psutil', 'disk_usage'):
+            disk = psutil.disk_usage(self.defi_path)
 
-    def _drawProgressBar(self, percent, barLen=15):
-        # percent float from 0 to 1.
-        return "[{:<{}}] {:.0f}%".format('▰' * int(barLen * percent), barLen, percent * 100)
+        return {
+            'diskUsed': disk.used / 1024**3,
+            'diskTotal': disk.total / 1024**3,
+        }
 
-    def __repr__(self):
-        server_info = [('Node Version:', self.nodeVersion), ('Uptime:', str(timedelta(seconds=self.uptime))), ('Local Block Height:', self.blockcount), ('Local Block Hash:', self.bestblockhash), ('Connection Count:', self.connectioncount)]
-        for nodeId, online in self.checkNodes:
-            server_info.append((f'Operator ..{nodeId[:3]}:', '✅' if online else '❌'))
+    def _collectServerStats(self):
+        import psutil
+        with self.profiler.span('psutil', 'virtual_memory'):
+            vmem = psutil.virtual_memory()
+        with self.profiler.span('psutil', 'getloadavg'):
+            loadavg = psutil.getloadavg()[1]
+
+        stats = {
+            'loadavg': loadavg,
+            'memUsed': vmem.used / 1024**3,
+            'memTotal': vmem.total / 1024**3,
+            'numCores': os.cpu_count(),
+            'serverSamples': self.sampler.summary('server') if self.sampler is not None else None,
+        }
+        stats.update(self._collectDiskUsage())
 
-        server_stats = [('System Load:', self._drawProgressBar(self.loadavg / (self.numCores * 1.5)), f' ({self.loadavg}/{(self.numCores * 1.5)})'), ('Memory Usage:', self._drawProgressBar(self.memUsed / self.memTotal), f' ({int(self.memUsed)}/{int(self.memTotal)} GB)'), ('Disk Usage:', self._drawProgressBar(self.diskUsed / self.diskTotal), f' ({int(self.diskUsed)}/{int(self.diskTotal)} GB)'), ('Log Size:', int(self.logSize), ' MB')]
+        return stats
 
-        retval = '----- [ server stats ] -----\n'
-        for stat in server_stats:
-            retval += '{:<15s}{:<10s}\n'.format(stat[0], str(stat[1]) + stat[2])
+    def _timedCollector(self, name):
+        with self.profiler.span('collector', name):
+            return getattr(self, f'_collect{name}')()
 
-        retval += '\n----- [ node info ] -----\n'
-        for stat in server_info:
-            retval += '{:<20s}{:<60s}\n'.format(stat[0], str(stat[1]))
+    def _clearResults(self, name):
+        '''
+            Drops the attributes a collector delivered in an earlier cycle, so they are not reported as current
+        '''
+        cleared = dict.fromkeys(self._delivered.pop(name, ()), None)
+        if 'checkNodes' in cleared:
+            cleared['checkNodes'] = []
+        self.__dict__.update(cleared)
 
-        return retval
+    def _startCollector(self, name):
+        '''
+            Runs a collector on a daemon thread and returns the future of its result. Unlike the workers of a
+            ThreadPoolExecutor, which are joined at interpreter exit, a hung collector never keeps the process alive.
+        '''
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._timedCollector(name))
+            except BaseException as err:
+                future.set_exception(err)
 
-    def processNode(self):
-        self._processNodeInfo()
-        self._processServerStats()
+        threading.Thread(target=run, name=f'collector-{name}', daemon=True).start()
+        return future
 
+    def _runCollectors(self, collectors):
+        '''
+            Runs the given collectors concurrently. Every collector returns a dict of attributes that is applied
+            if it finishes within its deadline; collectors that miss it are recorded in self.timedOut instead
+            and the attributes they delivered before are reset.
+        '''
+        start = time.monotonic()
+        futures = [(name, self._startCollector(name)) for name in collectors]
+
+        for name, future in futures:
+            remaining = self._budget(start + self.collectorTimeouts[name] - time.monotonic())
+            try:
+                result = future.result(timeout=max(0, remaining))
+            except FutureTimeoutError:
+                self.timedOut.add(name)
+                self._clearResults(name)
+                continue
+
+            self.__dict__.update(result)
+            self._delivered[name] = set(result)
+            self.timedOut.discard(name)
+
+    def _readNodeVersion(self):
+        import subprocess
+        with self.profiler.span('subprocess', 'defid --version'):
+            proc = subprocess.Popen([self.defi_path + '/defid', '--version'], stdout=subprocess.PIPE)
+            try:
+                lines = proc.communicate(timeout=max(0, self._budget(self.collectorTimeouts['NodeVersion'])))[0]
+            except subprocess.TimeoutExpired as err:
+                # Reap the hanging defid instead of leaving it behind on every cycle
+                proc.kill()
+                proc.communicate()
+                raise ValueError(err)
+        return lines.splitlines()[0].split(b' ')[-1].decode()
+
+    def _readConfCheckSum(self):
         with open(self.defi_conf, 'rb') as f:
-            self.confCheckSum = md5(f.read()).hexdigest()
+            return md5(f.read()).hexdigest()
 
-    def sendReport(self):
-        data_node_info = {
-            'block_height_local': self.blockcount,
-            'local_hash': self.bestblockhash,
-            'node_uptime': self.uptime,
-            'operator_status': list(map(lambda x: {'id': x[0], 'online': x[1]}, self.checkNodes)),
-            'connection_count': self.connectioncount,
-            'logsize': self.logSize,
-            'config_checksum': self.confCheckSum,
-            'node_version': self.nodeVersion
-        }
+    def takeSnapshot(self):
+        '''
+            Returns a snapshot of the current results, its sections are shared with this monitor
+        '''
+        latency = None
+        if self.report_latency:
+            count, total, maximum = self.profiler.phase('rpc')
+            latency = (total / count, maximum) if count else (None, None)
+
+        tip = None
+        if self.tipTracker is not None and self.tipTracker.current() is not None:
+            tip = (int(self.tipTracker.age()), self.tipTracker.stale, self.blockIntervals)
+
+        return MetricsSnapshot(
+            time=time.time(), blockcount=self.blockcount, bestblockhash=self.bestblockhash, uptime=self.uptime,
+            connectioncount=self.connectioncount, operators=self.checkNodes, logSize=self.logSize, confCheckSum=self.confCheckSum,
+            nodeVersion=self.nodeVersion, loadavg=self.loadavg, memUsed=self.memUsed, memTotal=self.memTotal, diskUsed=self.diskUsed,
+            diskTotal=self.diskTotal, numCores=self.numCores, timedOut=tuple(sorted(self.timedOut)), trends=self.trends,
+            reportTrends=self.report_trends, latency=latency, logStats=self.logStats, sync=self.sync, peers=self.peers,
+            dataDirSizes=self.dataDirSizes, dataDirRates=self.dataDirRates, tip=tip, serverSamples=self.serverSamples,
+            defidSamples=self.defidSamples, mempool=self.mempool,
+        )
 
-        data_node_stats = {
-            'load_avg': self.loadavg,
-            'hdd_used': self.diskUsed,
-            'hdd_total': self.diskTotal,
-            'ram_used': self.memUsed,
-            'ram_total': self.memTotal,
-            'num_cores': self.numCores,
-            'server_script_version': __version__
-        }
+    def __repr__(self):
+        return self.snapshot.render(self.profiler.render() if self.profiler else None)
 
+    def processNode(self, serverStats=None):
+        '''
+            Collects all node information and server stats. serverStats can be passed in by callers that monitor
+            several nodes on the same host, only the disk usage of this node's defi_path is collected then.
+        '''
+        self.profiler.reset()
+        self._startCycle()
         try:
-            self._uploadToApi('node-info', data_node_info)
-            self._uploadToApi('server-stats', data_node_stats)
-        except requests.exceptions.HTTPError as err:
-            raise SystemExit(err)
-
-
-def parse_args(args):
-    home = expanduser("~")
-    parser = argparse.ArgumentParser(description='DefiChain Masternode Monitor')
-    parser.add_argument('--max-block-seconds', help='Alert if node did not try to calculate hash within max-block-seconds (default: 30 seconds)', default=30, type=int)
-    parser.add_argument('--rpchost', help='RPC host (default: http://localhost:8554)', default='http://localhost:8554')
-    parser.add_argument('--verbose', action='store_true', help='Prints stats to stdout')
-    parser.add_argument('--report', action='store_true', help='Force sending report when using in combination with --verbose')
-    parser.add_argument('--defi-path', help='Path to your .defi folder. Default: ~/.defi', default=f"{home}/.defi")
-    parser.add_argument('--defi-conf', help='Path to your defi.conf. Default: ~/.defi/defi.conf', default=f"{home}/.defi/defi.conf")
-    parser.add_argument('--api-key', help='API Key')
-    parser.add_argument('--version', help='Returns masternode-health version', action='store_true')
+            self._collectCycle(serverStats)
+        finally:
+            # Calls outside of a cycle, like the stale tip alert of the tip tracker, are not bound by its deadline
+            self._cycleEnd = None
 
-    args = parser.parse_args(args)
+    def _collectCycle(self, serverStats):
+        try:
+            if serverStats is None:
+                self._runCollectors(self.nodeCollectors + SERVER_COLLECTORS)
+            else:
+                self._runCollectors(self.nodeCollectors)
+                self.__dict__.update(serverStats)
+                self.__dict__.update(self._collectDiskUsage())
+        except HTTPError as err:
+            raise SystemExit(err)
+        except OSError as err:
+            raise SystemExit(f"❌ Could not open {self.defi_path}/debug.log {err}")
 
-    if args.version:
-        raise SystemExit(f'Version: {__version__}')
+        self.confCheckSum = self.cache.get('config_checksum', self.defi_conf, self._readConfCheckSum)
+        self.cache.save()
+        if self.sampler is not None:
+            self.defidSamples = self.sampler.summary('defid')
+        if self.tipTracker is not None:
+            self.blockIntervals = self.tipTracker.intervals()
+        self._recordMetrics()
+        self.snapshot = self.takeSnapshot()
 
-    if (args.api_key is None and not args.verbose) or (args.api_key is None and args.verbose and args.report):
-        raise SystemExit('Please specify an api-key argument')
+    def _recordMetrics(self):
+        '''
+            Appends this cycle to the metric history and derives rates and stall time from it
+        '''
+        now = time.time()
+        self.metrics.append({
+            'time': now,
+            'blockcount': self.blockcount,
+            'connectioncount': self.connectioncount,
+            'uptime': self.uptime,
+            'loadavg': self.loadavg,
+            'memUsed': self.memUsed,
+            'diskUsed': self.diskUsed,
+            'logSize': self.logSize,
+            **{f'{name}Size': (self.dataDirSizes or {}).get(name) for name in DATA_DIR_COMPONENTS},
+        })
+
+        times = self.metrics.column('time')
+        blockcounts = self.metrics.column('blockcount')
+        blockRate = rate(times, blockcounts, now - TREND_WINDOW)
+        logRate = rate(times, self.metrics.column('logSize'), now - TREND_WINDOW)
+        loadavgs = [v for t, v in window(times, self.metrics.column('loadavg'), now - TREND_WINDOW)]
+
+        self.trends = {
+            'block_rate': None if blockRate is None else blockRate * 3600,
+            'log_growth_rate': None if logRate is None else logRate * 3600,
+            'block_stall_seconds': stallSeconds(times, blockcounts),
+            'load_avg_moving': movingAverage(loadavgs, LOAD_AVERAGE_SAMPLES)[-1] if loadavgs else None,
+        }
 
-    return args
+        if self.dataDirSizes is not None:
+            rates = {name: rate(times, self.metrics.column(f'{name}Size'), now - TREND_WINDOW) for name in DATA_DIR_COMPONENTS}
+            self.dataDirRates = {name: None if value is None else value * 3600 for name, value in rates.items()}
 
+    def sendReport(self):
+        snapshot = self.snapshot
+        self._cycleEnd = self._reportEnd
+        try:
+            for endpoint, payload in (('node-info', snapshot.nodeInfoPayload()), ('server-stats', snapshot.serverStatsPayload())):
+                prepared = self.delta.prepare(self.api_key, endpoint, payload)
 
-def main():
-    args = parse_args(sys.argv[1:])
+                if prepared is None:
+                    if self.verbose and self.report:
+                        print(f"⏭ Skipped unchanged report for endpoint {endpoint}")
+                    continue
 
-    nodeMonitor = NodeMonitor(args)
-    nodeMonitor.processNode()
+                # Only a delivered full report becomes the base of the next comparison
+                onDelivered = partial(self.delta.confirm, self.api_key, endpoint, payload) if prepared is payload else None
+                self._uploadToApi(endpoint, prepared, onDelivered)
+        finally:
+            self._cycleEnd = self._reportEnd = None
 
-    if args.verbose:
-        print(nodeMonitor)
+    def saveProfile(self):
+        '''
+            Writes the timings of the last cycle to the --profile file
+        '''
+        if self.profile is None:
+            return
 
-    if (args.verbose and args.report) or not args.verbose:
-        nodeMonitor.sendReport()
+        try:
+            self.profiler.save(self.profile, node=self.name, version=__version__)
+        except OSError as err:
+            print(f"❌ Could not write profile {self.profile}: {err}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,118 @@
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from .cli import sendsReports
+
+NODE_SETTINGS = ['name', 'defi_path', 'defi_conf', 'rpchost', 'api_key']
+
+
+def loadNodes(path, args):
+    '''
+        Reads a JSON list of node definitions and returns one argument namespace per node.
+        Settings missing in a node definition are taken from args, except the api_key: every node
+        that sends reports needs an api_key of its own.
+    '''
+    try:
+        with open(path) as f:
+            nodes = json.load(f)
+    except (OSError, ValueError) as err:
+        raise SystemExit(f"❌ Could not read node definitions from {path}: {err}")
+
+    if not isinstance(nodes, list) or not nodes:
+        raise SystemExit(f"❌ {path} must contain a non-empty list of nodes")
+
+    sendReport = sendsReports(args)
+    apiKeys = {}
+    retval = []
+
+    for index, node in enumerate(nodes):
+        unknown = set(node) - set(NODE_SETTINGS)
+        if unknown:
+            raise SystemExit(f"❌ Unknown settings for node {index}: {', '.join(sorted(unknown))}")
+
+        nodeArgs = argparse.Namespace(**vars(args))
+        nodeArgs.name = node.get('name', f'node{index}')
+        for setting in NODE_SETTINGS[1:]:
+            if setting in node:
+                setattr(nodeArgs, setting, node[setting])
+
+        if sendReport:
+            _checkApiKey(node.get('api_key'), nodeArgs.name, apiKeys)
+
+        retval.append(nodeArgs)
+
+    return retval
+
+
+def _checkApiKey(apiKey, name, apiKeys):
+    if not apiKey:
+        raise SystemExit(f'Please specify an api_key for node {name}')
+    if apiKey in apiKeys:
+        raise SystemExit(f"❌ Nodes {apiKeys[apiKey]} and {name} use the same api_key")
+
+    apiKeys[apiKey] = name
+
+
+class MultiNodeMonitor:
+    '''
+        Monitors several defid instances on the same host. Server stats are collected once and shared,
+        node information is collected in parallel with each NodeMonitor keeping its own connection pool.
+    '''
+    def __init__(self, monitors):
+        self.monitors = monitors
+        self.verbose = monitors[0].verbose
+        self.failed = set()
+
+        # Server stats come from the first monitor, the other samplers only sample their defid process
+        for monitor in monitors[1:]:
+            if monitor.sampler is not None:
+                monitor.sampler.system = False
+
+    @property
+    def defi_conf(self):
+        return ', '.join(monitor.defi_conf for monitor in self.monitors)
+
+    def acquireLock(self):
+        for monitor in self.monitors:
+            monitor.acquireLock()
+
+    def reloadConfig(self):
+        for monitor in self.monitors:
+            monitor.reloadConfig()
+
+    def _processMonitor(self, monitor, serverStats):
+        try:
+            monitor.processNode(serverStats)
+            self.failed.discard(monitor.name)
+        except SystemExit as err:
+            self.failed.add(monitor.name)
+            if err.code is not None and not isinstance(err.code, int):
+                print(f"[{monitor.name}] {err.code}")
+
+    def processNode(self):
+        serverStats = self.monitors[0]._collectServerStats()
+
+        with ThreadPoolExecutor(max_workers=len(self.monitors)) as executor:
+            list(executor.map(lambda monitor: self._processMonitor(monitor, serverStats), self.monitors))
+
+    def sendReport(self):
+        for monitor in self.monitors:
+            if monitor.name not in self.failed:
+                monitor.sendReport()
+
+    def reportDelay(self):
+        return max(monitor.reportDelay() for monitor in self.monitors)
+
+    def saveProfile(self):
+        if self.monitors[0].profile is None:
+            return
+
+        data = {monitor.name: monitor.profiler.stats() for monitor in self.monitors}
+        try:
+            with open(self.monitors[0].profile, 'w') as f:
+                json.dump(data, f, indent=2)
+        except OSError as err:
+            print(f"❌ Could not write profile {self.monitors[0].profile}: {err}")
+
+    def __repr__(self):
+        return '\n'.join(f'===== [ {monitor.name} ] =====\n{"collection failed" if monitor.name in self.failed else monitor}' for monitor in self.monitors)
@@ -0,0 +1,97 @@
+from array import array
+from datetime import datetime, timezone
+
+EMPTY_TX = '0' * 64
+
+_days = {}
+
+
+def _daysFromCivil(year, month, day):
+    '''
+        Days since 1970-01-01 of a date in the proleptic gregorian calendar
+    '''
+    year -= month <= 2
+    era = year // 400
+    yearOfEra = year - era * 400
+    dayOfYear = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    dayOfEra = yearOfEra * 365 + yearOfEra // 4 - yearOfEra // 100 + dayOfYear
+    return era * 146097 + dayOfEra - 719468
+
+
+def parseTimestamp(value):
+    '''
+        Converts a timestamp of the format YYYY-MM-DDTHH:MM:SSZ to seconds since the epoch. The date part is
+        cached, as the attempts of all masternodes of a node fall on very few days.
+    '''
+    if len(value) != 20 or value[10] != 'T' or value[19] != 'Z':
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp()
+
+    date = value[:10]
+    days = _days.get(date)
+    if days is None:
+        days = _days[date] = _daysFromCivil(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+    return days * 86400 + int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])
+
+
+class OperatorStatus:
+    '''
+        Columnar result of the operator checks. Iterating and indexing yields (id, online) tuples.
+        The detail columns are only filled if the masternodes have been looked up with getmasternode, they
+        hold None for masternodes whose lookup failed.
+    '''
+    __slots__ = ('ids', 'online', 'attemptAge', 'state', 'mintedBlocks', 'banned')
+
+    def __init__(self):
+        self.ids = []
+        self.online = array('b')
+        self.attemptAge = array('d')
+        self.state = None
+        self.mintedBlocks = None
+        self.banned = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return (self.ids[index], bool(self.online[index]))
+
+    def __iter__(self):
+        return zip(self.ids, map(bool, self.online))
+
+    def hasDetails(self):
+        return self.state is not None
+
+    def addDetails(self, masternodes):
+        '''
+            Fills the detail columns from a dict of id to getmasternode result
+        '''
+        self.state = []
+        self.mintedBlocks = []
+        self.banned = []
+
+        for nodeId in self.ids:
+            info = masternodes.get(nodeId)
+            if not info:
+                self.state.append(None)
+                self.mintedBlocks.append(None)
+                self.banned.append(None)
+                continue
+
+            # getmasternode returns {id: {...}}
+            info = info.get(nodeId, info)
+            self.state.append(info.get('state'))
+            self.mintedBlocks.append(info.get('mintedBlocks', 0))
+            self.banned.append(info.get('banTx', EMPTY_TX) not in ('', EMPTY_TX))
+
+    def toPayload(self):
+        '''
+            Returns the operator_status list of the node-info payload
+        '''
+        if not self.hasDetails():
+            return [{'id': nodeId, 'online': online} for nodeId, online in self]
+
+        return [
+            {'id': nodeId, 'online': bool(online), 'state': state, 'minted_blocks': minted, 'banned': banned}
+            for nodeId, online, state, minted, banned in zip(self.ids, self.online, self.state, self.mintedBlocks, self.banned)
+        ]
@@ -0,0 +1,84 @@
+from .util import loadJson, saveJson
+
+# Peers whose synced height is more than this many blocks below ours are counted as lagging
+LAG_BLOCKS = 10
+
+
+def percentile(values, p):
+    '''
+        Nearest-rank percentile of a sorted list or None if it is empty
+    '''
+    if not values:
+        return None
+
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+class PeerStats:
+    '''
+        Reduces getpeerinfo and getnettotals to a compact summary. Byte counters of the previous call are kept
+        in a state file, so rates can be computed from one run to the next.
+    '''
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def _rate(current, previous, seconds):
+        if previous is None or seconds <= 0 or current < previous:
+            return None
+        return (current - previous) / seconds
+
+    def _peerRates(self, peers, height, previous, seconds):
+        '''
+            Walks the peer list once and returns the summary, the sorted per-peer rates and the new counters
+        '''
+        inbound = lagging = 0
+        pings, recvRates, sentRates = [], [], []
+        counters = {}
+
+        for peer in peers:
+            inbound += bool(peer.get('inbound'))
+            if 'pingtime' in peer:
+                pings.append(peer['pingtime'] * 1000)
+            if 0 <= peer.get('synced_blocks', -1) < height - LAG_BLOCKS:
+                lagging += 1
+
+            # addr and conntime identify a connection across restarts of defid, the peer id does not
+            key = f"{peer.get('addr')}|{peer.get('conntime')}"
+            counters[key] = [peer.get('bytesrecv', 0), peer.get('bytessent', 0)]
+            last = previous.get(key)
+            if last is not None:
+                recvRates.append(self._rate(counters[key][0], last[0], seconds))
+                sentRates.append(self._rate(counters[key][1], last[1], seconds))
+
+        summary = {'peers_inbound': inbound, 'peers_outbound': len(peers) - inbound, 'peers_lagging': lagging}
+        pings.sort()
+        summary.update({'peer_ping_p50': percentile(pings, 0.5), 'peer_ping_p95': percentile(pings, 0.95), 'peer_ping_max': pings[-1] if pings else None})
+
+        return summary, sorted(r for r in recvRates if r is not None), sorted(r for r in sentRates if r is not None), counters
+
+    def summarize(self, peers, nettotals, height):
+        '''
+            Returns the summary of the peer list and network totals; ping times are in milliseconds,
+            rates in bytes per second
+        '''
+        now = nettotals['timemillis'] / 1000
+        state = loadJson(self.path, {})
+        seconds = now - state.get('time', now)
+
+        summary, recvRates, sentRates, counters = self._peerRates(peers, height, state.get('peers', {}), seconds)
+        summary.update({
+            'peer_recv_rate_p50': percentile(recvRates, 0.5),
+            'peer_recv_rate_max': recvRates[-1] if recvRates else None,
+            'peer_sent_rate_p50': percentile(sentRates, 0.5),
+            'peer_sent_rate_max': sentRates[-1] if sentRates else None,
+            'net_recv_rate': self._rate(nettotals['totalbytesrecv'], state.get('totalbytesrecv'), seconds),
+            'net_sent_rate': self._rate(nettotals['totalbytessent'], state.get('totalbytessent'), seconds),
+        })
+
+        try:
+            saveJson(self.path, {'time': now, 'totalbytesrecv': nettotals['totalbytesrecv'], 'totalbytessent': nettotals['totalbytessent'], 'peers': counters})
+        except OSError as err:
+            print(f"❌ Could not write peer state {self.path}: {err}")
+
+        return summary
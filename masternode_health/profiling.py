@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    '''
+        Collects timing spans of a cycle, aggregated per phase (rpc, subprocess, psutil, api, collector) and name
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+
+    def record(self, phase, name, seconds):
+        with self.lock:
+            span = self.spans.get((phase, name))
+            if span is None:
+                self.spans[(phase, name)] = [1, seconds, seconds, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+                span[2] = min(span[2], seconds)
+                span[3] = max(span[3], seconds)
+
+    @contextmanager
+    def span(self, phase, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, name, time.perf_counter() - start)
+
+    def stats(self):
+        '''
+            Returns {phase: {name: {count, total, min, max, mean}}} with all times in seconds
+        '''
+        retval = {}
+        with self.lock:
+            for (phase, name), (count, total, minimum, maximum) in sorted(self.spans.items()):
+                retval.setdefault(phase, {})[name] = {'count': count, 'total': total, 'min': minimum, 'max': maximum, 'mean': total / count}
+
+        return retval
+
+    def phase(self, phase):
+        '''
+            Returns (count, total, max) over all spans of a phase
+        '''
+        with self.lock:
+            spans = [span for (spanPhase, name), span in self.spans.items() if spanPhase == phase]
+
+        return sum(s[0] for s in spans), sum(s[1] for s in spans), max((s[3] for s in spans), default=0)
+
+    def __bool__(self):
+        return bool(self.spans)
+
+    def render(self):
+        lines = []
+        for phase, names in self.stats().items():
+            for name, stats in names.items():
+                lines.append('{:<12s}{:<40s}{:>4d}x {:>9.1f} ms'.format(phase, name[:39], stats['count'], stats['total'] * 1000))
+
+        return '\n'.join(lines)
+
+    def save(self, path, **extra):
+        data = dict(extra)
+        data['phases'] = self.stats()
+
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
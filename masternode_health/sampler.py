@@ -0,0 +1,257 @@
+import threading
+import time
+from os.path import join
+
+# Seconds between two attempts to find the defid process while it is not running
+PROCESS_LOOKUP_INTERVAL = 60
+
+
+class P2Quantile:
+    '''
+        Streaming estimate of a quantile with the P² algorithm of Jain and Chlamtac. Only five markers are
+        kept, so memory stays constant however many values are added.
+    '''
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        heights = self.heights
+
+        if len(heights) < 5:
+            heights.append(value)
+            heights.sort()
+            return
+
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = next(i for i in range(4) if heights[i] <= value < heights[i + 1])
+
+        for i in range(cell + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            self._adjust(i)
+
+    def _adjust(self, i):
+        heights, positions = self.heights, self.positions
+        offset = self.desired[i] - positions[i]
+
+        if not (offset >= 1 and positions[i + 1] - positions[i] > 1) and not (offset <= -1 and positions[i - 1] - positions[i] < -1):
+            return
+
+        step = 1 if offset > 0 else -1
+        below = positions[i] - positions[i - 1]
+        above = positions[i + 1] - positions[i]
+        height = heights[i] + step / (below + above) * (
+            (below + step) * (heights[i + 1] - heights[i]) / above + (above - step) * (heights[i] - heights[i - 1]) / below)
+
+        if not heights[i - 1] < height < heights[i + 1]:
+            # Parabolic prediction leaves the neighbouring markers, fall back to linear interpolation
+            height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+
+        heights[i] = height
+        positions[i] += step
+
+    def value(self):
+        if not self.heights:
+            return None
+        if len(self.heights) < 5:
+            return self.heights[round((len(self.heights) - 1) * self.p)]
+
+        return self.heights[2]
+
+
+class StreamSummary:
+    '''
+        p50, p95 and max of a stream of values in constant memory
+    '''
+    def __init__(self):
+        self.p50 = P2Quantile(0.5)
+        self.p95 = P2Quantile(0.95)
+        self.max = None
+
+    def add(self, value):
+        self.p50.add(value)
+        self.p95.add(value)
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def result(self):
+        return {'p50': self.p50.value(), 'p95': self.p95.value(), 'max': self.max}
+
+
+class Sampler:
+    '''
+        Samples server and defid process statistics in a background thread at a fixed interval. Samples are
+        aggregated into streaming summaries, summary() returns and resets them once per reporting interval.
+    '''
+    def __init__(self, defiPath, interval, system=True):
+        self.pidFile = join(defiPath, 'defid.pid')
+        self.interval = interval
+        self.system = system
+        self._process = None
+        self._nextLookup = 0
+        self._last = None
+        self._summaries = {'server': {}, 'defid': {}}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        import psutil
+        nextRun = time.monotonic()
+
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except (psutil.Error, OSError):
+                pass
+
+            nextRun += self.interval
+            now = time.monotonic()
+            if nextRun < now:
+                # Sampling fell behind, skip the missed slots
+                nextRun = now
+            self._stop.wait(nextRun - now)
+
+    def _readPid(self):
+        try:
+            with open(self.pidFile) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _findProcess(self):
+        '''
+            Returns the cached handle of the defid process, looking it up via defid.pid or the process list
+            at most every PROCESS_LOOKUP_INTERVAL seconds while it is not running
+        '''
+        import psutil
+        if self._process is not None and self._process.is_running():
+            return self._process
+
+        self._process = None
+        now = time.monotonic()
+        if now < self._nextLookup:
+            return None
+        self._nextLookup = now + PROCESS_LOOKUP_INTERVAL
+
+        pid = self._readPid()
+        try:
+            if pid is not None and psutil.Process(pid).name().startswith('defid'):
+                self._process = psutil.Process(pid)
+        except psutil.Error:
+            pass
+
+        if self._process is None:
+            for process in psutil.process_iter(['name']):
+                if process.info['name'] == 'defid':
+                    self._process = process
+                    break
+
+        if self._process is not None:
+            # The first cpu_percent call only sets the reference point, the process is sampled from the next call
+            self._process.cpu_percent()
+
+        return None
+
+    def _sampleSystem(self, values, counters):
+        import psutil
+        cpuTimes = psutil.cpu_times_percent()
+        values['cpu_usage'] = 100 - cpuTimes.idle
+        values['cpu_iowait'] = getattr(cpuTimes, 'iowait', None)
+        values['ram_usage'] = psutil.virtual_memory().percent
+
+        disk = psutil.disk_io_counters()
+        if disk is not None:
+            counters['disk_read'] = disk.read_bytes
+            counters['disk_write'] = disk.write_bytes
+
+        net = psutil.net_io_counters()
+        counters['net_recv'] = net.bytes_recv
+        counters['net_sent'] = net.bytes_sent
+
+    def _sampleProcess(self, process, values, counters):
+        import psutil
+        try:
+            with process.oneshot():
+                values['defid_cpu'] = process.cpu_percent()
+                values['defid_rss'] = process.memory_info().rss / 1024**2
+                values['defid_open_files'] = process.num_fds() if hasattr(process, 'num_fds') else len(process.open_files())
+
+                if hasattr(process, 'io_counters'):
+                    io = process.io_counters()
+                    counters[f'defid_{process.pid}_read'] = io.read_bytes
+                    counters[f'defid_{process.pid}_write'] = io.write_bytes
+        except psutil.NoSuchProcess:
+            self._process = None
+
+    def _rates(self, now, counters):
+        lastTime, lastCounters = self._last
+        rates = {}
+
+        for key, value in counters.items():
+            if key in lastCounters and value >= lastCounters[key] and now > lastTime:
+                # Counters of defid are keyed by pid, so a restarted process does not produce a bogus rate
+                name = f"defid_{key.rsplit('_', 1)[1]}" if key.startswith('defid_') else key
+                rates[f'{name}_rate'] = (value - lastCounters[key]) / (now - lastTime)
+
+        return rates
+
+    def sample(self):
+        '''
+            Takes one sample, byte counters are turned into rates against the previous sample
+        '''
+        now = time.monotonic()
+        values = {}
+        counters = {}
+
+        if self.system:
+            self._sampleSystem(values, counters)
+
+        process = self._findProcess()
+        if process is not None:
+            self._sampleProcess(process, values, counters)
+
+        if self._last is None:
+            # The first cpu_times_percent call only sets the reference point as well
+            self._last = (now, counters)
+            return
+
+        values.update(self._rates(now, counters))
+        self._last = (now, counters)
+
+        with self._lock:
+            for key, value in values.items():
+                if value is not None:
+                    group = 'defid' if key.startswith('defid_') else 'server'
+                    self._summaries[group].setdefault(key, StreamSummary()).add(value)
+
+    def summary(self, group):
+        '''
+            Returns the summaries of the 'server' or 'defid' statistics since the last call and starts new ones
+        '''
+        with self._lock:
+            summaries, self._summaries[group] = self._summaries[group], {}
+
+        return {key: summary.result() for key, summary in sorted(summaries.items())} or None
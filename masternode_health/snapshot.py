@@ -0,0 +1,254 @@
+from datetime import timedelta
+from operator import attrgetter
+from .operators import OperatorStatus
+from .version import __version__
+
+# Directories of the data dir whose size is reported with --report-data-dir
+DATA_DIR_COMPONENTS = ('blocks', 'chainstate', 'enhancedcs')
+
+
+def drawProgressBar(percent, barLen=15):
+    # percent float from 0 to 1.
+    return "[{:<{}}] {:.0f}%".format('▰' * int(barLen * percent), barLen, percent * 100)
+
+
+class MetricsSnapshot:
+    '''
+        Result of one collection cycle. Its fields live in slots and can't be reassigned, but the operator
+        status and the dict sections (trends, log stats, peers, sync, mempool, data dir sizes and samples) are
+        shared with the NodeMonitor instead of being copied. This is safe because the collectors build new
+        sections on every cycle and never change delivered ones; code that reads a snapshot must not modify
+        them either. Payloads are built from field layouts that are computed once per class.
+    '''
+    __slots__ = (
+        'time', 'blockcount', 'bestblockhash', 'uptime', 'connectioncount', 'operators', 'logSize', 'confCheckSum', 'nodeVersion',
+        'loadavg', 'memUsed', 'memTotal', 'diskUsed', 'diskTotal', 'numCores',
+        'timedOut', 'trends', 'reportTrends', 'latency', 'logStats', 'sync', 'peers', 'mempool', 'dataDirSizes', 'dataDirRates', 'tip',
+        'serverSamples', 'defidSamples',
+    )
+
+    # (payload field, attribute) of the fields every node-info and server-stats payload contains
+    NODE_INFO_LAYOUT = (
+        ('block_height_local', 'blockcount'),
+        ('local_hash', 'bestblockhash'),
+        ('node_uptime', 'uptime'),
+        ('operator_status', 'operatorStatus'),
+        ('connection_count', 'connectioncount'),
+        ('logsize', 'logSize'),
+        ('config_checksum', 'confCheckSum'),
+        ('node_version', 'nodeVersion'),
+    )
+    SERVER_STATS_LAYOUT = (
+        ('load_avg', 'loadavg'),
+        ('hdd_used', 'diskUsed'),
+        ('hdd_total', 'diskTotal'),
+        ('ram_used', 'memUsed'),
+        ('ram_total', 'memTotal'),
+        ('num_cores', 'numCores'),
+    )
+
+    _nodeInfoKeys = tuple(field for field, attribute in NODE_INFO_LAYOUT)
+    _nodeInfoValues = attrgetter(*(attribute for field, attribute in NODE_INFO_LAYOUT))
+    _serverStatsKeys = tuple(field for field, attribute in SERVER_STATS_LAYOUT)
+    _serverStatsValues = attrgetter(*(attribute for field, attribute in SERVER_STATS_LAYOUT))
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"Unknown snapshot fields: {', '.join(sorted(fields))}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @property
+    def operatorStatus(self):
+        if isinstance(self.operators, OperatorStatus):
+            return self.operators.toPayload()
+        return [{'id': nodeId, 'online': online} for nodeId, online in self.operators]
+
+    def nodeInfoPayload(self):
+        '''
+            Returns the payload of the node-info api endpoint
+        '''
+        retval = dict(zip(self._nodeInfoKeys, self._nodeInfoValues(self)))
+
+        if self.reportTrends and self.trends is not None:
+            retval.update(self.trends)
+
+        if self.latency is not None:
+            retval['rpc_latency'], retval['rpc_latency_max'] = self.latency
+
+        if self.timedOut:
+            retval['timed_out_collectors'] = list(self.timedOut)
+
+        retval.update(self._optionalNodeInfo())
+
+        if self.logStats is not None:
+            retval.update({
+                'log_updatetip_rate': self.logStats['updatetip_rate'],
+                'log_errors': self.logStats['errors'],
+                'log_warnings': self.logStats['warnings'],
+                'log_reorgs': self.logStats['reorgs'],
+                'log_reorg_messages': self.logStats['reorg_messages']
+            })
+
+        return retval
+
+    def _optionalNodeInfo(self):
+        '''
+            Returns the node-info fields of the optional collectors that delivered data
+        '''
+        retval = {}
+
+        if self.defidSamples is not None:
+            retval['defid_samples'] = self.defidSamples
+
+        if self.peers is not None:
+            retval.update(self.peers)
+
+        if self.sync is not None:
+            retval.update(self.sync)
+
+        if self.mempool is not None:
+            retval.update(self.mempool)
+
+        if self.dataDirSizes is not None:
+            for name in DATA_DIR_COMPONENTS:
+                retval[f'{name}_size'] = self.dataDirSizes[name]
+                retval[f'{name}_growth_rate'] = (self.dataDirRates or {}).get(name)
+
+        if self.tip is not None:
+            retval['tip_age'], retval['stale_tip'], retval['block_interval'] = self.tip
+
+        return retval
+
+    def serverStatsPayload(self):
+        '''
+            Returns the payload of the server-stats api endpoint
+        '''
+        retval = dict(zip(self._serverStatsKeys, self._serverStatsValues(self)))
+        retval['server_script_version'] = __version__
+
+        if self.serverSamples is not None:
+            retval['samples'] = self.serverSamples
+
+        return retval
+
+    def _serverStats(self):
+        if self.numCores is None:
+            stats = [('System Load:', 'n/a', ''), ('Memory Usage:', 'n/a', ''), ('Disk Usage:', 'n/a', '')]
+        else:
+            stats = [('System Load:', drawProgressBar(self.loadavg / (self.numCores * 1.5)), f' ({self.loadavg}/{(self.numCores * 1.5)})'), ('Memory Usage:', drawProgressBar(self.memUsed / self.memTotal), f' ({int(self.memUsed)}/{int(self.memTotal)} GB)'), ('Disk Usage:', drawProgressBar(self.diskUsed / self.diskTotal), f' ({int(self.diskUsed)}/{int(self.diskTotal)} GB)')]
+        stats.append(('Log Size:', 'n/a', '') if self.logSize is None else ('Log Size:', int(self.logSize), ' MB'))
+        if self.dataDirSizes is not None:
+            stats += [(f'{name.capitalize()}:', 'n/a' if size is None else int(size), '' if size is None else ' MB') for name, size in self.dataDirSizes.items()]
+
+        return stats
+
+    def _nodeInfo(self):
+        uptime = 'n/a' if self.uptime is None else str(timedelta(seconds=self.uptime))
+        info = [('Node Version:', self.nodeVersion or 'n/a'), ('Uptime:', uptime), ('Local Block Height:', self.blockcount), ('Local Block Hash:', self.bestblockhash), ('Connection Count:', self.connectioncount)]
+        for nodeId, online in self.operators:
+            info.append((f'Operator ..{nodeId[:3]}:', '✅' if online else '❌'))
+
+        info += self._optionalPanel()
+
+        if self.timedOut:
+            info.append(('Timed Out:', ', '.join(self.timedOut)))
+
+        if self.logStats is not None:
+            info += [('Tip Updates:', f"{self.logStats['updatetip_rate']:.1f}/min"), ('Log Errors:', self.logStats['errors']), ('Log Warnings:', self.logStats['warnings']), ('Reorgs:', self.logStats['reorgs'])]
+
+        return info
+
+    def _optionalPanel(self):
+        '''
+            Returns the node info lines of trends and the optional collectors that delivered data
+        '''
+        retval = []
+
+        if self.trends is not None:
+            retval += [
+                ('Block Rate:', 'n/a' if self.trends['block_rate'] is None else f"{self.trends['block_rate']:.0f} blocks/h"),
+                ('Log Growth:', 'n/a' if self.trends['log_growth_rate'] is None else f"{self.trends['log_growth_rate']:.1f} MB/h"),
+                ('Block Stall:', 'n/a' if self.trends['block_stall_seconds'] is None else str(timedelta(seconds=int(self.trends['block_stall_seconds'])))),
+            ]
+
+        if self.sync is not None:
+            retval.append(('Sync:', self._syncStatus()))
+
+        if self.peers is not None:
+            retval += self._peerPanel()
+
+        if self.mempool is not None:
+            retval.append(('Mempool:', self._mempoolStatus()))
+
+        return retval
+
+    def _syncStatus(self):
+        sync = self.sync
+        status = f"{sync['sync_progress']:.2f}%"
+        if sync['sync_blocks_per_second'] is not None:
+            status += f", {sync['sync_blocks_per_second']:.1f} blocks/s"
+        if sync['syncing'] and sync['sync_eta_seconds'] is not None:
+            status += f", ETA {timedelta(seconds=int(sync['sync_eta_seconds']))}"
+
+        return status + (' (catching up, operator checks paused)' if sync['syncing'] else '')
+
+    def _mempoolStatus(self):
+        mempool = self.mempool
+        if mempool['mempool_size'] is None:
+            return 'n/a'
+
+        status = f"{mempool['mempool_size']} txs, {mempool['mempool_bytes'] / 1024:.1f} KiB"
+        if mempool['mempool_usage_ratio'] is not None:
+            status += f", {mempool['mempool_usage_ratio'] * 100:.0f}% of maxmempool"
+
+        return status + f", polled every {timedelta(seconds=int(mempool['mempool_poll_interval']))}"
+
+    def _peerPanel(self):
+        peers = self.peers
+        ping = 'n/a' if peers['peer_ping_p50'] is None else f"{peers['peer_ping_p50']:.0f}/{peers['peer_ping_p95']:.0f}/{peers['peer_ping_max']:.0f} ms"
+        network = 'n/a' if peers['net_recv_rate'] is None else f"{peers['net_recv_rate'] / 1024:.1f} KiB/s in, {peers['net_sent_rate'] / 1024:.1f} KiB/s out"
+
+        return [
+            ('Peers:', f"{peers['peers_inbound']} in, {peers['peers_outbound']} out, {peers['peers_lagging']} lagging"),
+            ('Peer Ping:', ping + ' (p50/p95/max)' if peers['peer_ping_p50'] is not None else ping),
+            ('Network:', network),
+        ]
+
+    def panelLines(self):
+        '''
+            Returns the lines of the server stats and node info panels
+        '''
+        lines = ['----- [ server stats ] -----']
+        lines += ['{:<15s}{:<10s}'.format(label, str(value) + unit) for label, value, unit in self._serverStats()]
+        lines += ['', '----- [ node info ] -----']
+        lines += ['{:<20s}{:<60s}'.format(label, str(value)) for label, value in self._nodeInfo()]
+
+        return lines
+
+    def _sampleLines(self):
+        lines = ['', '----- [ samples ] -----', '{:<20s}{:>12s}{:>12s}{:>12s}'.format('', 'p50', 'p95', 'max')]
+        for key, summary in {**(self.serverSamples or {}), **(self.defidSamples or {})}.items():
+            lines.append('{:<20s}{:>12.1f}{:>12.1f}{:>12.1f}'.format(key, summary['p50'], summary['p95'], summary['max']))
+
+        return lines
+
+    def render(self, timings=None):
+        '''
+            Renders the verbose view, timings is the rendered profile of the cycle if there is one
+        '''
+        lines = self.panelLines()
+
+        if self.serverSamples is not None or self.defidSamples is not None:
+            lines += self._sampleLines()
+
+        if timings is not None:
+            lines += ['', '----- [ timings ] -----', timings]
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,188 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from .transport import HTTPError
+
+# The masternode health api accepts only one call per endpoint every 300 seconds
+RATE_LIMIT_SECONDS = 300
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 3600
+API_TIMEOUT = 30
+
+
+class DeliveryError(Exception):
+    '''
+        Raised by the send callback of Spool.flush. retryAfter is the delay requested by the api,
+        permanent marks payloads the api will never accept.
+    '''
+    def __init__(self, message, retryAfter=None, permanent=False):
+        super().__init__(message)
+        self.retryAfter = retryAfter
+        self.permanent = permanent
+
+
+def parseRetryAfter(value):
+    '''
+        Returns the delay in seconds of a Retry-After header, which is either a number of seconds or a http date
+    '''
+    if not value:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def deliveryError(err):
+    '''
+        Converts the error of an api call to the DeliveryError of the spool
+    '''
+    if not isinstance(err, HTTPError) or err.response is None:
+        return DeliveryError(str(err))
+
+    status = err.response.status_code
+    # Client errors other than rate limiting will fail again on every retry
+    return DeliveryError(str(err), parseRetryAfter(err.response.headers.get('Retry-After')), 400 <= status < 500 and status != 429)
+
+
+class Spool:
+    '''
+        Durable queue of api payloads in a SQLite WAL database. Payloads are delivered with exponential
+        backoff and a per endpoint token bucket that matches the rate limit of the api. The api only
+        cares about the current state, so a newer payload replaces a pending one for the same endpoint.
+    '''
+    def __init__(self, path, rateLimit=RATE_LIMIT_SECONDS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        # The spool holds api keys. SQLite creates the -wal and -shm files with the mode of the database,
+        # files of older versions that were created with the umask are restricted as well.
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        for name in (path, f'{path}-wal', f'{path}-shm'):
+            if os.path.exists(name):
+                os.chmod(name, 0o600)
+
+        self.rateLimit = rateLimit
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS payloads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            api_key TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL DEFAULT 0
+        )''')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS buckets (
+            api_key TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            blocked_until REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (api_key, endpoint)
+        )''')
+
+    def push(self, apiKey, endpoint, data):
+        '''
+            Stores a payload and returns its id. A replaced payload passes its attempts and next attempt on,
+            so the backoff keeps growing while the api is down.
+        '''
+        with self.lock, self.db:
+            row = self.db.execute('SELECT MAX(attempts), MAX(next_attempt) FROM payloads WHERE api_key = ? AND endpoint = ?', (apiKey, endpoint)).fetchone()
+            attempts, nextAttempt = (row[0] or 0, row[1] or 0)
+            self.db.execute('DELETE FROM payloads WHERE api_key = ? AND endpoint = ?', (apiKey, endpoint))
+            cursor = self.db.execute(
+                'INSERT INTO payloads (api_key, endpoint, data, created, attempts, next_attempt) VALUES (?, ?, ?, ?, ?, ?)',
+                (apiKey, endpoint, json.dumps(data), time.time(), attempts, nextAttempt))
+            return cursor.lastrowid
+
+    def pending(self):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM payloads').fetchone()[0]
+
+    def _takeToken(self, apiKey, endpoint, now):
+        row = self.db.execute('SELECT tokens, updated, blocked_until FROM buckets WHERE api_key = ? AND endpoint = ?', (apiKey, endpoint)).fetchone()
+        tokens, updated, blockedUntil = row if row else (1.0, now, 0)
+
+        tokens = min(1.0, tokens + (now - updated) / self.rateLimit)
+        if tokens < 1 or now < blockedUntil:
+            return False
+
+        self.db.execute('INSERT OR REPLACE INTO buckets (api_key, endpoint, tokens, updated, blocked_until) VALUES (?, ?, ?, ?, ?)', (apiKey, endpoint, tokens - 1, now, blockedUntil))
+        return True
+
+    def nextSlot(self, apiKey):
+        '''
+            Returns the seconds until every endpoint of apiKey may be called again
+        '''
+        with self.lock:
+            now = time.time()
+            rows = self.db.execute('SELECT tokens, updated, blocked_until FROM buckets WHERE api_key = ?', (apiKey,)).fetchall()
+
+        return max([0] + [max(updated + (1 - tokens) * self.rateLimit, blockedUntil) - now for tokens, updated, blockedUntil in rows])
+
+    def _failed(self, payloadId, apiKey, endpoint, attempts, err, now):
+        if err.permanent:
+            self.db.execute('DELETE FROM payloads WHERE id = ?', (payloadId,))
+            return
+
+        delay = min(BACKOFF_BASE_SECONDS * 2**attempts, BACKOFF_MAX_SECONDS)
+        if err.retryAfter is not None:
+            delay = max(delay, err.retryAfter)
+            self.db.execute('UPDATE buckets SET blocked_until = ? WHERE api_key = ? AND endpoint = ?', (now + err.retryAfter, apiKey, endpoint))
+
+        self.db.execute('UPDATE payloads SET attempts = ?, next_attempt = ? WHERE id = ?', (attempts + 1, now + delay, payloadId))
+
+    def flush(self, send, limit=None):
+        '''
+            Delivers all payloads that are due and allowed by the rate limit with send(apiKey, endpoint, data),
+            at most limit of them if a limit is given. send returns the api result or raises DeliveryError.
+            Returns a dict of payload id to result of every delivered payload and a dict of payload id to the
+            error of every failed one.
+        '''
+        delivered = {}
+        failed = {}
+
+        with self.lock:
+            now = time.time()
+            rows = self.db.execute('SELECT id, api_key, endpoint, data, attempts FROM payloads WHERE next_attempt <= ? ORDER BY id', (now,)).fetchall()
+
+            for payloadId, apiKey, endpoint, data, attempts in rows:
+                if limit is not None and len(delivered) + len(failed) >= limit:
+                    break
+
+                with self.db:
+                    if not self._takeToken(apiKey, endpoint, now):
+                        continue
+
+                # No transaction is held while waiting for the api
+                try:
+                    result = send(apiKey, endpoint, json.loads(data))
+                except DeliveryError as err:
+                    failed[payloadId] = err
+                    with self.db:
+                        self._failed(payloadId, apiKey, endpoint, attempts, err, now)
+                    continue
+
+                delivered[payloadId] = result
+                with self.db:
+                    self.db.execute('DELETE FROM payloads WHERE id = ?', (payloadId,))
+
+        return delivered, failed
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,64 @@
+import math
+import time
+from .util import loadJson, saveJson
+
+# Time constant in seconds of the moving average of the block processing rate
+EWMA_SECONDS = 1800
+# A node with more headers than blocks beyond this is catching up
+SYNCED_BLOCKS = 10
+
+
+class SyncEstimator:
+    '''
+        Follows the sync progress from getblockchaininfo. The block processing rate is smoothed with an EWMA
+        that weights every sample by the time since the previous one, its state is kept in a state file so
+        cron runs build on each other.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.syncing = loadJson(path, {}).get('syncing', False)
+
+    def _rate(self, state, blocks, now):
+        rate = state.get('rate')
+        if 'time' not in state or blocks < state['blocks']:
+            # First sample or a reindex started over
+            return None
+        if now <= state['time']:
+            return rate
+
+        seconds = now - state['time']
+        sample = (blocks - state['blocks']) / seconds
+        if rate is None:
+            return sample
+
+        return rate + (1 - math.exp(-seconds / EWMA_SECONDS)) * (sample - rate)
+
+    def update(self, info, now=None):
+        '''
+            Takes a getblockchaininfo result and returns sync percentage, blocks per second and the estimated
+            seconds until the node reaches the tip
+        '''
+        now = time.time() if now is None else now
+        rate = self._rate(loadJson(self.path, {}), info['blocks'], now)
+        remaining = max(0, info['headers'] - info['blocks'])
+        self.syncing = bool(info.get('initialblockdownload')) or remaining > SYNCED_BLOCKS
+
+        try:
+            saveJson(self.path, {'time': now, 'blocks': info['blocks'], 'rate': rate, 'syncing': self.syncing})
+        except OSError as err:
+            print(f"❌ Could not write sync state {self.path}: {err}")
+
+        if remaining == 0:
+            eta = 0
+        elif rate:
+            eta = remaining / rate
+        else:
+            eta = None
+
+        return {
+            'syncing': self.syncing,
+            'sync_progress': info['verificationprogress'] * 100,
+            'sync_headers': info['headers'],
+            'sync_blocks_per_second': rate,
+            'sync_eta_seconds': eta,
+        }
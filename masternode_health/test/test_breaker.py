@@ -0,0 +1,49 @@
+from masternode_health.breaker import CircuitBreaker, FAILURE_THRESHOLD, COOLDOWN_SECONDS
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+
+
+@mock.patch('masternode_health.breaker.time.time', return_value=1000)
+class CircuitBreakerTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'breaker.json')
+
+    def test_opens_after_threshold(self, mock_time):
+        breaker = CircuitBreaker(self.path)
+        for i in range(FAILURE_THRESHOLD - 1):
+            self.assertFalse(breaker.failure())
+        self.assertTrue(breaker.allow())
+
+        self.assertTrue(breaker.failure())
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.openUntil, 1000 + COOLDOWN_SECONDS)
+
+        # The state survives from one run to the next
+        self.assertFalse(CircuitBreaker(self.path).allow())
+
+    def test_success_resets(self, mock_time):
+        breaker = CircuitBreaker(self.path)
+        breaker.failure()
+        breaker.success()
+        for i in range(FAILURE_THRESHOLD - 1):
+            breaker.failure()
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_doubles_cooldown(self, mock_time):
+        breaker = CircuitBreaker(self.path)
+        for i in range(FAILURE_THRESHOLD):
+            breaker.failure()
+
+        mock_time.return_value = 1000 + COOLDOWN_SECONDS
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.failure())
+        self.assertEqual(breaker.openUntil, 1000 + 3 * COOLDOWN_SECONDS)
+
+        mock_time.return_value = 1000 + 3 * COOLDOWN_SECONDS
+        breaker.success()
+        self.assertEqual(CircuitBreaker(self.path).cooldown, COOLDOWN_SECONDS)
@@ -0,0 +1,55 @@
+from masternode_health.cache import FileCache
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+
+
+class FileCacheTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.cachePath = os.path.join(self.dir, 'state', 'cache.json')
+        self.file = os.path.join(self.dir, 'defi.conf')
+        with open(self.file, 'w') as f:
+            f.write('rpcuser=user\n')
+
+    def test_value_is_cached(self):
+        cache = FileCache(self.cachePath)
+        compute = mock.Mock(return_value='v1')
+
+        self.assertEqual(cache.get('name', self.file, compute), 'v1')
+        self.assertEqual(cache.get('name', self.file, compute), 'v1')
+        compute.assert_called_once()
+
+    def test_value_recomputed_on_change(self):
+        cache = FileCache(self.cachePath)
+        compute = mock.Mock(side_effect=['v1', 'v2'])
+
+        cache.get('name', self.file, compute)
+        with open(self.file, 'a') as f:
+            f.write('rpcpassword=password\n')
+
+        self.assertEqual(cache.get('name', self.file, compute), 'v2')
+        self.assertEqual(compute.call_count, 2)
+
+    def test_cache_persists(self):
+        cache = FileCache(self.cachePath)
+        cache.get('name', self.file, lambda: {'rpcuser': 'user'})
+        cache.save()
+
+        self.assertEqual(os.stat(self.cachePath).st_mode & 0o777, 0o600)
+
+        compute = mock.Mock()
+        self.assertEqual(FileCache(self.cachePath).get('name', self.file, compute), {'rpcuser': 'user'})
+        compute.assert_not_called()
+
+    def test_missing_file_is_not_cached(self):
+        cache = FileCache(self.cachePath)
+        compute = mock.Mock(return_value='v1')
+
+        cache.get('name', os.path.join(self.dir, 'missing'), compute)
+        cache.get('name', os.path.join(self.dir, 'missing'), compute)
+        self.assertEqual(compute.call_count, 2)
+        self.assertFalse(cache.dirty)
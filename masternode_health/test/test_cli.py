@@ -0,0 +1,48 @@
+from masternode_health import cli
+from unittest import TestCase
+import json
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+HEAVY_MODULES = ['requests', 'psutil', 'sqlite3', 'subprocess', 'concurrent.futures', 'http.server', 'ssl', 'masternode_health.monitor']
+
+
+class ImportBudgetTest(TestCase):
+
+    def _loadedModules(self, argv):
+        code = (
+            'import sys, json\n'
+            'from masternode_health import cli\n'
+            'try:\n'
+            f'    cli.parse_args({argv!r})\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'print(json.dumps(sorted(sys.modules)))\n'
+        )
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+        return set(json.loads(output.splitlines()[-1]))
+
+    def test_version_does_not_load_collectors(self):
+        self.assertEqual(self._loadedModules(['--version']) & set(HEAVY_MODULES), set())
+
+    def test_help_does_not_load_collectors(self):
+        self.assertEqual(self._loadedModules(['--help']) & set(HEAVY_MODULES), set())
+
+    def test_arguments_do_not_load_collectors(self):
+        self.assertEqual(self._loadedModules(['--api-key', 'key']) & set(HEAVY_MODULES), set())
+
+
+class SendsReportsTest(TestCase):
+
+    def test_reporting_runs(self):
+        self.assertTrue(cli.sendsReports(cli.parse_args(['--api-key', 'key'])))
+        self.assertTrue(cli.sendsReports(cli.parse_args(['--api-key', 'key', '--daemon'])))
+        self.assertTrue(cli.sendsReports(cli.parse_args(['--api-key', 'key', '--daemon', '--exporter-port', '9101'])))
+        self.assertTrue(cli.sendsReports(cli.parse_args(['--api-key', 'key', '--verbose', '--report'])))
+
+    def test_runs_without_reports(self):
+        self.assertFalse(cli.sendsReports(cli.parse_args(['--exporter-port', '9101'])))
+        self.assertFalse(cli.sendsReports(cli.parse_args(['--watch', '1'])))
+        self.assertFalse(cli.sendsReports(cli.parse_args(['--verbose'])))
@@ -0,0 +1,96 @@
+from masternode_health.daemon import Daemon
+from unittest import TestCase, mock
+
+
+class DaemonTest(TestCase):
+
+    def setUp(self):
+        self.nm = mock.Mock()
+        self.nm.verbose = False
+        self.nm.reportDelay.return_value = 0
+        self.daemon = Daemon(self.nm, 300)
+
+    def test_runCycle_sends_report(self):
+        self.daemon.runCycle()
+        self.nm.processNode.assert_called_once()
+        self.nm.sendReport.assert_called_once()
+
+    def test_runCycle_without_report(self):
+        self.daemon.sendReport = False
+        self.daemon.runCycle()
+        self.nm.processNode.assert_called_once()
+        self.nm.sendReport.assert_not_called()
+
+    def test_runCycle_with_exporter(self):
+        self.daemon.exporter = mock.Mock()
+        self.daemon.runCycle()
+        self.daemon.exporter.refresh.assert_called_once()
+        self.nm.processNode.assert_not_called()
+        self.nm.sendReport.assert_called_once()
+
+    def test_runCycle_survives_systemexit(self):
+        self.nm.processNode.side_effect = SystemExit('❌ failed')
+        self.daemon.runCycle()
+        self.nm.sendReport.assert_not_called()
+
+    @mock.patch('masternode_health.daemon.signal.signal')
+    def test_run_stops_on_term(self, mock_signal):
+        self.nm.processNode.side_effect = lambda: self.daemon._handleTerm(None, None)
+        self.daemon.run()
+        self.assertFalse(self.daemon.running)
+        self.nm.processNode.assert_called_once()
+
+    @mock.patch('masternode_health.daemon.signal.signal')
+    def test_run_reloads_on_hup(self, mock_signal):
+        def cycle():
+            if self.nm.processNode.call_count == 1:
+                self.daemon._handleHup(None, None)
+            else:
+                self.daemon._handleTerm(None, None)
+
+        self.daemon.interval = 0.01
+        self.nm.processNode.side_effect = cycle
+        self.daemon.run()
+        self.nm.reloadConfig.assert_called_once()
+        self.assertEqual(self.nm.processNode.call_count, 2)
+
+    @mock.patch('masternode_health.daemon.time.monotonic')
+    @mock.patch('masternode_health.daemon.signal.signal')
+    def test_run_skips_missed_slots(self, mock_signal, mock_monotonic):
+        clock = [1000.0]
+        mock_monotonic.side_effect = lambda: clock[0]
+        waits = []
+
+        def cycle():
+            # Overrun the schedule by more than two intervals
+            clock[0] += 700
+
+        def wait(timeout):
+            waits.append(timeout)
+            self.daemon.running = False
+
+        self.nm.processNode.side_effect = cycle
+        self.daemon._wakeup.wait = wait
+        self.daemon.run()
+        self.assertEqual(waits, [200])
+
+    @mock.patch('masternode_health.daemon.time.monotonic')
+    @mock.patch('masternode_health.daemon.signal.signal')
+    def test_run_waits_for_rate_limit(self, mock_signal, mock_monotonic):
+        clock = [1000.0]
+        mock_monotonic.side_effect = lambda: clock[0]
+        waits = []
+
+        def wait(timeout):
+            waits.append(timeout)
+            clock[0] += timeout
+            if len(waits) == 2:
+                self.daemon.running = False
+
+        # Cycles take 5 seconds. The rate limit moves the second cycle from 1300 to 1305, the third one
+        # follows 300 seconds later
+        self.nm.processNode.side_effect = lambda: clock.__setitem__(0, clock[0] + 5)
+        self.nm.reportDelay.side_effect = [300, 100]
+        self.daemon._wakeup.wait = wait
+        self.daemon.run()
+        self.assertEqual(waits, [300, 295])
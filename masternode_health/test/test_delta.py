@@ -0,0 +1,97 @@
+from masternode_health.delta import DeltaTracker
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+
+
+def send(tracker, apiKey, endpoint, payload):
+    prepared = tracker.prepare(apiKey, endpoint, payload)
+    if prepared is payload:
+        tracker.confirm(apiKey, endpoint, payload)
+
+    return prepared
+
+
+class DeltaTrackerTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'delta.json')
+        self.payload = {
+            'block_height_local': 100,
+            'local_hash': 'abc',
+            'node_uptime': 10,
+            'connection_count': 8,
+            'logsize': 20.0,
+            'config_checksum': 'x'
+        }
+
+    def test_off_always_sends(self):
+        tracker = DeltaTracker(self.path)
+        self.assertEqual(tracker.prepare('key', 'node-info', self.payload), self.payload)
+        self.assertEqual(tracker.prepare('key', 'node-info', self.payload), self.payload)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_heartbeat_when_unchanged(self):
+        tracker = DeltaTracker(self.path, 'heartbeat')
+        self.assertEqual(send(tracker, 'key', 'node-info', self.payload), self.payload)
+
+        payload = dict(self.payload, node_uptime=310, block_height_local=110, local_hash='def', logsize=21.0)
+        self.assertEqual(send(tracker, 'key', 'node-info', payload), {'block_height_local': 110, 'local_hash': 'def', 'node_uptime': 310})
+
+    def test_skip_when_unchanged(self):
+        tracker = DeltaTracker(self.path, 'skip')
+        send(tracker, 'key', 'node-info', self.payload)
+        self.assertIsNone(send(tracker, 'key', 'node-info', dict(self.payload, node_uptime=310)))
+
+    def test_full_report_when_changed(self):
+        tracker = DeltaTracker(self.path, 'skip')
+        send(tracker, 'key', 'node-info', self.payload)
+
+        changed = dict(self.payload, connection_count=7)
+        self.assertEqual(send(tracker, 'key', 'node-info', changed), changed)
+
+        grown = dict(changed, logsize=35.0)
+        self.assertEqual(send(tracker, 'key', 'node-info', grown), grown)
+
+        added = dict(grown, log_errors=1)
+        self.assertEqual(send(tracker, 'key', 'node-info', added), added)
+
+    def test_threshold_compares_to_last_full_report(self):
+        tracker = DeltaTracker(self.path, 'skip')
+        send(tracker, 'key', 'node-info', self.payload)
+        self.assertIsNone(send(tracker, 'key', 'node-info', dict(self.payload, logsize=26.0)))
+
+        grown = dict(self.payload, logsize=32.0)
+        self.assertEqual(send(tracker, 'key', 'node-info', grown), grown)
+
+    def test_full_report_after_interval(self):
+        tracker = DeltaTracker(self.path, 'skip', 3600)
+
+        with mock.patch('masternode_health.delta.time.time', return_value=1000):
+            send(tracker, 'key', 'node-info', self.payload)
+        with mock.patch('masternode_health.delta.time.time', return_value=4500):
+            self.assertIsNone(send(tracker, 'key', 'node-info', self.payload))
+        with mock.patch('masternode_health.delta.time.time', return_value=4700):
+            self.assertEqual(send(tracker, 'key', 'node-info', self.payload), self.payload)
+
+    def test_state_per_key_and_endpoint(self):
+        tracker = DeltaTracker(self.path, 'skip')
+        send(tracker, 'key', 'node-info', self.payload)
+
+        self.assertEqual(send(tracker, 'other', 'node-info', self.payload), self.payload)
+        self.assertEqual(send(tracker, 'key', 'server-stats', {'load_avg': 1}), {'load_avg': 1})
+        self.assertIsNone(send(DeltaTracker(self.path, 'skip'), 'key', 'node-info', self.payload))
+        self.assertNotIn('key', open(self.path).read())
+
+    def test_state_needs_confirmed_delivery(self):
+        tracker = DeltaTracker(self.path, 'skip')
+        self.assertEqual(tracker.prepare('key', 'node-info', self.payload), self.payload)
+        self.assertFalse(os.path.exists(self.path))
+        # The first report has not been delivered, so the next one is sent in full again
+        self.assertEqual(tracker.prepare('key', 'node-info', self.payload), self.payload)
+
+        tracker.confirm('key', 'node-info', self.payload)
+        self.assertIsNone(tracker.prepare('key', 'node-info', self.payload))
@@ -0,0 +1,71 @@
+from masternode_health.dirsize import DirSizeIndex, HOT_SECONDS
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+import time
+
+
+class DirSizeIndexTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.data = os.path.join(self.dir, 'data')
+        self.indexPath = os.path.join(self.dir, 'state', 'dirsize.json')
+        self._write('blocks/blk00000.dat', 1000, old=True)
+        self._write('blocks/blk00001.dat', 200)
+        self._write('blocks/index/000001.ldb', 300, old=True)
+        self._write('chainstate/000002.ldb', 50)
+
+    def _write(self, name, size, old=False):
+        path = os.path.join(self.data, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as f:
+            f.write(b'x' * size)
+        if old:
+            past = time.time() - 2 * HOT_SECONDS
+            os.utime(path, (past, past))
+
+    def _sizes(self, index):
+        return index.sizes({name: os.path.join(self.data, name) for name in ['blocks', 'chainstate', 'enhancedcs']})
+
+    def test_sizes(self):
+        index = DirSizeIndex(self.indexPath)
+        self.assertEqual(self._sizes(index), {'blocks': 1500, 'chainstate': 50, 'enhancedcs': None})
+        self.assertEqual(index.scanned, 3)
+
+    def test_unchanged_directories_are_not_scanned(self):
+        self._sizes(DirSizeIndex(self.indexPath))
+
+        index = DirSizeIndex(self.indexPath)
+        with mock.patch('masternode_health.dirsize.os.scandir', side_effect=AssertionError('scanned')):
+            self.assertEqual(self._sizes(index)['blocks'], 1500)
+        self.assertEqual(index.scanned, 0)
+
+    def test_hot_files_grow_without_rescan(self):
+        index = DirSizeIndex(self.indexPath)
+        self._sizes(index)
+
+        mtime = os.stat(os.path.join(self.data, 'blocks')).st_mtime_ns
+        self._write('blocks/blk00001.dat', 100)
+        os.utime(os.path.join(self.data, 'blocks'), ns=(mtime, mtime))
+
+        self.assertEqual(self._sizes(index)['blocks'], 1600)
+        self.assertEqual(index.scanned, 0)
+
+    def test_changed_directory_is_rescanned(self):
+        index = DirSizeIndex(self.indexPath)
+        self._sizes(index)
+
+        self._write('blocks/blk00002.dat', 10)
+        self.assertEqual(self._sizes(index)['blocks'], 1510)
+        self.assertEqual(index.scanned, 1)
+
+    def test_removed_directories_are_forgotten(self):
+        index = DirSizeIndex(self.indexPath)
+        self._sizes(index)
+
+        shutil.rmtree(os.path.join(self.data, 'blocks', 'index'))
+        self.assertEqual(self._sizes(index)['blocks'], 1200)
+        self.assertNotIn(os.path.join(self.data, 'blocks', 'index'), index.index)
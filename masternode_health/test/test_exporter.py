@@ -0,0 +1,156 @@
+from masternode_health.exporter import Exporter
+from masternode_health.monitor import NodeMonitor, parse_args
+from masternode_health.transport import ConnectionError
+from unittest import TestCase, mock
+from urllib.request import urlopen
+import os
+import shutil
+import tempfile
+import time
+
+
+class ExporterTest(TestCase):
+
+    def setUp(self):
+        self.nm = mock.Mock(spec=['name', 'processNode', 'snapshot'])
+        self.nm.name = None
+        self.nm.snapshot.nodeInfoPayload.return_value = {
+            'block_height_local': 1149879,
+            'local_hash': 'hash',
+            'node_uptime': 100,
+            'operator_status': [{'id': 'op1', 'online': True}, {'id': 'op2', 'online': False}],
+            'connection_count': 8,
+            'logsize': 16.5,
+            'config_checksum': 'sum',
+            'node_version': 'v1.8.1.0',
+            'log_errors': 2,
+            'rpc_latency': 0.25,
+            'defid_samples': {'defid_rss': {'p50': 512}},
+        }
+        self.nm.snapshot.serverStatsPayload.return_value = {
+            'load_avg': 0.5,
+            'hdd_used': 10,
+            'hdd_total': 100,
+            'ram_used': 2,
+            'ram_total': 8,
+            'num_cores': 4,
+            'server_script_version': '1.0.5',
+        }
+        self.exporter = Exporter(self.nm, 0, '127.0.0.1', maxAge=60)
+        self.addCleanup(self.exporter.server.server_close)
+
+    def test_render(self):
+        body = self.exporter.render().decode()
+
+        self.assertIn('masternode_health_block_height_local{node="default"} 1149879\n', body)
+        self.assertIn('masternode_health_logsize_megabytes{node="default"} 16.5\n', body)
+        self.assertIn('masternode_health_operator_online{node="default",operator="op1"} 1\n', body)
+        self.assertIn('masternode_health_operator_online{node="default",operator="op2"} 0\n', body)
+        self.assertIn('masternode_health_node_info{node="default",local_hash="hash",config_checksum="sum",node_version="v1.8.1.0",server_script_version="1.0.5"} 1\n', body)
+        self.assertIn('# TYPE masternode_health_node info\n', body)
+
+    def test_other_numeric_fields(self):
+        body = self.exporter.render().decode()
+
+        self.assertIn('# HELP masternode_health_log_errors Field log_errors of the node-info payload\n', body)
+        self.assertIn('masternode_health_log_errors{node="default"} 2\n', body)
+        self.assertIn('masternode_health_rpc_latency{node="default"} 0.25\n', body)
+        self.assertNotIn('defid_samples', body)
+        self.assertNotIn('masternode_health_logsize{', body)
+        self.assertNotIn('masternode_health_node_version{', body)
+
+    def test_missing_values_are_skipped(self):
+        self.nm.snapshot.nodeInfoPayload.return_value['block_height_local'] = None
+        self.assertNotIn('block_height_local{', self.exporter.render().decode())
+
+    def test_scrape_uses_cached_snapshot(self):
+        self.exporter.refresh()
+        self.exporter.scrape()
+        self.exporter.scrape()
+
+        self.nm.processNode.assert_called_once()
+
+    def test_scrape_refreshes_stale_snapshot(self):
+        self.exporter.refresh()
+        self.exporter.updated -= 61
+        body = self.exporter.scrape()
+
+        self.assertTrue(body.endswith(b'# EOF\n'))
+        for i in range(100):
+            if self.nm.processNode.call_count == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.nm.processNode.call_count, 2)
+
+    def test_background_refresh_holds_lock_and_rechecks_age(self):
+        self.exporter.refresh()
+        self.exporter.updated -= 61
+        self.nm.processNode.side_effect = lambda: self.assertTrue(self.exporter.lock.locked())
+
+        with mock.patch('masternode_health.exporter.threading.Thread') as thread:
+            self.exporter.scrape()
+            # A second scrape finds the collection running
+            self.exporter.scrape()
+            self.assertEqual(thread.call_count, 1)
+
+            # Another refresh finished before the background collection started
+            self.exporter.updated = time.monotonic()
+            thread.call_args[1]['target']()
+            self.nm.processNode.assert_called_once()
+            self.assertFalse(self.exporter.lock.locked())
+
+            self.exporter.updated -= 61
+            self.exporter.scrape()
+            thread.call_args[1]['target']()
+            self.assertEqual(self.nm.processNode.call_count, 2)
+            self.assertFalse(self.exporter.lock.locked())
+
+    def test_scrape_does_not_collect_next_to_daemon(self):
+        exporter = Exporter(self.nm, 0, '127.0.0.1', maxAge=60, collect=False)
+        self.addCleanup(exporter.server.server_close)
+        exporter.scrape()
+        exporter.refresh()
+        exporter.updated -= 61
+        self.assertIn(b'masternode_health_block_height_local{node="default"} 1149879\n', exporter.scrape())
+
+        time.sleep(0.05)
+        self.nm.processNode.assert_called_once()
+
+    def test_failed_refresh(self):
+        self.nm.processNode.side_effect = SystemExit('❌ failed')
+        self.assertRaises(SystemExit, self.exporter.refresh)
+        self.assertIn(b'masternode_health_collection_success 0\n', self.exporter.scrape())
+
+    def test_http(self):
+        self.exporter.refresh()
+        self.exporter.start()
+        self.addCleanup(self.exporter.server.shutdown)
+
+        with urlopen(f'http://127.0.0.1:{self.exporter.server.server_port}/metrics') as response:
+            self.assertTrue(response.headers['Content-Type'].startswith('application/openmetrics-text'))
+            self.assertIn(b'masternode_health_num_cores{node="default"} 4\n', response.read())
+
+
+class ExporterDefidDownTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        with open(os.path.join(self.dir, 'defi.conf'), 'w') as f:
+            f.write('rpcuser=user\nrpcpassword=password\n')
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post', side_effect=ConnectionError('refused'))
+    def test_defid_down(self, mock_post):
+        for apiKey in ([], ['--api-key', 'key']):
+            args = parse_args(['--exporter-port', '0', '--defi-path', self.dir, '--defi-conf', os.path.join(self.dir, 'defi.conf'), '--state-dir', self.dir] + apiKey)
+            nm = NodeMonitor(args)
+            exporter = Exporter(nm, 0, '127.0.0.1')
+            self.addCleanup(exporter.server.server_close)
+
+            with self.assertRaises(SystemExit):
+                exporter.refresh()
+            self.assertIn(b'masternode_health_collection_success 0\n', exporter.scrape())
+
+        # Only the rpc calls have been tried, the exporter never reports defid as down to the api
+        self.assertTrue(all(call[0][0] == 'http://localhost:8554' for call in mock_post.call_args_list))
+        self.assertEqual(nm.spool.pending(), 0)
@@ -0,0 +1,105 @@
+from masternode_health.gateway import Gateway
+from masternode_health.spool import Spool
+from masternode_health.transport import HTTPError, Response
+from masternode_health.cli import parse_args
+from unittest import TestCase, mock
+from urllib.error import HTTPError as UrlHTTPError
+from urllib.request import Request, urlopen
+import json
+import os
+import shutil
+import tempfile
+
+
+class GatewayTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.spool = Spool(os.path.join(self.dir, 'gateway.sqlite'))
+        self.addCleanup(self.spool.close)
+        self.transport = mock.Mock()
+        self.transport.post.return_value = Response(200, {}, b'{"result": "ok"}', 'url')
+        self.gateway = Gateway('https://api/v1', self.spool, self.transport, 0, '127.0.0.1')
+        self.addCleanup(self.gateway.server.server_close)
+
+    def test_forward(self):
+        self.assertTrue(self.gateway.accept('key', 'node-info', {'block_height_local': 100}))
+        self.assertTrue(self.gateway.forwardOnce())
+        self.transport.post.assert_called_once_with('https://api/v1/node-info', headers={'x-api-key': 'key'}, json={'block_height_local': 100}, timeout=30)
+        self.assertEqual(self.spool.pending(), 0)
+        self.assertFalse(self.gateway.forwardOnce())
+
+    def test_duplicate_is_dropped(self):
+        self.assertTrue(self.gateway.accept('key', 'node-info', {'a': 1}, now=1000))
+        self.assertFalse(self.gateway.accept('key', 'node-info', {'a': 1}, now=1010))
+        # Outside of the rate limit window the same payload is a new report
+        self.assertTrue(self.gateway.accept('key', 'node-info', {'a': 1}, now=1400))
+        self.assertEqual(self.gateway.counters['duplicates'], 1)
+
+    def test_newer_payload_is_coalesced(self):
+        self.gateway.accept('key', 'node-info', {'a': 1})
+        self.gateway.accept('key', 'node-info', {'a': 2})
+        self.gateway.forwardOnce()
+        self.transport.post.assert_called_once()
+        self.assertEqual(self.transport.post.call_args[1]['json'], {'a': 2})
+
+    def test_one_upload_per_call(self):
+        self.gateway.accept('key1', 'node-info', {'a': 1})
+        self.gateway.accept('key2', 'node-info', {'a': 2})
+        self.gateway.forwardOnce()
+        self.assertEqual(self.transport.post.call_count, 1)
+        self.gateway.forwardOnce()
+        self.assertEqual(self.transport.post.call_count, 2)
+
+    def test_failed_upload(self):
+        response = Response(429, {'Retry-After': '60'}, b'', 'url')
+        self.transport.post.return_value = response
+        self.transport.post.return_value.raise_for_status = mock.Mock(side_effect=HTTPError('429', response=response))
+        self.gateway.accept('key', 'server-stats', {'load_avg': 1})
+        self.gateway.forwardOnce()
+
+        status = self.gateway.status()
+        self.assertEqual((status['failed'], status['pending']), (1, 1))
+        node, = status['nodes'].values()
+        self.assertEqual(node['endpoints']['server-stats']['error'], '429')
+
+        # A newer report of the node waits for the backoff of the failed one
+        self.gateway.accept('key', 'server-stats', {'load_avg': 2})
+        self.assertFalse(self.gateway.forwardOnce())
+        self.assertEqual(self.transport.post.call_count, 1)
+
+    def test_status(self):
+        self.gateway.accept('key1', 'node-info', {'block_height_local': 100, 'operator_status': [{'id': 'a', 'online': True}, {'id': 'b', 'online': False}]}, '10.0.0.1')
+        self.gateway.accept('key2', 'node-info', {'block_height_local': 90}, '10.0.0.2')
+        self.gateway.forwardOnce()
+
+        status = self.gateway.status()
+        self.assertEqual((status['received'], status['forwarded'], status['pending']), (2, 1, 1))
+        self.assertEqual(status['block_height_max'], 100)
+        self.assertNotIn('key1', json.dumps(status))
+        node = [node for node in status['nodes'].values() if node['address'] == '10.0.0.1'][0]
+        self.assertEqual((node['operators'], node['operators_online']), (2, 1))
+        self.assertNotIn('hash', node['endpoints']['node-info'])
+
+    def test_http(self):
+        self.gateway.start()
+        self.addCleanup(self.gateway.stop)
+        url = f'http://127.0.0.1:{self.gateway.server.server_address[1]}'
+
+        request = Request(f'{url}/v1/node-info', data=b'{"block_height_local": 100}', headers={'x-api-key': 'key', 'Content-Type': 'application/json'})
+        with urlopen(request) as response:
+            self.assertEqual(response.status, 202)
+            self.assertEqual(json.loads(response.read()), {'result': 'queued'})
+
+        with self.assertRaises(UrlHTTPError) as context:
+            urlopen(Request(f'{url}/v1/node-info', data=b'{}'))
+        self.assertEqual(context.exception.code, 401)
+
+        with urlopen(f'{url}/status') as response:
+            self.assertEqual(json.loads(response.read())['received'], 1)
+
+    def test_arguments(self):
+        self.assertEqual(parse_args(['--gateway-port', '8555']).gateway_port, 8555)
+        with self.assertRaises(SystemExit):
+            parse_args(['--gateway-port', '8555', '--daemon'])
@@ -0,0 +1,32 @@
+from masternode_health.lock import InstanceLock, LockedError
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+
+
+class InstanceLockTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'state', 'lock')
+
+    def test_second_lock_fails(self):
+        lock = InstanceLock(self.path)
+        lock.acquire()
+        self.addCleanup(lock.release)
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), f'{os.getpid()}\n')
+        with self.assertRaises(LockedError):
+            InstanceLock(self.path).acquire()
+
+    def test_lock_after_release(self):
+        lock = InstanceLock(self.path)
+        lock.acquire()
+        lock.release()
+
+        other = InstanceLock(self.path)
+        other.acquire()
+        other.release()
@@ -0,0 +1,70 @@
+from masternode_health.logreader import LogAnalyzer
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+
+TIP = "2021-08-23T19:48:21Z UpdateTip: new best=abc height={} version=0x20000000 log2_work=1 tx=1 date='2021-08-23T19:48:21Z' progress=1.000000\n"
+
+
+class LogAnalyzerTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.log = os.path.join(self.dir, 'debug.log')
+        self.state = os.path.join(self.dir, 'logstate.json')
+        self._write('w', 'old line with an ERROR that must not be counted\n')
+        self.analyzer = LogAnalyzer(self.log, self.state)
+
+    def _write(self, mode, data):
+        with open(self.log, mode) as f:
+            f.write(data)
+
+    def test_first_scan_starts_at_end(self):
+        stats = self.analyzer.scan()
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(stats['bytes_scanned'], 0)
+
+    @mock.patch('masternode_health.logreader.time.time')
+    def test_scans_only_new_lines(self, mock_time):
+        mock_time.return_value = 1000
+        self.analyzer.scan()
+
+        self._write('a', TIP.format(10) + TIP.format(11) + 'ERROR: something\nWarning: low disk\nREORGANIZE: Disconnect 1 blocks\nincomplete')
+        mock_time.return_value = 1060
+        stats = self.analyzer.scan()
+
+        self.assertEqual(stats['updatetips'], 2)
+        self.assertEqual(stats['updatetip_rate'], 2.0)
+        self.assertEqual(stats['last_height'], 11)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['warnings'], 1)
+        self.assertEqual(stats['reorgs'], 1)
+        self.assertEqual(stats['reorg_messages'], ['REORGANIZE: Disconnect 1 blocks'])
+
+        # The incomplete line is picked up once it has been finished
+        self._write('a', ' error\n')
+        stats = self.analyzer.scan()
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['updatetips'], 0)
+
+    def test_truncated_log_is_rescanned(self):
+        self.analyzer.scan()
+        self._write('w', TIP.format(1))
+
+        stats = self.analyzer.scan()
+        self.assertEqual(stats['updatetips'], 1)
+
+    def test_rotated_log_is_rescanned(self):
+        self.analyzer.scan()
+        os.rename(self.log, self.log + '.1')
+        self._write('w', TIP.format(1) + TIP.format(2) + TIP.format(3) + 'padding to get bigger than the old file\n')
+
+        stats = self.analyzer.scan()
+        self.assertEqual(stats['updatetips'], 3)
+        self.assertEqual(stats['last_height'], 3)
+
+    def test_missing_log_raises(self):
+        os.remove(self.log)
+        self.assertRaises(OSError, self.analyzer.scan)
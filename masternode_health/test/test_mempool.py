@@ -0,0 +1,61 @@
+from masternode_health.mempool import MempoolTracker, MIN_INTERVAL, MAX_INTERVAL
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+
+
+def mempool(size, usage=1000, maxmempool=300000000):
+    return {'size': size, 'bytes': size * 500, 'usage': usage, 'maxmempool': maxmempool, 'mempoolminfee': 0.00001}
+
+
+class MempoolTrackerTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'mempool.json')
+
+    def test_first_poll(self):
+        tracker = MempoolTracker(self.path)
+        self.assertTrue(tracker.mempoolDue(0))
+        summary = tracker.update(mempool(20), {'blocks': 100, 'size_on_disk': 2 * 1024**2, 'difficulty': 1.5}, 1000)
+
+        self.assertEqual(summary['mempool_size'], 20)
+        self.assertEqual(summary['mempool_bytes'], 10000)
+        self.assertEqual(summary['mempool_poll_interval'], MIN_INTERVAL)
+        self.assertEqual((summary['chain_size'], summary['chain_difficulty']), (2, 1.5))
+        self.assertFalse(tracker.mempoolDue(1000 + MIN_INTERVAL - 1))
+        self.assertTrue(tracker.mempoolDue(1000 + MIN_INTERVAL))
+
+    def test_backs_off_while_idle(self):
+        tracker = MempoolTracker(self.path)
+        now = 0
+        for i in range(10):
+            tracker.update(mempool(20), now=now)
+            now = tracker.state['next']
+
+        self.assertEqual(tracker.state['interval'], MAX_INTERVAL)
+
+    def test_speeds_up_on_change_and_pressure(self):
+        tracker = MempoolTracker(self.path)
+        tracker.update(mempool(20), now=0)
+        tracker.update(mempool(20), now=60)
+        tracker.update(mempool(20), now=180)
+        self.assertEqual(tracker.state['interval'], 4 * MIN_INTERVAL)
+
+        tracker.update(mempool(200), now=420)
+        self.assertEqual(tracker.state['interval'], 2 * MIN_INTERVAL)
+
+        summary = tracker.update(mempool(200, usage=200000000), now=540)
+        self.assertEqual(summary['mempool_poll_interval'], MIN_INTERVAL)
+        self.assertAlmostEqual(summary['mempool_usage_ratio'], 2 / 3)
+
+    def test_state_survives_runs(self):
+        MempoolTracker(self.path).update(mempool(20), {'blocks': 100}, 1000)
+
+        tracker = MempoolTracker(self.path)
+        self.assertFalse(tracker.chainDue(100))
+        self.assertTrue(tracker.chainDue(101))
+        summary = tracker.summary(1030)
+        self.assertEqual((summary['mempool_size'], summary['mempool_age']), (20, 30))
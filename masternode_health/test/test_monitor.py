@@ -1,9 +1,21 @@
-from masternode_health.monitor import NodeMonitor, parse_args
+from masternode_health.monitor import NodeMonitor, parse_args, SERVER_COLLECTORS
 from unittest import TestCase, mock
-from requests.exceptions import HTTPError
+from masternode_health.transport import ConnectionError, HTTPError, Timeout
+from masternode_health.breaker import FAILURE_THRESHOLD
+from masternode_health.lock import InstanceLock, LockedError
+from masternode_health.tiptracker import TipTracker, Tip
 from datetime import datetime
 from os.path import expanduser
 import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+import shutil
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 class ParserTest(TestCase):
@@ -27,6 +39,7 @@ class ParserTest(TestCase):
         self.assertEqual(args.defi_path, home + '/.defi')
         self.assertEqual(args.defi_conf, home + '/.defi/defi.conf')
         self.assertEqual(args.max_block_seconds, 30)
+        self.assertEqual(args.state_dir, home + '/.masternode-health')
 
     def test_apikey_missing(self):
         with self.assertRaises(SystemExit):
@@ -40,6 +53,32 @@ class ParserTest(TestCase):
         with self.assertRaises(SystemExit):
             parse_args(['--verbose', '--report'])
 
+    def test_daemon_arguments(self):
+        args = parse_args(['--api-key', 'key', '--daemon', '--interval', '900'])
+        self.assertTrue(args.daemon)
+        self.assertEqual(args.interval, 900)
+
+    def test_daemon_interval_too_small(self):
+        with self.assertRaises(SystemExit):
+            parse_args(['--api-key', 'key', '--daemon', '--interval', '60'])
+
+    def test_sample_interval_needs_daemon(self):
+        with self.assertRaises(SystemExit):
+            parse_args(['--api-key', 'key', '--sample-interval', '1'])
+        self.assertEqual(parse_args(['--api-key', 'key', '--daemon', '--sample-interval', '1']).sample_interval, 1)
+
+    def test_track_tip_needs_daemon(self):
+        with self.assertRaises(SystemExit):
+            parse_args(['--api-key', 'key', '--track-tip'])
+        self.assertTrue(parse_args(['--api-key', 'key', '--daemon', '--track-tip']).track_tip)
+
+    def test_watch_arguments(self):
+        self.assertEqual(parse_args(['--watch', '1']).watch, 1)
+        with self.assertRaises(SystemExit):
+            parse_args(['--watch', '1', '--daemon'])
+        with self.assertRaises(SystemExit):
+            parse_args(['--watch', '0'])
+
     def test_version(self):
         with self.assertRaises(SystemExit):
             parse_args(['--api-key', 'bla', '--verison'])
@@ -49,7 +88,9 @@ class HealthMonitorTest(TestCase):
 
     @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=password\n'))
     def setUp(self):
-        args = parse_args(['--rpchost', 'host', '--verbose', '--api-key', 'key', '--max-block-seconds', '35', '--report', '--defi-path', '/'])
+        self.stateDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.stateDir)
+        args = parse_args(['--rpchost', 'host', '--verbose', '--api-key', 'key', '--max-block-seconds', '35', '--report', '--defi-path', '/', '--state-dir', self.stateDir])
         self.nm = NodeMonitor(args)
         self.home = expanduser("~")
 
@@ -81,28 +122,44 @@ class HealthMonitorTest(TestCase):
 
     @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data=''))
     def test_rpc_creds_missing(self):
-        args = parse_args(['--api-key', 'key'])
+        args = parse_args(['--api-key', 'key', '--state-dir', self.stateDir])
         self.assertRaises(ValueError, NodeMonitor, args)
 
     @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='[test]\nrpcuser=user\nrpcpassword=password\n'))
     def test_rpc_creds_in_test_fails(self):
-        args = parse_args(['--api-key', 'key'])
+        args = parse_args(['--api-key', 'key', '--state-dir', self.stateDir])
         self.assertRaises(ValueError, NodeMonitor, args)
 
     @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='[test]\nrpcuser=bla\nrpcpassword=bla\n[main]\nrpcuser=user\nrpcpassword=password\n'))
     def test_rpc_creds_in_test_and_main_ok(self):
-        args = parse_args(['--api-key', 'key'])
+        args = parse_args(['--api-key', 'key', '--state-dir', self.stateDir])
         nm = NodeMonitor(args)
         self.assertEqual(nm.rpcuser, 'user')
         self.assertEqual(nm.rpcpassword, 'password')
 
     @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=pass=word\n'))
     def test_rpc_creds_in_test_and_have_equal_sign(self):
-        args = parse_args(['--api-key', 'key'])
+        args = parse_args(['--api-key', 'key', '--state-dir', self.stateDir])
         nm = NodeMonitor(args)
         self.assertEqual(nm.rpcuser, 'user')
         self.assertEqual(nm.rpcpassword, 'pass=word')
 
+    @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=password\n'))
+    def test_state_files_per_node(self):
+        other = NodeMonitor(parse_args(['--api-key', 'key', '--defi-path', '/other', '--state-dir', self.stateDir]))
+        self.assertNotEqual(self.nm.cache.path, other.cache.path)
+        self.assertNotEqual(self.nm.delta.path, other.delta.path)
+        self.assertNotEqual(self.nm.logAnalyzer.statePath, other.logAnalyzer.statePath)
+        self.assertEqual(len([name for name in os.listdir(self.stateDir) if name.startswith('spool-') and name.endswith('.sqlite')]), 2)
+
+    @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=password\n'))
+    def test_state_files_of_exporter(self):
+        exporter = NodeMonitor(parse_args(['--exporter-port', '9101', '--defi-path', '/', '--state-dir', self.stateDir]))
+        for attribute in ('cache', 'delta', 'metrics', 'peerStats', 'syncEstimator', 'mempoolTracker', 'breaker'):
+            self.assertNotEqual(getattr(self.nm, attribute).path, getattr(exporter, attribute).path)
+        self.assertNotEqual(self.nm.logAnalyzer.statePath, exporter.logAnalyzer.statePath)
+        self.assertEqual(self.nm.instanceLock.path, exporter.instanceLock.path)
+
     @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=password\n'))
     def test_NodeMonitor_init(self):
         self.assertEqual(self.nm.defi_path, '/')
@@ -115,7 +172,7 @@ class HealthMonitorTest(TestCase):
         self.assertEqual(self.nm.rpcuser, 'user')
         self.assertEqual(self.nm.rpcpassword, 'password')
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_rpcquery_ok(self, mock_post):
         data = {
             'result': {"test": "ok"}
@@ -127,7 +184,7 @@ class HealthMonitorTest(TestCase):
         result = self.nm._rpcquery('getminiginfo')
         self.assertEqual(result['test'], 'ok')
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_rpcquery_with_param_ok(self, mock_post):
         data = {
             'result': {"test": "ok"}
@@ -139,13 +196,71 @@ class HealthMonitorTest(TestCase):
         result = self.nm._rpcquery('getminiginfo', params={'id': 1})
         self.assertEqual(result['test'], 'ok')
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_rpcquery_failed(self, mock_post):
         mock_resp = self._mock_response(status=500, raise_for_status=HTTPError("rpcerror"))
         mock_post.return_value = mock_resp
         self.assertRaises(HTTPError, self.nm._rpcquery, 'getmininginfo')
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_rpcbatch_ok(self, mock_post):
+        data = [
+            {'id': 'getblockcount', 'result': 100, 'error': None},
+            {'id': 'getbestblockhash', 'result': 'hash', 'error': None},
+        ]
+
+        mock_resp = self._mock_response(status=200, json_data=data)
+        mock_post.return_value = mock_resp
+
+        results, errors = self.nm._rpcbatch([('getbestblockhash', 'getbestblockhash', False), ('getblockcount', 'getblockcount', False)])
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(results, {'getblockcount': 100, 'getbestblockhash': 'hash'})
+        self.assertEqual(errors, {})
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_rpcbatch_is_profiled(self, mock_post):
+        data = [
+            {'id': 'getblockcount', 'result': 100, 'error': None},
+            {'id': 'uptime', 'result': 5, 'error': None},
+        ]
+
+        mock_resp = self._mock_response(status=200, json_data=data)
+        mock_post.return_value = mock_resp
+
+        self.nm._rpcbatch([('getblockcount', 'getblockcount', False), ('uptime', 'uptime', False)])
+        self.assertEqual(self.nm.profiler.stats()['rpc']['getblockcount+uptime']['count'], 1)
+
+        self.nm.report_latency = True
+        self.nm.snapshot = self.nm.takeSnapshot()
+        self.assertGreater(self.nm.snapshot.nodeInfoPayload()['rpc_latency'], 0)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_rpcbatch_partial_error(self, mock_post):
+        data = [
+            {'id': 'getblockcount', 'result': 100, 'error': None},
+            {'id': 'uptime', 'result': None, 'error': {'code': -32601, 'message': 'Method not found'}},
+        ]
+
+        mock_resp = self._mock_response(status=200, json_data=data)
+        mock_post.return_value = mock_resp
+
+        results, errors = self.nm._rpcbatch([('getblockcount', 'getblockcount', False), ('uptime', 'uptime', False), ('getconnectioncount', 'getconnectioncount', False)])
+        self.assertEqual(results, {'getblockcount': 100})
+        self.assertEqual(errors['uptime']['code'], -32601)
+        self.assertIn('getconnectioncount', errors)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_processNode_rpc_error(self, mock_post):
+        data = [
+            {'id': 'getmininginfo', 'result': None, 'error': {'code': -1, 'message': 'error'}},
+        ]
+
+        mock_resp = self._mock_response(status=200, json_data=data)
+        mock_post.return_value = mock_resp
+
+        self.assertRaises(SystemExit, self.nm.processNode)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_checkAreNodesMining_single_mn_fails(self, mock_post):
         data = {
             "masternodes": [
@@ -165,7 +280,7 @@ class HealthMonitorTest(TestCase):
         self.assertEqual(result[0][0], '8cb09568143d7bae6822a7a78f91cb907c23fd12dcf986d4d2c8de89457edf87')
         self.assertEqual(result[0][1], False)
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_checkAreNodesMining_single_mn_ok(self, mock_post):
         datenow = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
         data = {
@@ -186,7 +301,7 @@ class HealthMonitorTest(TestCase):
         self.assertEqual(result[0][0], '8cb09568143d7bae6822a7a78f91cb907c23fd12dcf986d4d2c8de89457edf87')
         self.assertEqual(result[0][1], True)
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_checkAreNodesMining_multiple_mn_ok(self, mock_post):
         datenow = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
         data = {
@@ -213,7 +328,7 @@ class HealthMonitorTest(TestCase):
         self.assertEqual(result[1][0], '2ceb7c9c3bea0bd0e5e4199eca5d0b797d79a0077a9108951faecf715e1e1a57')
         self.assertEqual(result[1][1], True)
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_checkAreNodesMining_multiple_mn_one_ok(self, mock_post):
         datenow = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
         data = {
@@ -240,7 +355,7 @@ class HealthMonitorTest(TestCase):
         self.assertEqual(result[1][0], '2ceb7c9c3bea0bd0e5e4199eca5d0b797d79a0077a9108951faecf715e1e1a57')
         self.assertEqual(result[1][1], False)
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_checkAreNodesMining_empty_ok(self, mock_post):
         data = {
             "masternodes": [],
@@ -252,7 +367,7 @@ class HealthMonitorTest(TestCase):
         result = self.nm._checkAreNodesMining()
         self.assertEqual(len(result), 0)
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_uploadToApi_ok(self, mock_post):
         data = {
             'result': {"message": "ok"}
@@ -264,7 +379,7 @@ class HealthMonitorTest(TestCase):
         result = self.nm._uploadToApi('endpoint', {})
         self.assertEqual(result['message'], 'ok')
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_uploadToApi_ok_without_result(self, mock_post):
         data = {"message": "ok"}
 
@@ -274,41 +389,432 @@ class HealthMonitorTest(TestCase):
         result = self.nm._uploadToApi('endpoint', {})
         self.assertEqual(result['message'], 'ok')
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_uploadToApi_failed(self, mock_post):
         mock_resp = self._mock_response(status=500, raise_for_status=HTTPError("rpcerror"))
         mock_post.return_value = mock_resp
-        self.assertRaises(SystemExit, self.nm._uploadToApi, 'endpoint', {})
+        self.assertIsNone(self.nm._uploadToApi('endpoint', {}))
+        self.assertEqual(self.nm.spool.pending(), 1)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_uploadToApi_rate_limited(self, mock_post):
+        response = mock.Mock(status_code=429, headers={'Retry-After': '120'})
+        mock_resp = self._mock_response(status=429, raise_for_status=HTTPError("rate limited", response=response))
+        mock_post.return_value = mock_resp
+
+        self.assertIsNone(self.nm._uploadToApi('endpoint', {}))
+        self.assertEqual(self.nm.spool.pending(), 1)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_uploadToApi_rejected_is_dropped(self, mock_post):
+        response = mock.Mock(status_code=401, headers={})
+        mock_resp = self._mock_response(status=401, raise_for_status=HTTPError("unauthorized", response=response))
+        mock_post.return_value = mock_resp
+
+        self.assertIsNone(self.nm._uploadToApi('endpoint', {}))
+        self.assertEqual(self.nm.spool.pending(), 0)
+
+    def test_sendReport_skips_unchanged(self):
+        self.nm.delta.mode = 'skip'
+        self.nm.snapshot = mock.Mock(**{
+            'nodeInfoPayload.return_value': {'node_uptime': 10, 'connection_count': 8},
+            'serverStatsPayload.return_value': {'load_avg': 0.5},
+        })
+
+        with mock.patch.object(self.nm, '_uploadToApi', side_effect=lambda endpoint, data, onDelivered=None: onDelivered()) as upload:
+            self.nm.sendReport()
+            self.assertEqual(upload.call_count, 2)
+
+            self.nm.snapshot.nodeInfoPayload.return_value = {'node_uptime': 310, 'connection_count': 8}
+            self.nm.sendReport()
+            self.assertEqual(upload.call_count, 2)
+
+    def test_sendReport_resends_undelivered(self):
+        self.nm.delta.mode = 'skip'
+        self.nm.snapshot = mock.Mock(**{
+            'nodeInfoPayload.return_value': {'node_uptime': 10, 'connection_count': 8},
+            'serverStatsPayload.return_value': {'load_avg': 0.5},
+        })
+
+        with mock.patch.object(self.nm.spool, 'flush', return_value=({}, {})):
+            self.nm.sendReport()
+        self.assertEqual(self.nm.spool.pending(), 2)
+
+        # The spooled reports have not been delivered yet, so they are not skipped as unchanged
+        with mock.patch.object(self.nm, '_uploadToApi') as upload:
+            self.nm.sendReport()
+            self.assertEqual(upload.call_count, 2)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_collectRpc_reads_tip_from_tracker(self, mock_post):
+        self.nm.tipTracker = TipTracker(self.nm, 300)
+        self.nm.tipTracker._thread = mock.Mock(**{'is_alive.return_value': True})
+        self.nm.tipTracker.setTip(100, 'hash', time.time() - 30)
+        mock_post.return_value = self._mock_response(json_data=[
+            {'id': 'getmininginfo', 'result': {'masternodes': []}, 'error': None},
+            {'id': 'uptime', 'result': 10, 'error': None},
+            {'id': 'getconnectioncount', 'result': 8, 'error': None},
+        ])
+
+        result = self.nm._collectRpc()
+        self.assertEqual(result['blockcount'], 100)
+        self.assertEqual(result['bestblockhash'], 'hash')
+        self.assertEqual([call['method'] for call in json.loads(mock_post.call_args[1]['data'])], ['getmininginfo', 'uptime', 'getconnectioncount'])
+
+        self.nm.__dict__.update(result)
+        self.nm.snapshot = self.nm.takeSnapshot()
+        payload = self.nm.snapshot.nodeInfoPayload()
+        self.assertEqual(payload['tip_age'], 30)
+        self.assertFalse(payload['stale_tip'])
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_collectRpc_ignores_dead_tracker(self, mock_post):
+        self.nm.tipTracker = TipTracker(self.nm, 300)
+        self.nm.tipTracker._thread = mock.Mock(**{'is_alive.return_value': False})
+        self.nm.tipTracker.setTip(100, 'frozen', time.time() - 30)
+        mock_post.return_value = self._mock_response(json_data=[
+            {'id': 'getmininginfo', 'result': {'masternodes': []}, 'error': None},
+            {'id': 'getblockcount', 'result': 120, 'error': None},
+            {'id': 'getbestblockhash', 'result': 'hash', 'error': None},
+            {'id': 'uptime', 'result': 10, 'error': None},
+            {'id': 'getconnectioncount', 'result': 8, 'error': None},
+        ])
+
+        result = self.nm._collectRpc()
+        self.assertEqual((result['blockcount'], result['bestblockhash']), (120, 'hash'))
+        self.nm.__dict__.update(result)
+        self.nm.snapshot = self.nm.takeSnapshot()
+        self.assertNotIn('tip_age', self.nm.snapshot.nodeInfoPayload())
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_collectRpc_with_peers(self, mock_post):
+        self.nm.report_peers = True
+        mock_post.return_value = self._mock_response(json_data=[
+            {'id': 'getmininginfo', 'result': {'masternodes': []}, 'error': None},
+            {'id': 'getblockcount', 'result': 100, 'error': None},
+            {'id': 'getbestblockhash', 'result': 'hash', 'error': None},
+            {'id': 'uptime', 'result': 10, 'error': None},
+            {'id': 'getconnectioncount', 'result': 1, 'error': None},
+            {'id': 'getpeerinfo', 'result': [{'addr': 'a', 'inbound': True, 'pingtime': 0.05, 'synced_blocks': 80}], 'error': None},
+            {'id': 'getnettotals', 'result': {'totalbytesrecv': 1, 'totalbytessent': 1, 'timemillis': 1000}, 'error': None},
+        ])
+
+        self.nm.__dict__.update(self.nm._collectRpc())
+        self.assertEqual(mock_post.call_count, 1)
+
+        self.nm.snapshot = self.nm.takeSnapshot()
+        payload = self.nm.snapshot.nodeInfoPayload()
+        self.assertEqual(payload['peers_inbound'], 1)
+        self.assertEqual(payload['peers_lagging'], 1)
+        self.assertEqual(payload['peer_ping_p50'], 50)
+        self.assertNotIn('getpeerinfo', payload)
+
+        ret = repr(self.nm)
+        self.assertIn('Peers:              1 in, 0 out, 1 lagging', ret)
+        self.assertIn('Peer Ping:          50/50/50 ms (p50/p95/max)', ret)
+        self.assertIn('Network:            n/a', ret)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_collectRpc_with_mempool(self, mock_post):
+        self.nm.report_mempool = True
+        chaininfo = {'blocks': 100, 'bestblockhash': 'hash', 'size_on_disk': 1024**3, 'difficulty': 1.5}
+        batch = [
+            {'id': 'getmininginfo', 'result': {'masternodes': []}, 'error': None},
+            {'id': 'getblockchaininfo', 'result': chaininfo, 'error': None},
+            {'id': 'uptime', 'result': 10, 'error': None},
+            {'id': 'getconnectioncount', 'result': 1, 'error': None},
+            {'id': 'getmempoolinfo', 'result': {'size': 25, 'bytes': 12288, 'usage': 30000000, 'maxmempool': 300000000, 'mempoolminfee': 0.00001}, 'error': None},
+        ]
+        mock_post.side_effect = [self._mock_response(json_data=batch), self._mock_response(json_data=batch[:4])]
+
+        # getblockchaininfo replaces getblockcount and getbestblockhash, all is read in one round trip
+        self.nm.__dict__.update(self.nm._collectRpc())
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual((self.nm.blockcount, self.nm.bestblockhash), (100, 'hash'))
+        self.nm.snapshot = self.nm.takeSnapshot()
+        payload = self.nm.snapshot.nodeInfoPayload()
+        self.assertEqual((payload['mempool_size'], payload['mempool_usage_ratio'], payload['chain_size']), (25, 0.1, 1024))
+        self.assertIn('Mempool:            25 txs, 12.0 KiB, 10% of maxmempool, polled every 0:01:00', repr(self.nm))
+
+        # The mempool is not due yet, the last values are reported again
+        self.nm.__dict__.update(self.nm._collectRpc())
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual([call['method'] for call in json.loads(mock_post.call_args[1]['data'])], ['getmininginfo', 'getblockchaininfo', 'uptime', 'getconnectioncount'])
+        self.nm.snapshot = self.nm.takeSnapshot()
+        self.assertEqual(self.nm.snapshot.nodeInfoPayload()['mempool_size'], 25)
+
+    def test_chain_state_with_tip_tracker(self):
+        self.nm.report_mempool = True
+        self.nm.mempoolTracker.update(chaininfo={'blocks': 100}, now=0)
+
+        # With the tip tracker the chain state is only read again after a new block
+        methods = [method for callId, method, params in self.nm._rpcCalls(Tip(100, 'hash', 0), False)]
+        self.assertNotIn('getblockchaininfo', methods)
+        methods = [method for callId, method, params in self.nm._rpcCalls(Tip(101, 'hash', 0), False)]
+        self.assertIn('getblockchaininfo', methods)
+        self.assertNotIn('getblockcount', methods)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_collectRpc_skips_operator_checks_while_syncing(self, mock_post):
+        self.nm.report_sync = True
+        chaininfo = {'blocks': 1000, 'headers': 2000, 'bestblockhash': 'hash', 'verificationprogress': 0.5, 'initialblockdownload': True}
+        mock_post.return_value = self._mock_response(json_data=[
+            {'id': 'getmininginfo', 'result': {'masternodes': [{'id': 'mn', 'lastblockcreationattempt': '2021-11-28T12:00:00Z'}]}, 'error': None},
+            {'id': 'getblockchaininfo', 'result': chaininfo, 'error': None},
+            {'id': 'uptime', 'result': 10, 'error': None},
+            {'id': 'getconnectioncount', 'result': 1, 'error': None},
+        ])
+
+        result = self.nm._collectRpc()
+        methods = [call['method'] for call in json.loads(mock_post.call_args[1]['data'])]
+        self.assertEqual(methods, ['getmininginfo', 'getblockchaininfo', 'uptime', 'getconnectioncount'])
+        self.assertEqual((result['blockcount'], result['bestblockhash']), (1000, 'hash'))
+        self.assertTrue(result['sync']['syncing'])
+        self.assertEqual(len(result['checkNodes']), 1)
+
+        # The next cycle knows the node is catching up and leaves out getmininginfo
+        result = self.nm._collectRpc()
+        methods = [call['method'] for call in json.loads(mock_post.call_args[1]['data'])]
+        self.assertEqual(methods, ['getblockchaininfo', 'uptime', 'getconnectioncount'])
+        self.assertEqual(len(result['checkNodes']), 0)
+
+        self.nm.__dict__.update(result)
+        self.nm.snapshot = self.nm.takeSnapshot()
+        self.assertEqual(self.nm.snapshot.nodeInfoPayload()['sync_progress'], 50)
+        self.assertIn('Sync:               50.00%, 0.0 blocks/s (catching up, operator checks paused)', repr(self.nm))
+
+    @mock.patch('masternode_health.monitor.NodeMonitor._uploadToApi')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post', side_effect=Timeout('timed out'))
+    def test_rpc_timeouts_open_circuit_breaker(self, mock_post, mock_upload):
+        for i in range(FAILURE_THRESHOLD - 1):
+            with self.assertRaises(SystemExit):
+                self.nm._rpcquery('getblockcount')
+        mock_upload.assert_not_called()
 
-    @mock.patch('masternode_health.monitor.requests.post')
-    def test_processNodeInfo_failed(self, mock_post):
+        with self.assertRaises(SystemExit):
+            self.nm._rpcquery('getblockcount')
+        mock_upload.assert_called_once_with('node-info', {'rpc_degraded': True})
+
+        # No more calls are sent to defid while the breaker is open
+        with self.assertRaises(SystemExit):
+            self.nm._rpcquery('getblockcount')
+        self.assertEqual(mock_post.call_count, FAILURE_THRESHOLD)
+
+    @mock.patch('masternode_health.monitor.print')
+    @mock.patch('masternode_health.monitor.NodeMonitor._uploadToApi')
+    def test_rpc_degraded_without_notifyDown(self, mock_upload, mock_print):
+        self.nm.breaker.allow = mock.Mock(return_value=False)
+        self.nm.breaker.openUntil = time.time() + 600
+
+        # The watch shows the message below its panels, nothing is printed into the frame
+        with self.assertRaises(SystemExit) as cm:
+            self.nm._rpcbatch([('getblockcount', 'getblockcount', False)], notifyDown=False)
+        self.assertIn('did not answer', cm.exception.code)
+        mock_print.assert_not_called()
+        mock_upload.assert_not_called()
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_cycle_deadline(self, mock_post):
+        mock_post.return_value = self._mock_response(json_data={'result': 1, 'error': None})
+        self.nm.cycleDeadline = 60
+        self.nm._startCycle()
+        self.nm._rpcquery('getblockcount')
+        self.assertLessEqual(mock_post.call_args[1]['timeout'], 30)
+
+        self.nm._cycleEnd = time.monotonic() + 5
+        self.nm._rpcquery('getblockcount')
+        self.assertLessEqual(mock_post.call_args[1]['timeout'], 5)
+
+        self.nm._cycleEnd = time.monotonic() - 1
+        with self.assertRaises(SystemExit):
+            self.nm._rpcquery('getblockcount')
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertIsNone(self.nm._uploadToApi('node-info', {}))
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(self.nm.spool.pending(), 1)
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_alertStaleTip_after_cycle(self, mock_post):
+        mock_post.return_value = self._mock_response(json_data={'result': 'ok'})
+        self.nm.cycleDeadline = 0.01
+        # The cycle runs past its deadline
+        with mock.patch.object(self.nm, '_collectCycle', side_effect=lambda serverStats: time.sleep(0.05)):
+            self.nm.processNode()
+
+        self.nm._alertStaleTip(Tip(100, 'hash', 0), 400)
+        mock_post.assert_called_once()
+        self.assertEqual(self.nm.spool.pending(), 0)
+
+    def test_acquireLock(self):
+        self.nm.acquireLock()
+        self.addCleanup(self.nm.instanceLock.release)
+        other = InstanceLock(self.nm.instanceLock.path)
+        with self.assertRaises(LockedError):
+            other.acquire()
+
+    @mock.patch('masternode_health.monitor.NodeMonitor._uploadToApi')
+    def test_alertStaleTip(self, mock_upload):
+        self.nm._alertStaleTip(Tip(100, 'hash', 0), 400.5)
+        mock_upload.assert_called_once_with('node-info', {'block_height_local': 100, 'local_hash': 'hash', 'tip_age': 400, 'stale_tip': True})
+
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_processNode_rpc_failed(self, mock_post):
         mock_resp = self._mock_response(status=500, raise_for_status=HTTPError("rpcerror"))
         mock_post.return_value = mock_resp
 
-        self.assertRaises(SystemExit, self.nm._processNodeInfo)
+        self.assertRaises(SystemExit, self.nm.processNode)
 
-    @mock.patch('masternode_health.monitor.requests.post')
-    def test_processNodeInfo_no_debuglog(self, mock_post):
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_processNode_no_debuglog(self, mock_post):
         mock_resp = self._mock_response(status=500, raise_for_status=OSError("No debug log"))
         mock_post.return_value = mock_resp
 
-        self.assertRaises(SystemExit, self.nm._processNodeInfo)
+        self.assertRaises(SystemExit, self.nm.processNode)
 
-    def test_processServerStats_ok(self):
-        self.nm._processServerStats()
+    def test_collectServerStats_ok(self):
+        self.nm._runCollectors(SERVER_COLLECTORS)
         self.assertGreater(self.nm.loadavg, 0)
         self.assertGreater(self.nm.memUsed, 0)
         self.assertGreater(self.nm.memTotal, 0)
         self.assertGreater(self.nm.diskUsed, 0)
         self.assertGreater(self.nm.diskTotal, 0)
 
-    @mock.patch('masternode_health.monitor.requests.post')
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
     def test_processNode_fail(self, mock_post):
         mock_resp = self._mock_response(status=500, raise_for_status=HTTPError("rpcerror"))
         mock_post.return_value = mock_resp
 
         self.assertRaises(SystemExit, self.nm.processNode)
 
+    def test_processNode_partial_on_timeout(self):
+        def slowVersion():
+            time.sleep(0.5)
+            return {'nodeVersion': 'v1'}
+
+        self.nm.collectorTimeouts = dict.fromkeys(self.nm.collectorTimeouts, 0.1)
+        self.nm._collectRpc = mock.Mock(return_value={'blockcount': 1})
+        self.nm._collectLogFile = mock.Mock(return_value={'logSize': 1})
+        self.nm._collectServerStats = mock.Mock(return_value={'loadavg': 1, 'memUsed': 1, 'memTotal': 2, 'diskUsed': 1, 'diskTotal': 2, 'numCores': 2})
+        self.nm._collectNodeVersion = slowVersion
+        self.nm._readConfCheckSum = mock.Mock(return_value='sum')
+
+        start = time.monotonic()
+        self.nm.processNode()
+
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(self.nm.timedOut, {'NodeVersion'})
+        self.assertEqual(self.nm.blockcount, 1)
+        self.assertEqual(self.nm.numCores, 2)
+        self.assertIsNone(self.nm.nodeVersion)
+        self.assertIn('Timed Out:          NodeVersion', repr(self.nm))
+
+    def test_processNode_clears_results_on_timeout(self):
+        def slowRpc():
+            time.sleep(0.5)
+            return {'blockcount': 2}
+
+        self.nm.collectorTimeouts = dict.fromkeys(self.nm.collectorTimeouts, 0.1)
+        self.nm._collectRpc = mock.Mock(return_value={'blockcount': 1, 'uptime': 10, 'checkNodes': [('a', True)]})
+        self.nm._collectLogFile = mock.Mock(return_value={'logSize': 1})
+        self.nm._collectNodeVersion = mock.Mock(return_value={'nodeVersion': 'v1'})
+        self.nm._collectServerStats = mock.Mock(return_value={'loadavg': 1, 'memUsed': 1, 'memTotal': 2, 'diskUsed': 1, 'diskTotal': 2, 'numCores': 2})
+        self.nm._readConfCheckSum = mock.Mock(return_value='sum')
+        self.nm.processNode()
+        self.assertEqual((self.nm.blockcount, self.nm.uptime), (1, 10))
+
+        # The results of the last cycle are not reported as current
+        self.nm._collectRpc = slowRpc
+        self.nm.processNode()
+        self.assertEqual(self.nm.timedOut, {'Rpc'})
+        self.assertEqual((self.nm.blockcount, self.nm.uptime, self.nm.checkNodes), (None, None, []))
+        self.assertEqual(self.nm.nodeVersion, 'v1')
+        self.assertIsNone(self.nm.snapshot.nodeInfoPayload()['block_height_local'])
+
+    def test_hung_collector_does_not_delay_exit(self):
+        with open(os.path.join(self.stateDir, 'defi.conf'), 'w') as f:
+            f.write('rpcuser=user\nrpcpassword=password\n')
+        args = ['--api-key', 'key', '--defi-path', self.stateDir, '--defi-conf', os.path.join(self.stateDir, 'defi.conf'), '--state-dir', self.stateDir]
+        code = (
+            'import time\n'
+            'from masternode_health.monitor import NodeMonitor, parse_args\n'
+            f'nm = NodeMonitor(parse_args({args!r}))\n'
+            'nm._collectLogFile = lambda: time.sleep(10) or {}\n'
+            "nm.collectorTimeouts['LogFile'] = 0.2\n"
+            "nm._runCollectors(['LogFile'])\n"
+            'print(sorted(nm.timedOut))\n'
+        )
+
+        start = time.monotonic()
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(output.strip(), b"['LogFile']")
+
+    @mock.patch('subprocess.Popen')
+    def test_readNodeVersion_kills_defid_on_timeout(self, mock_popen):
+        import subprocess
+        proc = mock_popen.return_value
+        proc.communicate.side_effect = [subprocess.TimeoutExpired('defid', 10), (b'', None)]
+
+        self.assertRaises(ValueError, self.nm._readNodeVersion)
+        proc.kill.assert_called_once()
+        self.assertEqual(proc.communicate.call_count, 2)
+
+    @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=password\n'))
+    @mock.patch('masternode_health.transport.HttpClientTransport.post', side_effect=ConnectionError('refused'))
+    def test_verbose_with_defid_down(self, mock_post):
+        nm = NodeMonitor(parse_args(['--verbose', '--defi-path', '/', '--state-dir', self.stateDir]))
+        self.assertFalse(nm.sendsReports)
+
+        with self.assertRaises(SystemExit):
+            nm.processNode()
+        self.assertEqual(nm.spool.pending(), 0)
+
+    @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=password\n'))
+    @mock.patch('masternode_health.transport.HttpClientTransport.post')
+    def test_uploadToApi_without_report(self, mock_post):
+        nm = NodeMonitor(parse_args(['--verbose', '--api-key', 'key', '--defi-path', '/', '--state-dir', self.stateDir]))
+
+        self.assertIsNone(nm._uploadToApi('node-info', {'defid_running': False}))
+        mock_post.assert_not_called()
+        self.assertEqual(nm.spool.pending(), 0)
+
+    @mock.patch('masternode_health.monitor.time.time')
+    def test_recordMetrics(self, mock_time):
+        self.nm.logSize = 10
+        for now, blockcount in [(1000, 100), (1600, 120), (2200, 120)]:
+            mock_time.return_value = now
+            self.nm.blockcount = blockcount
+            self.nm._recordMetrics()
+
+        self.assertEqual(self.nm.trends['block_rate'], 60)
+        self.assertEqual(self.nm.trends['log_growth_rate'], 0)
+        self.assertEqual(self.nm.trends['block_stall_seconds'], 600)
+        self.assertIsNone(self.nm.trends['load_avg_moving'])
+
+    @mock.patch('masternode_health.monitor.time.time')
+    def test_dataDir_growth(self, mock_time):
+        self.nm.dirSizes = mock.Mock()
+        for now, blocks in [(1000, 100 * 1024**2), (2800, 150 * 1024**2)]:
+            mock_time.return_value = now
+            self.nm.dirSizes.sizes.return_value = {'blocks': blocks, 'chainstate': 0, 'enhancedcs': None}
+            self.nm.__dict__.update(self.nm._collectDataDir())
+            self.nm._recordMetrics()
+
+        self.nm.snapshot = self.nm.takeSnapshot()
+        payload = self.nm.snapshot.nodeInfoPayload()
+        self.assertEqual(payload['blocks_size'], 150)
+        self.assertEqual(payload['blocks_growth_rate'], 100)
+        self.assertEqual(payload['chainstate_growth_rate'], 0)
+        self.assertIsNone(payload['enhancedcs_size'])
+        self.assertIsNone(payload['enhancedcs_growth_rate'])
+        self.assertIn('Blocks:        150 MB', repr(self.nm))
+
+    def test_dataDir_not_readable(self):
+        self.nm.dirSizes = mock.Mock(**{'sizes.side_effect': PermissionError(13, 'Permission denied')})
+        with self.assertRaises(SystemExit) as cm:
+            self.nm._collectDataDir()
+        self.assertIn('Could not read the size of the data directory', cm.exception.code)
+
     def test_toString(self):
         self.nm.uptime = 0
         self.nm.blockcount = 0
@@ -323,9 +829,37 @@ class HealthMonitorTest(TestCase):
         self.nm.logSize = 0
         self.nm.nodeVersion = "1"
         self.nm.numCores = 10
+        self.nm.snapshot = self.nm.takeSnapshot()
         ret = self.nm.__repr__()
         self.assertEqual(hashlib.md5(ret.encode('utf-8')).hexdigest(), 'd28564cfe5e1cbb0eb2d4f3adda1b5c1')
 
-    def test_drawProgressBar(self):
-        progress = self.nm._drawProgressBar(0.5)
-        self.assertEqual(progress, '[▰▰▰▰▰▰▰        ] 50%')
+    def test_toString_with_logStats(self):
+        self.nm.uptime = 0
+        self.nm.blockcount = 0
+        self.nm.bestblockhash = "best"
+        self.nm.connectioncount = 0
+        self.nm.checkNodes = []
+        self.nm.loadavg = 0
+        self.nm.memTotal = 5
+        self.nm.memUsed = 2
+        self.nm.diskTotal = 5
+        self.nm.diskUsed = 2
+        self.nm.logSize = 0
+        self.nm.nodeVersion = "1"
+        self.nm.numCores = 10
+        self.nm.logStats = {'updatetip_rate': 1.5, 'errors': 2, 'warnings': 3, 'reorgs': 0}
+        self.nm.snapshot = self.nm.takeSnapshot()
+        ret = self.nm.__repr__()
+        self.assertIn('Tip Updates:        1.5/min', ret)
+        self.assertIn('Log Errors:         2', ret)
+
+    def test_toString_with_samples(self):
+        self.nm.checkNodes = []
+        self.nm.serverSamples = {'cpu_usage': {'p50': 10, 'p95': 55.5, 'max': 90}}
+        self.nm.defidSamples = {'defid_rss': {'p50': 512, 'p95': 520, 'max': 600}}
+        self.nm.snapshot = self.nm.takeSnapshot()
+        ret = self.nm.__repr__()
+        self.assertIn('cpu_usage                   10.0        55.5        90.0', ret)
+        self.assertIn('defid_rss                  512.0       520.0       600.0', ret)
+        self.assertEqual(self.nm.snapshot.serverStatsPayload()['samples'], self.nm.serverSamples)
+        self.assertEqual(self.nm.snapshot.nodeInfoPayload()['defid_samples'], self.nm.defidSamples)
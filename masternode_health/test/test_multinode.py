@@ -0,0 +1,104 @@
+from masternode_health.multinode import MultiNodeMonitor, loadNodes
+from masternode_health.monitor import parse_args
+from unittest import TestCase, mock
+import json
+import os
+import shutil
+import tempfile
+
+
+class LoadNodesTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'nodes.json')
+
+    def _write(self, nodes):
+        with open(self.path, 'w') as f:
+            json.dump(nodes, f)
+
+    def test_nodes_inherit_arguments(self):
+        self._write([
+            {'name': 'mn1', 'defi_path': '/mn1', 'defi_conf': '/mn1/defi.conf', 'api_key': 'key1'},
+            {'defi_path': '/mn2', 'rpchost': 'http://localhost:8555', 'api_key': 'key2'},
+        ])
+        args = parse_args(['--api-key', 'key', '--nodes', self.path])
+
+        self.assertEqual(len(args.nodes), 2)
+        self.assertEqual(args.nodes[0].name, 'mn1')
+        self.assertEqual(args.nodes[0].api_key, 'key1')
+        self.assertEqual(args.nodes[0].rpchost, 'http://localhost:8554')
+        self.assertEqual(args.nodes[1].name, 'node1')
+        self.assertEqual(args.nodes[1].api_key, 'key2')
+        self.assertEqual(args.nodes[1].rpchost, 'http://localhost:8555')
+
+    def test_api_key_missing(self):
+        self._write([{'name': 'mn1'}])
+        with self.assertRaises(SystemExit):
+            parse_args(['--nodes', self.path])
+
+    def test_api_key_not_inherited(self):
+        self._write([{'name': 'mn1', 'api_key': 'key1'}, {'name': 'mn2'}])
+        with self.assertRaises(SystemExit):
+            parse_args(['--api-key', 'key', '--nodes', self.path])
+
+    def test_api_key_missing_but_verbose(self):
+        self._write([{'name': 'mn1'}, {'name': 'mn2'}])
+        self.assertEqual(len(parse_args(['--verbose', '--nodes', self.path]).nodes), 2)
+
+    def test_api_key_missing_for_exporter(self):
+        self._write([{'name': 'mn1'}, {'name': 'mn2'}])
+        self.assertEqual(len(parse_args(['--exporter-port', '9101', '--nodes', self.path]).nodes), 2)
+
+        with self.assertRaises(SystemExit):
+            parse_args(['--exporter-port', '9101', '--daemon', '--nodes', self.path])
+
+    def test_duplicate_api_key(self):
+        self._write([{'name': 'mn1', 'api_key': 'key'}, {'name': 'mn2', 'api_key': 'key'}])
+        with self.assertRaises(SystemExit):
+            parse_args(['--nodes', self.path])
+
+    def test_unknown_setting(self):
+        self._write([{'name': 'mn1', 'api_key': 'key', 'rpcport': 8554}])
+        with self.assertRaises(SystemExit):
+            parse_args(['--nodes', self.path])
+
+    def test_missing_file(self):
+        with self.assertRaises(SystemExit):
+            loadNodes(self.path, parse_args(['--api-key', 'key']))
+
+
+class MultiNodeMonitorTest(TestCase):
+
+    def setUp(self):
+        self.monitors = []
+        for name in ['mn1', 'mn2']:
+            monitor = mock.Mock()
+            monitor.name = name
+            monitor.verbose = False
+            self.monitors.append(monitor)
+        self.monitors[0]._collectServerStats.return_value = {'loadavg': 1}
+        self.mnm = MultiNodeMonitor(self.monitors)
+
+    def test_server_stats_collected_once(self):
+        self.mnm.processNode()
+
+        self.monitors[0]._collectServerStats.assert_called_once()
+        self.monitors[1]._collectServerStats.assert_not_called()
+        for monitor in self.monitors:
+            monitor.processNode.assert_called_once_with({'loadavg': 1})
+
+    def test_failed_node_is_not_reported(self):
+        self.monitors[1].processNode.side_effect = SystemExit('❌ defid down')
+        self.mnm.processNode()
+        self.mnm.sendReport()
+
+        self.monitors[0].sendReport.assert_called_once()
+        self.monitors[1].sendReport.assert_not_called()
+        self.assertIn('collection failed', repr(self.mnm))
+
+    def test_reportDelay_waits_for_slowest_node(self):
+        self.monitors[0].reportDelay.return_value = 0
+        self.monitors[1].reportDelay.return_value = 120
+        self.assertEqual(self.mnm.reportDelay(), 120)
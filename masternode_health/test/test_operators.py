@@ -0,0 +1,98 @@
+from masternode_health.operators import OperatorStatus, parseTimestamp
+from masternode_health.monitor import NodeMonitor, parse_args
+from unittest import TestCase, mock
+from datetime import datetime, timezone
+import json
+import shutil
+import tempfile
+
+
+class ParseTimestampTest(TestCase):
+
+    def test_matches_strptime(self):
+        for value in ['1970-01-01T00:00:00Z', '2000-02-29T12:34:56Z', '2021-08-23T19:48:21Z', '2100-03-01T23:59:59Z']:
+            expected = datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp()
+            self.assertEqual(parseTimestamp(value), expected)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, parseTimestamp, '2021-08-23 19:48:21')
+
+
+class OperatorStatusTest(TestCase):
+
+    def setUp(self):
+        self.status = OperatorStatus()
+        self.status.ids.extend(['a', 'b'])
+        self.status.online.extend([1, 0])
+
+    def test_tuple_access(self):
+        self.assertEqual(len(self.status), 2)
+        self.assertEqual(self.status[0], ('a', True))
+        self.assertEqual(list(self.status), [('a', True), ('b', False)])
+
+    def test_payload_without_details(self):
+        self.assertEqual(self.status.toPayload(), [{'id': 'a', 'online': True}, {'id': 'b', 'online': False}])
+
+    def test_payload_with_details(self):
+        self.status.addDetails({
+            'a': {'a': {'state': 'ENABLED', 'mintedBlocks': 12, 'banTx': '0' * 64}},
+            'b': {'b': {'state': 'PRE_RESIGNED', 'mintedBlocks': 3, 'banTx': 'f' * 64}},
+        })
+
+        self.assertEqual(self.status.toPayload(), [
+            {'id': 'a', 'online': True, 'state': 'ENABLED', 'minted_blocks': 12, 'banned': False},
+            {'id': 'b', 'online': False, 'state': 'PRE_RESIGNED', 'minted_blocks': 3, 'banned': True},
+        ])
+
+    def test_details_missing(self):
+        self.status.addDetails({'a': {'a': {'state': 'ENABLED'}}})
+        self.assertEqual(self.status.toPayload(), [
+            {'id': 'a', 'online': True, 'state': 'ENABLED', 'minted_blocks': 0, 'banned': False},
+            {'id': 'b', 'online': False, 'state': None, 'minted_blocks': None, 'banned': None},
+        ])
+
+
+class LargeMiningInfoTest(TestCase):
+
+    MASTERNODES = 5000
+
+    @mock.patch('masternode_health.monitor.open', mock.mock_open(read_data='rpcuser=user\nrpcpassword=password\n'))
+    def setUp(self):
+        self.stateDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.stateDir)
+        self.nm = NodeMonitor(parse_args(['--api-key', 'key', '--masternode-details', '--state-dir', self.stateDir]))
+
+        now = datetime.now(timezone.utc).timestamp()
+        # Every third masternode did not try to create a block for an hour
+        self.mininginfo = {'blocks': 1000000, 'masternodes': [{
+            'id': f'{index:064x}',
+            'operator': f'operator{index}',
+            'state': 'ENABLED',
+            'lastblockcreationattempt': datetime.fromtimestamp(now - (3600 if index % 3 == 0 else 1), timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        } for index in range(self.MASTERNODES)]}
+
+    def _getmasternodes(self, calls):
+        results = {nodeId: {nodeId: {'state': 'ENABLED', 'mintedBlocks': int(nodeId, 16), 'banTx': 'f' * 64 if int(nodeId, 16) % 100 == 0 else '0' * 64}} for callId, method, nodeId in calls}
+        return results, {}
+
+    def test_check_lookup_and_serialize(self):
+        status = self.nm._checkAreNodesMining(self.mininginfo)
+        self.assertEqual(len(status), self.MASTERNODES)
+        self.assertEqual(sum(online for nodeId, online in status), self.MASTERNODES - len(range(0, self.MASTERNODES, 3)))
+
+        with mock.patch.object(self.nm, '_rpcbatch', side_effect=self._getmasternodes) as rpcbatch:
+            self.nm._lookupMasternodes(status)
+        # All masternodes are looked up with one batched call
+        rpcbatch.assert_called_once()
+        self.assertEqual(len(rpcbatch.call_args[0][0]), self.MASTERNODES)
+
+        payload = json.loads(json.dumps(status.toPayload()))
+        self.assertEqual(len(payload), self.MASTERNODES)
+        for index in (0, 1, 100, self.MASTERNODES - 1):
+            self.assertEqual(payload[index], {
+                'id': f'{index:064x}',
+                'online': index % 3 != 0,
+                'state': 'ENABLED',
+                'minted_blocks': index,
+                'banned': index % 100 == 0,
+            })
@@ -0,0 +1,61 @@
+from masternode_health.peers import PeerStats, percentile
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+
+
+def peer(addr, inbound=False, pingtime=None, synced=100, recv=0, sent=0):
+    retval = {'addr': addr, 'conntime': 1, 'inbound': inbound, 'synced_blocks': synced, 'bytesrecv': recv, 'bytessent': sent}
+    if pingtime is not None:
+        retval['pingtime'] = pingtime
+    return retval
+
+
+class PeerStatsTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.stats = PeerStats(os.path.join(self.dir, 'peers.json'))
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 0.5))
+        self.assertEqual(percentile([1, 2, 3, 4], 0.5), 3)
+        self.assertEqual(percentile(list(range(100)), 0.95), 95)
+        self.assertEqual(percentile([7], 0.95), 7)
+
+    def test_summary(self):
+        peers = [
+            peer('a', inbound=True, pingtime=0.01),
+            peer('b', pingtime=0.03),
+            peer('c', pingtime=0.02, synced=50),
+            peer('d', synced=-1),
+        ]
+        summary = self.stats.summarize(peers, {'totalbytesrecv': 1000, 'totalbytessent': 500, 'timemillis': 10000}, 100)
+
+        self.assertEqual(summary['peers_inbound'], 1)
+        self.assertEqual(summary['peers_outbound'], 3)
+        self.assertEqual(summary['peers_lagging'], 1)
+        self.assertEqual(summary['peer_ping_p50'], 20)
+        self.assertEqual(summary['peer_ping_max'], 30)
+        self.assertIsNone(summary['net_recv_rate'])
+        self.assertIsNone(summary['peer_recv_rate_max'])
+
+    def test_rates_against_previous_sample(self):
+        self.stats.summarize([peer('a', recv=0, sent=0), peer('b', recv=100)], {'totalbytesrecv': 1000, 'totalbytessent': 500, 'timemillis': 10000}, 100)
+        summary = self.stats.summarize(
+            [peer('a', recv=1000, sent=500), peer('b', recv=300), peer('new', recv=10**6)],
+            {'totalbytesrecv': 11000, 'totalbytessent': 2500, 'timemillis': 20000}, 100)
+
+        self.assertEqual(summary['net_recv_rate'], 1000)
+        self.assertEqual(summary['net_sent_rate'], 200)
+        self.assertEqual(summary['peer_recv_rate_max'], 100)
+        self.assertEqual(summary['peer_recv_rate_p50'], 100)
+        self.assertEqual(summary['peer_sent_rate_max'], 50)
+
+    def test_counter_reset_after_restart(self):
+        self.stats.summarize([], {'totalbytesrecv': 5000, 'totalbytessent': 5000, 'timemillis': 10000}, 100)
+        summary = self.stats.summarize([], {'totalbytesrecv': 10, 'totalbytessent': 10, 'timemillis': 20000}, 100)
+        self.assertIsNone(summary['net_recv_rate'])
+        self.assertIsNone(summary['peer_ping_p50'])
@@ -0,0 +1,53 @@
+from masternode_health.profiling import Profiler
+from unittest import TestCase
+import json
+import os
+import shutil
+import tempfile
+
+
+class ProfilerTest(TestCase):
+
+    def setUp(self):
+        self.profiler = Profiler()
+        self.profiler.record('rpc', 'getblockcount', 0.1)
+        self.profiler.record('rpc', 'getblockcount', 0.3)
+        self.profiler.record('rpc', 'uptime', 0.2)
+        self.profiler.record('api', 'node-info', 1.0)
+
+    def test_stats(self):
+        stats = self.profiler.stats()
+        self.assertEqual(stats['rpc']['getblockcount']['count'], 2)
+        self.assertAlmostEqual(stats['rpc']['getblockcount']['mean'], 0.2)
+        self.assertEqual(stats['rpc']['getblockcount']['min'], 0.1)
+        self.assertEqual(stats['rpc']['getblockcount']['max'], 0.3)
+        self.assertEqual(stats['api']['node-info']['total'], 1.0)
+
+    def test_phase(self):
+        count, total, maximum = self.profiler.phase('rpc')
+        self.assertEqual(count, 3)
+        self.assertAlmostEqual(total, 0.6)
+        self.assertEqual(maximum, 0.3)
+        self.assertEqual(self.profiler.phase('psutil'), (0, 0, 0))
+
+    def test_span(self):
+        profiler = Profiler()
+        self.assertFalse(profiler)
+        with self.assertRaises(ValueError):
+            with profiler.span('subprocess', 'defid --version'):
+                raise ValueError()
+        self.assertEqual(profiler.stats()['subprocess']['defid --version']['count'], 1)
+
+    def test_render(self):
+        self.assertIn('rpc         getblockcount                              2x     400.0 ms', self.profiler.render())
+
+    def test_save(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'profile.json')
+        self.profiler.save(path, node='mn1')
+
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(data['node'], 'mn1')
+        self.assertEqual(data['phases']['rpc']['uptime']['count'], 1)
@@ -0,0 +1,133 @@
+from masternode_health.sampler import P2Quantile, StreamSummary, Sampler
+from collections import namedtuple
+from unittest import TestCase, mock
+import os
+import random
+import shutil
+import tempfile
+
+CpuTimes = namedtuple('CpuTimes', ['idle', 'iowait'])
+DiskIo = namedtuple('DiskIo', ['read_bytes', 'write_bytes'])
+NetIo = namedtuple('NetIo', ['bytes_recv', 'bytes_sent'])
+
+
+class P2QuantileTest(TestCase):
+
+    def test_empty(self):
+        self.assertIsNone(P2Quantile(0.5).value())
+
+    def test_few_values_are_exact(self):
+        quantile = P2Quantile(0.5)
+        for value in [3, 1, 2]:
+            quantile.add(value)
+        self.assertEqual(quantile.value(), 2)
+
+    def test_estimate(self):
+        rand = random.Random(42)
+        values = [rand.uniform(0, 100) for i in range(10000)]
+
+        for p in [0.5, 0.95]:
+            quantile = P2Quantile(p)
+            for value in values:
+                quantile.add(value)
+
+            exact = sorted(values)[int(p * len(values))]
+            self.assertAlmostEqual(quantile.value(), exact, delta=2)
+            self.assertEqual(len(quantile.heights), 5)
+
+    def test_summary(self):
+        summary = StreamSummary()
+        for value in range(1, 101):
+            summary.add(value)
+
+        result = summary.result()
+        self.assertEqual(result['max'], 100)
+        self.assertAlmostEqual(result['p50'], 50, delta=2)
+        self.assertAlmostEqual(result['p95'], 95, delta=2)
+
+
+class SamplerTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.sampler = Sampler(self.dir, 1)
+
+    def _patchSystem(self, counter):
+        return [
+            mock.patch('psutil.cpu_times_percent', return_value=CpuTimes(75.0, 5.0)),
+            mock.patch('psutil.virtual_memory', return_value=mock.Mock(percent=40.0)),
+            mock.patch('psutil.disk_io_counters', return_value=DiskIo(counter, 2 * counter)),
+            mock.patch('psutil.net_io_counters', return_value=NetIo(counter, counter)),
+            mock.patch('psutil.process_iter', return_value=[]),
+        ]
+
+    def _sample(self, now, counter):
+        patches = self._patchSystem(counter)
+        for patch in patches:
+            patch.start()
+        try:
+            with mock.patch('masternode_health.sampler.time.monotonic', return_value=now):
+                self.sampler.sample()
+        finally:
+            for patch in patches:
+                patch.stop()
+
+    def test_first_sample_only_sets_reference(self):
+        self._sample(100, 0)
+        self.assertIsNone(self.sampler.summary('server'))
+
+    def test_summary_and_rates(self):
+        self._sample(100, 0)
+        self._sample(101, 1000)
+        self._sample(102, 3000)
+
+        summary = self.sampler.summary('server')
+        self.assertEqual(summary['cpu_usage'], {'p50': 25.0, 'p95': 25.0, 'max': 25.0})
+        self.assertEqual(summary['cpu_iowait']['max'], 5.0)
+        self.assertEqual(summary['ram_usage']['max'], 40.0)
+        self.assertEqual(summary['disk_read_rate']['max'], 2000)
+        self.assertEqual(summary['disk_write_rate']['max'], 4000)
+        self.assertEqual(summary['net_recv_rate']['p50'], 1000)
+        self.assertIsNone(self.sampler.summary('defid'))
+
+        # Every summary covers one interval
+        self.assertIsNone(self.sampler.summary('server'))
+
+    def test_counter_reset_is_ignored(self):
+        self._sample(100, 5000)
+        self._sample(101, 0)
+        self.assertNotIn('disk_read_rate', self.sampler.summary('server'))
+
+    def test_defid_process(self):
+        process = mock.MagicMock(pid=123)
+        process.name.return_value = 'defid'
+        process.cpu_percent.return_value = 50.0
+        process.memory_info.return_value = mock.Mock(rss=512 * 1024**2)
+        process.num_fds.return_value = 40
+        process.io_counters.return_value = DiskIo(0, 0)
+
+        with open(os.path.join(self.dir, 'defid.pid'), 'w') as f:
+            f.write('123\n')
+
+        self.sampler.system = False
+        with mock.patch('psutil.Process', return_value=process):
+            self._sample(100, 0)
+            self._sample(101, 0)
+            process.io_counters.return_value = DiskIo(4096, 1024)
+            self._sample(102, 0)
+
+        summary = self.sampler.summary('defid')
+        self.assertEqual(summary['defid_cpu']['max'], 50.0)
+        self.assertEqual(summary['defid_rss']['max'], 512)
+        self.assertEqual(summary['defid_open_files']['max'], 40)
+        self.assertEqual(summary['defid_read_rate']['max'], 4096)
+        self.assertEqual(summary['defid_write_rate']['max'], 1024)
+        self.assertIsNone(self.sampler.summary('server'))
+
+    def test_process_lookup_is_rate_limited(self):
+        with mock.patch('psutil.process_iter', return_value=[]) as processIter:
+            with mock.patch('masternode_health.sampler.time.monotonic', return_value=100):
+                self.assertIsNone(self.sampler._findProcess())
+                self.assertIsNone(self.sampler._findProcess())
+            self.assertEqual(processIter.call_count, 1)
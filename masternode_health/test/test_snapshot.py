@@ -0,0 +1,71 @@
+from masternode_health.snapshot import MetricsSnapshot, drawProgressBar
+from masternode_health.operators import OperatorStatus
+from masternode_health.version import __version__
+from unittest import TestCase
+
+
+class MetricsSnapshotTest(TestCase):
+
+    def setUp(self):
+        self.snapshot = MetricsSnapshot(
+            blockcount=1000, bestblockhash='hash', uptime=3600, connectioncount=8, operators=[('abcdef', True)],
+            logSize=12.5, confCheckSum='sum', nodeVersion='v2.0.0', loadavg=0.5, memUsed=2, memTotal=8, diskUsed=100,
+            diskTotal=400, numCores=4, timedOut=(),
+        )
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.snapshot.blockcount = 1001
+        with self.assertRaises(AttributeError):
+            del self.snapshot.blockcount
+        self.assertFalse(hasattr(self.snapshot, '__dict__'))
+
+    def test_unknown_field(self):
+        with self.assertRaises(TypeError):
+            MetricsSnapshot(blockheight=1000)
+
+    def test_nodeInfoPayload(self):
+        self.assertEqual(self.snapshot.nodeInfoPayload(), {
+            'block_height_local': 1000,
+            'local_hash': 'hash',
+            'node_uptime': 3600,
+            'operator_status': [{'id': 'abcdef', 'online': True}],
+            'connection_count': 8,
+            'logsize': 12.5,
+            'config_checksum': 'sum',
+            'node_version': 'v2.0.0',
+        })
+
+    def test_nodeInfoPayload_optional(self):
+        status = OperatorStatus()
+        status.ids.append('abcdef')
+        status.online.append(False)
+        snapshot = MetricsSnapshot(operators=status, timedOut=('Rpc',), latency=(0.1, 0.3), tip=(20, False, None), trends={'block_rate': 120})
+        payload = snapshot.nodeInfoPayload()
+        self.assertEqual(payload['operator_status'], [{'id': 'abcdef', 'online': False}])
+        self.assertEqual(payload['timed_out_collectors'], ['Rpc'])
+        self.assertEqual((payload['rpc_latency'], payload['rpc_latency_max']), (0.1, 0.3))
+        self.assertEqual((payload['tip_age'], payload['stale_tip'], payload['block_interval']), (20, False, None))
+        self.assertNotIn('block_rate', payload)
+
+    def test_serverStatsPayload(self):
+        self.assertEqual(self.snapshot.serverStatsPayload(), {
+            'load_avg': 0.5,
+            'hdd_used': 100,
+            'hdd_total': 400,
+            'ram_used': 2,
+            'ram_total': 8,
+            'num_cores': 4,
+            'server_script_version': __version__,
+        })
+
+    def test_render(self):
+        lines = self.snapshot.panelLines()
+        self.assertEqual(lines[0], '----- [ server stats ] -----')
+        self.assertIn('Operator ..abc:     ✅' + ' ' * 59, lines)
+        self.assertEqual(self.snapshot.render(), '\n'.join(lines) + '\n')
+        self.assertTrue(self.snapshot.render('timings').endswith('\n----- [ timings ] -----\ntimings\n'))
+
+    def test_drawProgressBar(self):
+        progress = drawProgressBar(0.5)
+        self.assertEqual(progress, '[▰▰▰▰▰▰▰        ] 50%')
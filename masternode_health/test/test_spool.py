@@ -0,0 +1,161 @@
+from masternode_health.spool import Spool, DeliveryError, parseRetryAfter
+from unittest import TestCase, mock
+import os
+import shutil
+import tempfile
+
+
+class SpoolTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'spool.sqlite')
+        self.spool = Spool(self.path)
+        self.addCleanup(self.spool.close)
+
+    def test_deliver(self):
+        payloadId = self.spool.push('key', 'node-info', {'a': 1})
+        send = mock.Mock(return_value={'message': 'ok'})
+
+        delivered, failed = self.spool.flush(send)
+        send.assert_called_once_with('key', 'node-info', {'a': 1})
+        self.assertEqual(delivered, {payloadId: {'message': 'ok'}})
+        self.assertEqual(failed, {})
+        self.assertEqual(self.spool.pending(), 0)
+
+    def test_newer_payload_replaces_pending(self):
+        self.spool.push('key', 'node-info', {'a': 1})
+        self.spool.push('key', 'node-info', {'a': 2})
+        self.spool.push('key', 'server-stats', {'b': 1})
+        self.assertEqual(self.spool.pending(), 2)
+
+    def test_rate_limit_per_endpoint(self):
+        send = mock.Mock(return_value={})
+        self.spool.push('key', 'node-info', {'a': 1})
+        self.spool.flush(send)
+
+        self.spool.push('key', 'node-info', {'a': 2})
+        self.spool.push('key', 'server-stats', {'b': 1})
+        self.spool.flush(send)
+
+        self.assertEqual(send.call_count, 2)
+        send.assert_called_with('key', 'server-stats', {'b': 1})
+        self.assertEqual(self.spool.pending(), 1)
+
+    @mock.patch('masternode_health.spool.time.time')
+    def test_nextSlot(self, mock_time):
+        mock_time.return_value = 1000
+        self.assertEqual(self.spool.nextSlot('key'), 0)
+
+        self.spool.push('key', 'node-info', {'a': 1})
+        self.spool.flush(mock.Mock(return_value={}))
+        mock_time.return_value = 1010
+        self.spool.push('key', 'server-stats', {'b': 1})
+        self.spool.flush(mock.Mock(side_effect=DeliveryError('rate limited', retryAfter=600)))
+
+        # The endpoint that is free last decides
+        mock_time.return_value = 1100
+        self.assertEqual(self.spool.nextSlot('key'), 510)
+        self.assertEqual(self.spool.nextSlot('other'), 0)
+
+        mock_time.return_value = 1700
+        self.assertEqual(self.spool.nextSlot('key'), 0)
+
+    def test_flush_limit(self):
+        send = mock.Mock(return_value={})
+        self.spool.push('key1', 'node-info', {'a': 1})
+        self.spool.push('key2', 'node-info', {'a': 2})
+
+        delivered, failed = self.spool.flush(send, limit=1)
+        send.assert_called_once_with('key1', 'node-info', {'a': 1})
+        self.assertEqual(len(delivered), 1)
+        self.assertEqual(self.spool.pending(), 1)
+
+    @mock.patch('masternode_health.spool.time.time')
+    def test_backoff_after_failure(self, mock_time):
+        mock_time.return_value = 1000
+        self.spool.push('key', 'node-info', {'a': 1})
+        self.spool.flush(mock.Mock(side_effect=DeliveryError('down')))
+
+        send = mock.Mock(return_value={})
+        mock_time.return_value = 1030
+        self.spool.flush(send)
+        send.assert_not_called()
+
+        # Backoff of 60 seconds has passed, but the rate limit still blocks the endpoint
+        mock_time.return_value = 1100
+        self.spool.flush(send)
+        send.assert_not_called()
+
+        mock_time.return_value = 1300
+        self.spool.flush(send)
+        send.assert_called_once()
+        self.assertEqual(self.spool.pending(), 0)
+
+    @mock.patch('masternode_health.spool.time.time')
+    def test_backoff_survives_replace(self, mock_time):
+        mock_time.return_value = 1000
+        self.spool.push('key', 'node-info', {'a': 1})
+        self.spool.flush(mock.Mock(side_effect=DeliveryError('down')))
+
+        mock_time.return_value = 1030
+        self.spool.push('key', 'node-info', {'a': 2})
+        send = mock.Mock(side_effect=DeliveryError('down'))
+        self.spool.flush(send)
+        send.assert_not_called()
+
+        mock_time.return_value = 1400
+        self.spool.flush(send)
+        send.assert_called_once_with('key', 'node-info', {'a': 2})
+
+        # Second failure in a row doubles the backoff although the payload has been replaced
+        mock_time.return_value = 1450
+        self.spool.push('key', 'node-info', {'a': 3})
+        attempts, nextAttempt = self.spool.db.execute('SELECT attempts, next_attempt FROM payloads').fetchone()
+        self.assertEqual((attempts, nextAttempt), (2, 1400 + 120))
+
+    @mock.patch('masternode_health.spool.time.time')
+    def test_retry_after_is_honored(self, mock_time):
+        mock_time.return_value = 1000
+        self.spool.push('key', 'node-info', {'a': 1})
+        self.spool.flush(mock.Mock(side_effect=DeliveryError('rate limited', retryAfter=900)))
+
+        send = mock.Mock(return_value={})
+        mock_time.return_value = 1800
+        self.spool.flush(send)
+        send.assert_not_called()
+
+        mock_time.return_value = 1900
+        self.spool.flush(send)
+        send.assert_called_once()
+
+    def test_permanent_failure_is_dropped(self):
+        self.spool.push('key', 'node-info', {'a': 1})
+        delivered, failed = self.spool.flush(mock.Mock(side_effect=DeliveryError('unauthorized', permanent=True)))
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(self.spool.pending(), 0)
+
+    def test_spool_survives_restart(self):
+        self.spool.push('key', 'node-info', {'a': 1})
+        self.spool.close()
+
+        self.spool = Spool(self.path)
+        self.assertEqual(self.spool.pending(), 1)
+
+    def test_files_only_readable_by_owner(self):
+        self.spool.push('key', 'node-info', {'a': 1})
+        for name in ('spool.sqlite', 'spool.sqlite-wal', 'spool.sqlite-shm'):
+            self.assertEqual(os.stat(os.path.join(self.dir, name)).st_mode & 0o777, 0o600)
+
+        # Files of older versions are restricted on start
+        self.spool.close()
+        os.chmod(self.path, 0o644)
+        self.spool = Spool(self.path)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_parseRetryAfter(self):
+        self.assertEqual(parseRetryAfter('120'), 120)
+        self.assertIsNone(parseRetryAfter(None))
+        self.assertIsNone(parseRetryAfter('soon'))
+        self.assertEqual(parseRetryAfter('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
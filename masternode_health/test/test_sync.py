@@ -0,0 +1,52 @@
+from masternode_health.sync import SyncEstimator
+from unittest import TestCase
+import math
+import os
+import shutil
+import tempfile
+
+
+def info(blocks, headers, progress=0.5, ibd=False):
+    return {'blocks': blocks, 'headers': headers, 'verificationprogress': progress, 'initialblockdownload': ibd}
+
+
+class SyncEstimatorTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'sync.json')
+
+    def test_first_sample(self):
+        sync = SyncEstimator(self.path).update(info(1000, 2000), 100)
+        self.assertEqual(sync, {'syncing': True, 'sync_progress': 50, 'sync_headers': 2000, 'sync_blocks_per_second': None, 'sync_eta_seconds': None})
+
+    def test_rate_and_eta(self):
+        estimator = SyncEstimator(self.path)
+        estimator.update(info(1000, 2000), 100)
+        sync = estimator.update(info(1100, 2000), 200)
+        self.assertEqual(sync['sync_blocks_per_second'], 1)
+        self.assertEqual(sync['sync_eta_seconds'], 900)
+
+        # The moving average follows a new rate with a weight that depends on the time since the last sample
+        sync = SyncEstimator(self.path).update(info(1400, 2000), 300)
+        weight = 1 - math.exp(-100 / 1800)
+        self.assertAlmostEqual(sync['sync_blocks_per_second'], 1 + weight * 2)
+
+    def test_synced(self):
+        estimator = SyncEstimator(self.path)
+        estimator.update(info(1000, 2000), 100)
+        self.assertTrue(SyncEstimator(self.path).syncing)
+
+        sync = estimator.update(info(2000, 2000, 1.0), 200)
+        self.assertFalse(sync['syncing'])
+        self.assertEqual(sync['sync_eta_seconds'], 0)
+        self.assertFalse(SyncEstimator(self.path).syncing)
+
+        self.assertTrue(estimator.update(info(2000, 2000, 1.0, ibd=True), 300)['syncing'])
+
+    def test_reindex_resets_rate(self):
+        estimator = SyncEstimator(self.path)
+        estimator.update(info(1000, 2000), 100)
+        estimator.update(info(1100, 2000), 200)
+        self.assertIsNone(estimator.update(info(10, 2000), 300)['sync_blocks_per_second'])
@@ -0,0 +1,74 @@
+from masternode_health.timeseries import MetricStore, rate, movingAverage, stallSeconds
+from unittest import TestCase
+from array import array
+import math
+import os
+import shutil
+import tempfile
+
+
+class MetricStoreTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'metrics.bin')
+
+    def test_append_and_read(self):
+        store = MetricStore(self.path, capacity=4)
+        store.append({'time': 1, 'blockcount': 10})
+        store.append({'time': 2, 'blockcount': 11, 'logSize': 5})
+
+        self.assertEqual(len(store), 2)
+        self.assertEqual(list(store.column('blockcount')), [10, 11])
+        self.assertTrue(math.isnan(store.column('logSize')[0]))
+        store.close()
+
+    def test_ring_buffer_wraps(self):
+        store = MetricStore(self.path, capacity=4)
+        for i in range(10):
+            store.append({'time': i, 'blockcount': i * 10})
+
+        self.assertEqual(len(store), 4)
+        self.assertEqual(list(store.column('time')), [6, 7, 8, 9])
+        self.assertEqual(list(store.column('blockcount')), [60, 70, 80, 90])
+        size = os.path.getsize(self.path)
+        store.close()
+
+        store = MetricStore(self.path, capacity=4)
+        self.assertEqual(list(store.column('time')), [6, 7, 8, 9])
+        self.assertEqual(os.path.getsize(self.path), size)
+        store.close()
+
+    def test_capacity_change_resets(self):
+        store = MetricStore(self.path, capacity=4)
+        store.append({'time': 1})
+        store.close()
+
+        store = MetricStore(self.path, capacity=8)
+        self.assertEqual(len(store), 0)
+        store.close()
+
+
+class HelpersTest(TestCase):
+
+    def test_rate(self):
+        times = array('d', [0, 600, 1200, 1800])
+        values = array('d', [100, 110, 120, 160])
+        self.assertEqual(rate(times, values, 0), 60 / 1800)
+        self.assertEqual(rate(times, values, 1200), 40 / 600)
+        self.assertIsNone(rate(times, values, 1801))
+
+    def test_rate_skips_missing(self):
+        times = array('d', [0, 600, 1200])
+        values = array('d', [100, math.nan, 112])
+        self.assertEqual(rate(times, values, 0), 12 / 1200)
+
+    def test_movingAverage(self):
+        self.assertEqual(list(movingAverage(array('d', [1, 3, 5, 7]), 2)), [1, 2, 4, 6])
+
+    def test_stallSeconds(self):
+        times = array('d', [0, 600, 1200, 1800])
+        self.assertEqual(stallSeconds(times, array('d', [1, 2, 3, 4])), 0)
+        self.assertEqual(stallSeconds(times, array('d', [1, 2, 2, 2])), 1200)
+        self.assertIsNone(stallSeconds(array('d'), array('d')))
@@ -0,0 +1,106 @@
+from masternode_health.tiptracker import TipTracker, Tip, FRESH_SECONDS
+from unittest import TestCase, mock
+
+
+class TipTrackerTest(TestCase):
+
+    def setUp(self):
+        self.onStale = mock.Mock()
+        self.tracker = TipTracker(mock.Mock(), 300, self.onStale)
+
+    def test_setTip_records_intervals(self):
+        self.assertIsNone(self.tracker.intervals())
+
+        self.tracker.setTip(100, 'a', 1000)
+        self.tracker.setTip(100, 'a', 1010)
+        self.tracker.setTip(101, 'b', 1030)
+        self.tracker.setTip(103, 'c', 1090)
+
+        self.assertEqual(self.tracker.tip, Tip(103, 'c', 1090))
+        self.assertEqual(self.tracker.intervals(), {'p50': 30, 'p95': 30, 'max': 30})
+        self.assertIsNone(self.tracker.intervals())
+
+    def test_reorg_to_lower_height(self):
+        self.tracker.setTip(100, 'a', 1000)
+        self.tracker.setTip(99, 'b', 1030)
+        self.assertEqual(self.tracker.tip, Tip(99, 'b', 1030))
+        self.assertIsNone(self.tracker.intervals())
+
+    def test_stale_alert_fires_once(self):
+        self.tracker.checkStale(1000)
+        self.tracker.setTip(100, 'a', 1000)
+
+        self.tracker.checkStale(1299)
+        self.onStale.assert_not_called()
+
+        self.tracker.checkStale(1300)
+        self.tracker.checkStale(1310)
+        self.onStale.assert_called_once_with(Tip(100, 'a', 1000), 300)
+        self.assertTrue(self.tracker.stale)
+        self.assertEqual(self.tracker.age(1310), 310)
+
+        self.tracker.setTip(101, 'b', 1320)
+        self.assertFalse(self.tracker.stale)
+
+    def test_waitForBlocks(self):
+        responses = [{'hash': 'a', 'height': 100}, {'hash': 'b', 'height': 101}]
+
+        def call(method, params=None, timeout=None):
+            self.assertEqual(method, 'waitfornewblock')
+            if len(responses) == 1:
+                self.tracker.stop()
+            return responses.pop(0)
+
+        with mock.patch.object(self.tracker, '_call', side_effect=call):
+            self.tracker._waitForBlocks()
+
+        self.assertEqual(self.tracker.tip.height, 101)
+        self.assertEqual(self.tracker.tip.hash, 'b')
+
+    def test_loadTip(self):
+        results = {'getbestblockhash': 'a', 'getblockheader': {'height': 100, 'time': 1000}}
+
+        with mock.patch.object(self.tracker, '_call', side_effect=lambda method, params=None: results[method]) as call:
+            self.assertEqual(self.tracker._loadTip(), (100, 'a', 1000))
+            call.assert_called_with('getblockheader', ['a'])
+
+    def test_call(self):
+        response = mock.Mock()
+        response.json.return_value = {'result': 5, 'error': None}
+        self.tracker.nodeMonitor.transport.post.return_value = response
+        self.assertEqual(self.tracker._call('getblockcount'), 5)
+
+        response.json.return_value = {'result': None, 'error': {'message': 'Method not found'}}
+        with self.assertRaises(ValueError):
+            self.tracker._call('waitfornewblock')
+
+    def test_current_needs_running_and_fresh_tracker(self):
+        self.tracker.setTip(100, 'a', 1000)
+        self.assertIsNone(self.tracker.current())
+
+        self.tracker._thread = mock.Mock(**{'is_alive.return_value': True})
+        self.assertEqual(self.tracker.current(), Tip(100, 'a', 1000))
+        self.assertIsNone(self.tracker.current(self.tracker.updated + FRESH_SECONDS + 1))
+
+        self.tracker._thread.is_alive.return_value = False
+        self.assertIsNone(self.tracker.current())
+
+    def test_zmq_failure_falls_back_to_polling(self):
+        self.tracker.zmqEndpoint = 'tcp://127.0.0.1:28332'
+
+        with mock.patch.object(self.tracker, '_loadTip', return_value=(100, 'a', 1000)), \
+                mock.patch.object(self.tracker, '_subscribe', return_value=False), \
+                mock.patch.object(self.tracker, '_waitForBlocks', side_effect=self.tracker.stop) as waitForBlocks:
+            self.tracker._run()
+
+        waitForBlocks.assert_called_once()
+        self.assertIsNone(self.tracker.zmqEndpoint)
+
+    def test_checkTip(self):
+        self.tracker.setTip(100, 'a', 1000)
+        results = {'getbestblockhash': 'b', 'getblockheader': {'height': 101, 'time': 1030}}
+
+        with mock.patch.object(self.tracker, '_call', side_effect=lambda method, params=None: results[method]):
+            self.tracker._checkTip()
+
+        self.assertEqual((self.tracker.tip.height, self.tracker.tip.hash), (101, 'b'))
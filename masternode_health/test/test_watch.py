@@ -0,0 +1,73 @@
+from masternode_health.watch import Watch, MINING_INTERVAL
+from masternode_health.tiptracker import Tip
+from unittest import TestCase, mock
+import io
+
+
+class WatchTest(TestCase):
+
+    def setUp(self):
+        self.nm = mock.Mock(tipTracker=None, blockcount=None, bestblockhash=None, defi_path='/nonexistent')
+        self.nm._collectServerStats.return_value = {'loadavg': 1.0}
+        self.nm._checkAreNodesMining.return_value = []
+        self.blockcount = 100
+        self.calls = []
+
+        def rpcbatch(calls, notifyDown=True):
+            self.assertFalse(notifyDown)
+            methods = [method for callId, method, params in calls]
+            self.calls.append(methods)
+            results = {'getconnectioncount': 8, 'getblockcount': self.blockcount, 'getbestblockhash': f'hash{self.blockcount}', 'getmininginfo': {'masternodes': []}, 'uptime': 50}
+            return {method: results[method] for method in methods}, {}
+
+        self.nm._rpcbatch.side_effect = rpcbatch
+        self.out = io.StringIO()
+        self.watch = Watch(self.nm, 1, self.out)
+
+    def test_minimal_rpc_set(self):
+        self.watch.tick(0)
+        self.assertEqual(self.calls, [['getconnectioncount', 'getblockcount', 'getmininginfo', 'uptime'], ['getbestblockhash']])
+        self.assertEqual((self.nm.blockcount, self.nm.bestblockhash, self.nm.uptime), (100, 'hash100', 50))
+
+        # Unchanged block count, no getbestblockhash and no getmininginfo within MINING_INTERVAL
+        self.calls = []
+        self.watch.tick(1)
+        self.assertEqual(self.calls, [['getconnectioncount', 'getblockcount']])
+        self.assertEqual(self.nm.uptime, 51)
+        self.assertEqual(self.nm._checkAreNodesMining.call_count, 2)
+
+        self.calls = []
+        self.blockcount = 101
+        self.watch.tick(MINING_INTERVAL)
+        self.assertEqual(self.calls, [['getconnectioncount', 'getblockcount', 'getmininginfo', 'uptime'], ['getbestblockhash']])
+        self.assertEqual(self.nm.bestblockhash, 'hash101')
+
+    def test_tip_from_tracker(self):
+        self.nm.tipTracker = mock.Mock(**{'current.return_value': Tip(200, 'tiphash', 0)})
+        self.watch.tick(0)
+        self.assertEqual(self.calls, [['getconnectioncount', 'getmininginfo', 'uptime']])
+        self.assertEqual((self.nm.blockcount, self.nm.bestblockhash), (200, 'tiphash'))
+
+    def test_error_is_shown(self):
+        self.nm._rpcbatch.side_effect = SystemExit('❌ Your defid process seems to be down or RPC server is not reachable!')
+        self.watch.tick(0)
+        self.nm.takeSnapshot.return_value.panelLines.return_value = ['panel']
+        self.assertEqual(self.watch.render(), ['panel', '', '❌ Your defid process seems to be down or RPC server is not reachable!'])
+        self.nm._collectServerStats.assert_called_once()
+
+    def test_draw_only_changed_lines(self):
+        self.watch.draw(['a', 'b', 'c'])
+        self.assertTrue(self.out.getvalue().endswith('a\nb\nc'))
+
+        self.out.seek(0)
+        self.out.truncate()
+        self.watch.draw(['a', 'x', 'c', 'd'])
+        self.assertEqual(self.out.getvalue(), '\x1b[2;1Hx\x1b[K\x1b[4;1Hd\x1b[K')
+
+        self.out.seek(0)
+        self.out.truncate()
+        self.watch.draw(['a', 'x', 'c', 'd'])
+        self.assertEqual(self.out.getvalue(), '')
+
+        self.watch.draw(['a'])
+        self.assertEqual(self.out.getvalue(), '\x1b[2;1H\x1b[J')
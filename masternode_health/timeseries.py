@@ -0,0 +1,136 @@
+import math
+import mmap
+import os
+import struct
+from array import array
+
+MAGIC = b'MNHTS001'
+HEADER = struct.Struct('<8sIIQ8x')
+FIELDS = ('time', 'blockcount', 'connectioncount', 'uptime', 'loadavg', 'memUsed', 'diskUsed', 'logSize', 'blocksSize', 'chainstateSize', 'enhancedcsSize')
+DEFAULT_CAPACITY = 1024
+
+
+class MetricStore:
+    '''
+        Fixed-size ring buffer of metric snapshots in a memory-mapped file. Every field is stored as a
+        contiguous column of doubles, so appends write one value per column and reads return whole columns.
+    '''
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        size = HEADER.size + len(FIELDS) * capacity * 8
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, fields, cap, count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or fields != len(FIELDS) or cap != capacity:
+            # Layout changed or new file, start over
+            self.mm[:] = bytes(size)
+            HEADER.pack_into(self.mm, 0, MAGIC, len(FIELDS), capacity, 0)
+
+        self.data = memoryview(self.mm)[HEADER.size:].cast('d')
+
+    @property
+    def count(self):
+        return HEADER.unpack_from(self.mm)[3]
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, values):
+        '''
+            Stores one snapshot, values is a dict with a value or None for every field
+        '''
+        count = self.count
+        slot = count % self.capacity
+
+        for column, field in enumerate(FIELDS):
+            value = values.get(field)
+            self.data[column * self.capacity + slot] = math.nan if value is None else value
+
+        HEADER.pack_into(self.mm, 0, MAGIC, len(FIELDS), self.capacity, count + 1)
+
+    def column(self, field):
+        '''
+            Returns all stored values of field as array in chronological order
+        '''
+        start = FIELDS.index(field) * self.capacity
+        count = self.count
+        values = self.data[start:start + self.capacity]
+
+        if count <= self.capacity:
+            return array('d', values[:count])
+
+        slot = count % self.capacity
+        return array('d', values[slot:]) + array('d', values[:slot])
+
+    def close(self):
+        self.data.release()
+        self.mm.close()
+
+
+def window(times, values, since):
+    '''
+        Returns the (times, values) pairs sampled at or after since, skipping missing values
+    '''
+    start = len(times)
+    while start > 0 and times[start - 1] >= since:
+        start -= 1
+
+    return [(t, v) for t, v in zip(times[start:], values[start:]) if not math.isnan(v)]
+
+
+def rate(times, values, since):
+    '''
+        Average change of values per second since the given time or None if there are not enough samples
+    '''
+    samples = window(times, values, since)
+    if len(samples) < 2 or samples[-1][0] == samples[0][0]:
+        return None
+
+    return (samples[-1][1] - samples[0][1]) / (samples[-1][0] - samples[0][0])
+
+
+def movingAverage(values, size):
+    '''
+        Simple moving average over size samples, computed with a running sum
+    '''
+    retval = array('d')
+    total = 0.0
+
+    for i, value in enumerate(values):
+        total += value
+        if i >= size:
+            total -= values[i - size]
+        retval.append(total / min(i + 1, size))
+
+    return retval
+
+
+def stallSeconds(times, values):
+    '''
+        Seconds since values last changed, 0 if the latest sample differs from the previous one
+    '''
+    samples = window(times, values, -math.inf)
+    if not samples:
+        return None
+
+    last = samples[-1]
+    since = last[0]
+    for t, v in reversed(samples):
+        if v != last[1]:
+            break
+        since = t
+
+    return last[0] - since
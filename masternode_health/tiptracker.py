@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from collections import namedtuple
+from .sampler import StreamSummary
+from .transport import TransportError
+
+# Seconds a waitfornewblock call blocks in defid before it returns the unchanged tip
+POLL_TIMEOUT = 10
+# Seconds to wait before retrying after defid could not be reached
+RETRY_SECONDS = 5
+# The tip is only trusted if the tracker heard from defid within this many seconds
+FRESH_SECONDS = 3 * POLL_TIMEOUT
+
+Tip = namedtuple('Tip', ['height', 'hash', 'time'])
+
+
+class TipTracker:
+    '''
+        Follows the chain tip of defid in a background thread, either by long-polling waitfornewblock or by
+        subscribing to the ZMQ hashblock notifications of defid. Keeps the current tip in memory, records the
+        time between blocks and calls onStale(tip, age) once as soon as no new block arrived for staleSeconds.
+    '''
+    def __init__(self, nodeMonitor, staleSeconds, onStale=None, zmqEndpoint=None):
+        self.nodeMonitor = nodeMonitor
+        self.staleSeconds = staleSeconds
+        self.onStale = onStale
+        self.zmqEndpoint = zmqEndpoint
+        self.tip = None
+        self.stale = False
+        # time.monotonic() of the last answer of defid
+        self.updated = None
+        self._intervals = StreamSummary()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='tiptracker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # A running long poll is not interrupted, the thread ends when it returns
+        self._stop.set()
+
+    def _call(self, method, params=None, timeout=POLL_TIMEOUT + 10):
+        nm = self.nodeMonitor
+        response = nm.transport.post(nm.rpchost, data=json.dumps({'jsonrpc': '1.0', 'id': method, 'method': method, 'params': params or []}), headers={'Content-type': 'application/json'}, auth=(nm.rpcuser, nm.rpcpassword), timeout=timeout)
+        data = response.json()
+        if data.get('error') is not None:
+            raise ValueError(data['error'].get('message'))
+
+        return data['result']
+
+    def _loadTip(self, blockHash=None):
+        '''
+            Reads height and time of the given block or the best block if no hash is given
+        '''
+        if blockHash is None:
+            blockHash = self._call('getbestblockhash')
+        header = self._call('getblockheader', [blockHash])
+
+        return header['height'], blockHash, header['time']
+
+    def current(self, now=None):
+        '''
+            Returns the tip, or None unless the tracker thread runs and heard from defid within FRESH_SECONDS
+        '''
+        now = time.monotonic() if now is None else now
+        if self._thread is None or not self._thread.is_alive() or self.updated is None or now - self.updated > FRESH_SECONDS:
+            return None
+
+        return self.tip
+
+    def setTip(self, height, blockHash, now=None):
+        now = time.time() if now is None else now
+        self.updated = time.monotonic()
+
+        with self._lock:
+            if self.tip is not None and blockHash == self.tip.hash:
+                return
+            if self.tip is not None and height > self.tip.height:
+                self._intervals.add((now - self.tip.time) / (height - self.tip.height))
+
+            self.tip = Tip(height, blockHash, now)
+            self.stale = False
+
+    def checkStale(self, now=None):
+        now = time.time() if now is None else now
+        tip = self.tip
+        if tip is None or self.stale or now - tip.time < self.staleSeconds:
+            return
+
+        self.stale = True
+        if self.onStale is not None:
+            self.onStale(tip, now - tip.time)
+
+    def age(self, now=None):
+        now = time.time() if now is None else now
+        return None if self.tip is None else now - self.tip.time
+
+    def intervals(self):
+        '''
+            Returns p50, p95 and max of the seconds between blocks since the last call or None without new blocks
+        '''
+        with self._lock:
+            intervals, self._intervals = self._intervals, StreamSummary()
+
+        return intervals.result() if intervals.max is not None else None
+
+    def _waitForBlocks(self):
+        while not self._stop.is_set():
+            result = self._call('waitfornewblock', [POLL_TIMEOUT * 1000])
+            self.setTip(result['height'], result['hash'])
+            self.checkStale()
+
+    def _checkTip(self):
+        '''
+            Compares the tip with the best block of defid, this catches missed notifications and shows defid still answers
+        '''
+        blockHash = self._call('getbestblockhash')
+        if self.tip is None or blockHash != self.tip.hash:
+            self.setTip(*self._loadTip(blockHash)[:2])
+        else:
+            self.updated = time.monotonic()
+
+    def _subscribe(self):
+        '''
+            Follows the ZMQ notifications until the tracker is stopped. Returns False if the subscription failed.
+        '''
+        try:
+            import zmq
+        except ImportError:
+            print("❌ --zmq-hashblock needs pyzmq, install it with: pip install masternode-health[zmq]")
+            return False
+
+        socket = zmq.Context.instance().socket(zmq.SUB)
+        try:
+            socket.setsockopt(zmq.SUBSCRIBE, b'hashblock')
+            socket.setsockopt(zmq.RCVTIMEO, POLL_TIMEOUT * 1000)
+            socket.connect(self.zmqEndpoint)
+
+            while not self._stop.is_set():
+                try:
+                    topic, body = socket.recv_multipart()[:2]
+                    self.setTip(*self._loadTip(body.hex())[:2])
+                except zmq.Again:
+                    self._checkTip()
+                self.checkStale()
+        except zmq.ZMQError as err:
+            print(f"❌ Could not subscribe to {self.zmqEndpoint}: {err}")
+            return False
+        finally:
+            socket.close(linger=0)
+
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.tip is None:
+                    height, blockHash, blockTime = self._loadTip()
+                    # The age of the first tip is taken from its block time
+                    self.setTip(height, blockHash, min(blockTime, time.time()))
+
+                if self.zmqEndpoint is not None:
+                    if self._subscribe():
+                        return
+                    print("❌ Falling back to long-polling waitfornewblock")
+                    self.zmqEndpoint = None
+                self._waitForBlocks()
+            except (TransportError, ValueError, KeyError, TypeError):
+                self.checkStale()
+                self._stop.wait(RETRY_SECONDS)
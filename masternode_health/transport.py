@@ -0,0 +1,206 @@
+import json as jsonlib
+import socket
+import threading
+from base64 import b64encode
+from urllib.parse import unquote, urlsplit
+
+
+class TransportError(Exception):
+    pass
+
+
+class ConnectionError(TransportError):
+    pass
+
+
+class Timeout(TransportError):
+    pass
+
+
+class HTTPError(TransportError):
+    def __init__(self, *args, response=None):
+        super().__init__(*args)
+        self.response = response
+
+
+class Response:
+    '''
+        The parts of a http response used by masternode-health, shared by all transports
+    '''
+    def __init__(self, status_code, headers, content, url):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f'{self.status_code} Error for url: {self.url}', response=self)
+
+
+def _basicAuth(user, password):
+    return 'Basic ' + b64encode(f'{user}:{password}'.encode()).decode()
+
+
+def _proxy(scheme, host):
+    '''
+        Returns the split url of the proxy for a host like urllib and requests choose it: from the *_proxy
+        environment variables unless no_proxy matches, on windows and macOS from the system settings as well
+    '''
+    from urllib.request import getproxies, proxy_bypass
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(host):
+        return None
+
+    return urlsplit(proxy if '://' in proxy else f'http://{proxy}')
+
+
+def _prepare(data, json, headers, auth):
+    headers = dict(headers or {})
+
+    if json is not None:
+        data = jsonlib.dumps(json)
+        headers['Content-Type'] = 'application/json'
+    if isinstance(data, str):
+        data = data.encode()
+    if auth is not None:
+        headers['Authorization'] = _basicAuth(*auth)
+
+    return data, headers
+
+
+class HttpClientTransport:
+    '''
+        Keep-alive transport based on http.client. Idle connections are pooled per host, so every
+        request after the first one to a host reuses its TCP (and TLS) connection. Proxies are honoured
+        like urllib does, https is tunneled through them with CONNECT.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.proxies = {}
+
+    def _proxy(self, key):
+        with self.lock:
+            if key not in self.proxies:
+                self.proxies[key] = _proxy(key[0], key[1])
+            return self.proxies[key]
+
+    def _proxyHeaders(self, proxy):
+        if proxy.username is None:
+            return {}
+        return {'Proxy-Authorization': _basicAuth(unquote(proxy.username), unquote(proxy.password or ''))}
+
+    def _connect(self, key, timeout):
+        with self.lock:
+            connections = self.idle.get(key)
+            if connections:
+                return connections.pop(), True
+
+        # Only import what the scheme needs, ssl is expensive
+        import http.client
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        proxy = self._proxy(key)
+        if proxy is None:
+            return cls(host, port, timeout=timeout), False
+
+        if scheme != 'https':
+            return http.client.HTTPConnection(proxy.hostname, proxy.port, timeout=timeout), False
+
+        connection = cls(proxy.hostname, proxy.port, timeout=timeout)
+        connection.set_tunnel(host, port, self._proxyHeaders(proxy))
+        return connection, False
+
+    def _release(self, key, connection):
+        with self.lock:
+            self.idle.setdefault(key, []).append(connection)
+
+    def post(self, url, data=None, json=None, headers=None, auth=None, timeout=None):
+        import http.client
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        data, headers = _prepare(data, json, headers, auth)
+
+        proxy = self._proxy(key)
+        if proxy is not None and parts.scheme != 'https':
+            # A plain http proxy gets the absolute url of every request
+            path = f"{parts.scheme}://{parts.netloc.rpartition('@')[2]}{path}"
+            headers.update(self._proxyHeaders(proxy))
+
+        for attempt in range(2):
+            connection, reused = self._connect(key, timeout)
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+
+            try:
+                connection.request('POST', path, data, headers)
+                response = connection.getresponse()
+                content = response.read()
+            except socket.timeout as err:
+                connection.close()
+                raise Timeout(f'Request to {url} timed out: {err}')
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as err:
+                connection.close()
+                # The server may have closed an idle keep-alive connection, retry once on a new one
+                if reused and attempt == 0:
+                    continue
+                raise ConnectionError(f'Connection to {url} failed: {err}')
+            except (OSError, http.client.HTTPException) as err:
+                connection.close()
+                raise ConnectionError(f'Connection to {url} failed: {err}')
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+
+            return Response(response.status, response.headers, content, url)
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle = {}
+
+
+class RequestsTransport:
+    '''
+        Transport based on a requests session
+    '''
+    def __init__(self):
+        import requests
+        self.exceptions = requests.exceptions
+        self.session = requests.Session()
+
+    def post(self, url, data=None, json=None, headers=None, auth=None, timeout=None):
+        try:
+            r = self.session.post(url, data=data, json=json, headers=headers, auth=auth, timeout=timeout)
+        except self.exceptions.Timeout as err:
+            raise Timeout(str(err))
+        except self.exceptions.RequestException as err:
+            raise ConnectionError(str(err))
+
+        return Response(r.status_code, r.headers, r.content, url)
+
+    def close(self):
+        self.session.close()
+
+
+TRANSPORTS = {
+    'http': HttpClientTransport,
+    'requests': RequestsTransport,
+}
+
+
+def createTransport(name):
+    try:
+        return TRANSPORTS[name]()
+    except ImportError as err:
+        raise SystemExit(f"❌ The {name} transport is not available: {err}")
@@ -0,0 +1,28 @@
+import json
+import os
+
+
+def loadJson(path, default):
+    '''
+        Returns the decoded content of a json state file or default if it is missing or broken
+    '''
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def saveJson(path, data):
+    '''
+        Atomically replaces a json state file. State files may contain rpc credentials, so they are only readable by the owner.
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
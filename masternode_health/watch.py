@@ -0,0 +1,134 @@
+import sys
+import time
+from os.path import getsize, join
+
+# Seconds between two getmininginfo and uptime calls, the operator state is recomputed locally in between
+MINING_INTERVAL = 30
+
+HIDE_CURSOR = '\x1b[?25l'
+SHOW_CURSOR = '\x1b[?25h'
+CLEAR_SCREEN = '\x1b[2J\x1b[H'
+
+
+class Watch:
+    '''
+        Redraws the server stats and node info panels in place every interval seconds. Every tick issues the
+        cheapest rpc set possible: getbestblockhash only follows a changed getblockcount (or is not needed at
+        all with a tip tracker), getmininginfo and uptime are called every MINING_INTERVAL seconds only.
+    '''
+    def __init__(self, nodeMonitor, interval, out=None):
+        self.nodeMonitor = nodeMonitor
+        self.interval = interval
+        self.out = out or sys.stdout
+        self.lines = None
+        self.error = None
+        self._mininginfo = None
+        self._nextMining = 0
+        self._uptimeAt = None
+
+    def _rpcbatch(self, methods):
+        results, errors = self.nodeMonitor._rpcbatch([(method, method, False) for method in methods], notifyDown=False)
+        if errors:
+            raise SystemExit('\n'.join(f"❌ RPC call {callId} failed: {err.get('message')}" for callId, err in errors.items()))
+
+        return results
+
+    def _pollNode(self, now):
+        nm = self.nodeMonitor
+        tip = nm.tipTracker.current() if nm.tipTracker is not None else None
+        methods = ['getconnectioncount']
+        if tip is None:
+            methods.append('getblockcount')
+        if now >= self._nextMining:
+            methods += ['getmininginfo', 'uptime']
+
+        results = self._rpcbatch(methods)
+        nm.connectioncount = results['getconnectioncount']
+
+        if 'getmininginfo' in results:
+            self._mininginfo = results['getmininginfo']
+            self._uptimeAt = (results['uptime'], now)
+            self._nextMining = now + MINING_INTERVAL
+
+        if tip is not None:
+            nm.blockcount, nm.bestblockhash = tip.height, tip.hash
+        elif results['getblockcount'] != nm.blockcount or nm.bestblockhash is None:
+            nm.bestblockhash = self._rpcbatch(['getbestblockhash'])['getbestblockhash']
+            nm.blockcount = results['getblockcount']
+
+        if self._mininginfo is not None:
+            # Attempt ages grow between two getmininginfo calls, so the operator state is recomputed on every tick
+            nm.checkNodes = nm._checkAreNodesMining(self._mininginfo)
+            nm.uptime = int(self._uptimeAt[0] + now - self._uptimeAt[1])
+
+    def _pollServer(self):
+        nm = self.nodeMonitor
+        nm.__dict__.update(nm._collectServerStats())
+        try:
+            nm.logSize = getsize(join(nm.defi_path, 'debug.log')) / 1024**2
+        except OSError:
+            nm.logSize = None
+
+    def tick(self, now=None):
+        '''
+            Polls node and server once. Errors are shown below the panels instead of ending the watch.
+        '''
+        now = time.monotonic() if now is None else now
+        self.nodeMonitor.profiler.reset()
+        self.error = None
+
+        try:
+            self._pollNode(now)
+        except SystemExit as err:
+            self.error = str(err.code)
+        self._pollServer()
+
+    def render(self):
+        lines = self.nodeMonitor.takeSnapshot().panelLines()
+        if self.error is not None:
+            lines += [''] + self.error.splitlines()
+
+        return lines
+
+    def draw(self, lines):
+        '''
+            Writes only the lines that differ from the previous frame
+        '''
+        if self.lines is None:
+            output = CLEAR_SCREEN + '\n'.join(lines)
+        else:
+            output = ''.join(f'\x1b[{row + 1};1H{line}\x1b[K' for row, line in enumerate(lines) if row >= len(self.lines) or self.lines[row] != line)
+            if len(lines) < len(self.lines):
+                # Clear everything below the shorter frame
+                output += f'\x1b[{len(lines) + 1};1H\x1b[J'
+
+        self.lines = lines
+        if output:
+            self.out.write(output)
+            self.out.flush()
+
+    def run(self):
+        try:
+            # The version only changes with a new defid binary, it is read once
+            self.nodeMonitor.__dict__.update(self.nodeMonitor._collectNodeVersion())
+        except SystemExit:
+            pass
+
+        self.out.write(HIDE_CURSOR)
+        nextRun = time.monotonic()
+
+        try:
+            while True:
+                self.tick()
+                self.draw(self.render())
+
+                nextRun += self.interval
+                now = time.monotonic()
+                if nextRun < now:
+                    nextRun = now
+                time.sleep(nextRun - now)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.out.write(f'\x1b[{len(self.lines or []) + 1};1H{SHOW_CURSOR}\n')
+            self.out.flush()
@@ -26,9 +26,13 @@ setup(
     description='This script is designed for collecting server & DeFiChain node information of your system and send them to the DeFiChain Masternode Health API',
     long_description=long_description,
     long_description_content_type='text/markdown',
-    install_requires=['psutil', 'requests'],
+    install_requires=['psutil'],
+    extras_require={
+        'requests': ['requests'],
+        'zmq': ['pyzmq'],
+    },
     entry_points={
-        'console_scripts': ['masternode-health=masternode_health.monitor:main']
+        'console_scripts': ['masternode-health=masternode_health.cli:main']
     },
     python_requires='>2.7'
 )